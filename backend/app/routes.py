@@ -1,12 +1,23 @@
+import os
+import time
 from flask import Blueprint, request, jsonify
 from app.services.text_service import TextService
-from app.services.translation_service import TranslationService
+from app.services.translation_service import translation_service
 from app.services.pinyin_service import PinyinService
 from app.services.dictionary_service import dictionary_service
+from app.services.analysis_pipeline import FIELDS, analysis_pipeline
+from app.services.deferred_texts import deferred_texts
+from app.services.concurrency import map_with_deadline, stage_executor, timed
+from app.services.rate_limiter import BATCH
+
+# Overall time budget for /translate-batch, and how many individual fallbacks run at once
+BATCH_DEADLINE_SECONDS = float(os.getenv('BATCH_DEADLINE_SECONDS', '8'))
+BATCH_FALLBACK_CONCURRENCY = int(os.getenv('BATCH_FALLBACK_CONCURRENCY', '6'))
+# Seconds an interactive request waits for the upstream before answering with the dictionary gloss
+TRANSLATION_BUDGET_SECONDS = float(os.getenv('TRANSLATION_BUDGET_SECONDS', '2.5'))
 
 api_bp = Blueprint('api', __name__)
 text_service = TextService()
-translation_service = TranslationService()
 pinyin_service = PinyinService()
 
 @api_bp.route('/health', methods=['GET'])
@@ -23,6 +34,20 @@ def get_text(text_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _opt_in(value) -> bool:
+    """
+    Parse an opt-in flag such as fuzzy: true or '1'/'true' turn it on; absent, false,
+    '0', 'false' or '' leave it off.
+    
+    Raises:
+        ValueError: for any other value
+    """
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ('1', 'true', '0', 'false', ''):
+        return value.lower() in ('1', 'true')
+    raise ValueError(f"Expected true or false, got {value!r}")
+
 @api_bp.route('/translate', methods=['POST'])
 def translate_text():
     """Translate Chinese text to English"""
@@ -33,7 +58,13 @@ def translate_text():
         if not chinese_text:
             return jsonify({'error': 'No text provided'}), 400
         
-        translation = translation_service.translate(chinese_text)
+        # Opt in to reusing translations of near-duplicate sentences
+        try:
+            fuzzy = _opt_in(data.get('fuzzy'))
+        except ValueError as e:
+            return jsonify({'error': f"fuzzy: {e}"}), 400
+        
+        translation = translation_service.translate(chinese_text, budget=TRANSLATION_BUDGET_SECONDS, fuzzy=fuzzy)
         return jsonify({'translation': translation})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -48,11 +79,41 @@ def translate_word():
         if not word:
             return jsonify({'error': 'No word provided'}), 400
         
-        translation = translation_service.translate(word)
+        translation = translation_service.translate(word, budget=TRANSLATION_BUDGET_SECONDS)
         return jsonify({'translation': translation})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _translate_individually(items, translations, deadline):
+    """
+    Translate items one by one, concurrently, until the batch deadline.
+    
+    Items that are not translated in time get the dictionary-based gloss; their
+    upstream calls keep running in the background and fill the cache for next time.
+    
+    Returns:
+        The items that fell back to a dictionary gloss (partial results)
+    """
+    items = list(dict.fromkeys(items))
+    results, late = map_with_deadline(lambda item: translation_service.translate(item, priority=BATCH), items,
+                                      timeout=max(deadline - time.monotonic(), 0),
+                                      max_concurrency=BATCH_FALLBACK_CONCURRENCY)
+    
+    for item in items:
+        if item in results:
+            individual_translation = results[item]
+            print(f"Individual fallback: '{item}' -> '{individual_translation}'")
+            if individual_translation and individual_translation != item and individual_translation.lower() != 'unknown':
+                translations[item] = individual_translation
+            else:
+                translations[item] = 'Unknown'
+        else:
+            gloss = translation_service.gloss(item)
+            print(f"Deadline passed for '{item}', using dictionary gloss '{gloss}'")
+            translations[item] = gloss if gloss and gloss != item else 'Unknown'
+    
+    return late
+
 @api_bp.route('/translate-batch', methods=['POST'])
 def translate_batch():
     """Translate multiple Chinese words/characters in one API call"""
@@ -65,6 +126,10 @@ def translate_batch():
         if not items:
             return jsonify({'error': 'No items provided'}), 400
         
+        deadline = time.monotonic() + BATCH_DEADLINE_SECONDS
+        # Items answered with a dictionary gloss because the deadline passed
+        partial_items = []
+        
         # Step 1: First try local dictionaries (fastest)
         translations = {}
         dictionary_hits = []
@@ -92,67 +157,31 @@ def translate_batch():
         
         print(f"Dictionary resolved {len(dictionary_hits)} items, need translation for {len(needs_translation)} items")
         
-        # Step 2: Batch translate remaining items (efficient)
+        # Step 2: Batch translate remaining items (packed one per line into few requests)
         if needs_translation:
-            csv_text = ', '.join(needs_translation)
-            print(f"CSV text to translate: {csv_text}")
+            batch_results = translation_service.translate_batch(
+                needs_translation, timeout=max(deadline - time.monotonic(), 0))
             
-            batch_translation = translation_service.translate(csv_text)
-            print(f"Batch translation result: {batch_translation}")
+            # Map batch results to original items
+            batch_failures = []
+            for item in dict.fromkeys(needs_translation):
+                batch_result = batch_results.get(item)
+                # Check if batch translation is meaningful
+                if batch_result and batch_result != item and batch_result.lower() not in ['unknown', item.lower()]:
+                    translations[item] = batch_result
+                    print(f"Batch success: '{item}' -> '{batch_result}'")
+                else:
+                    # Batch failed for this item
+                    batch_failures.append(item)
+                    print(f"Batch failed for: '{item}' (got '{batch_result}')")
             
-            if batch_translation:
-                # Parse CSV response
-                translated_parts = [part.strip() for part in batch_translation.split(',')]
-                print(f"Parsed translation parts: {translated_parts}")
-                
-                # Map batch results to original items
-                batch_failures = []
-                for i, item in enumerate(needs_translation):
-                    if i < len(translated_parts):
-                        batch_result = translated_parts[i]
-                        # Check if batch translation is meaningful
-                        if batch_result and batch_result != item and batch_result.lower() not in ['unknown', item.lower()]:
-                            translations[item] = batch_result
-                            print(f"Batch success: '{item}' -> '{batch_result}'")
-                        else:
-                            # Batch failed for this item
-                            batch_failures.append(item)
-                            print(f"Batch failed for: '{item}' (got '{batch_result}')")
-                    else:
-                        # Not enough parts in batch response
-                        batch_failures.append(item)
-                        print(f"Batch incomplete for: '{item}'")
-                
-                # Step 3: Individual translation for remaining failures (last resort)
-                if batch_failures:
-                    print(f"Need individual translation for {len(batch_failures)} items: {batch_failures}")
-                    
-                    for item in batch_failures:
-                        try:
-                            individual_translation = translation_service.translate(item)
-                            print(f"Individual fallback: '{item}' -> '{individual_translation}'")
-                            
-                            if individual_translation and individual_translation != item and individual_translation.lower() != 'unknown':
-                                translations[item] = individual_translation
-                            else:
-                                translations[item] = 'Unknown'
-                        except Exception as e:
-                            print(f"Error in individual translation for '{item}': {e}")
-                            translations[item] = 'Unknown'
-            else:
-                # Batch translation completely failed, try individual for all
-                print("Batch translation failed, trying individual translations")
-                for item in needs_translation:
-                    try:
-                        individual_translation = translation_service.translate(item)
-                        print(f"Individual translation: '{item}' -> '{individual_translation}'")
-                        translations[item] = individual_translation or 'Unknown'
-                    except Exception as e:
-                        print(f"Error in individual translation for '{item}': {e}")
-                        translations[item] = 'Unknown'
+            # Step 3: Individual translation for remaining failures (last resort)
+            if batch_failures:
+                print(f"Need individual translation for {len(batch_failures)} items: {batch_failures}")
+                partial_items = _translate_individually(batch_failures, translations, deadline)
         
         print(f"Final translations mapping: {translations}")
-        return jsonify({'translations': translations})
+        return jsonify({'translations': translations, 'partial': partial_items})
     except Exception as e:
         print(f"Batch translation error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -181,6 +210,34 @@ def get_character_info(char):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _server_timing(**stages: float) -> str:
+    """Server-Timing header value listing each stage's duration in milliseconds."""
+    return ', '.join(f"{name};dur={duration:.1f}" for name, duration in stages.items())
+
+# Fields /api/analyze can return (all by default)
+ANALYZE_FIELDS = FIELDS | {'translation'}
+
+def _analyze_fields(include) -> frozenset:
+    """
+    Fields requested with include= (a list, or a comma-separated string); all when absent.
+    
+    Raises:
+        ValueError: if include is neither a list nor a string, or names fields not in
+            ANALYZE_FIELDS
+    """
+    if include is None:
+        return ANALYZE_FIELDS
+    if isinstance(include, str):
+        include = include.split(',')
+    elif not isinstance(include, list):
+        raise ValueError("include must be a list or a comma-separated string of fields")
+    fields = frozenset(str(field).strip() for field in include) - {''}
+    unknown = fields - ANALYZE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown include fields: {', '.join(sorted(unknown))} "
+                         f"(expected {', '.join(sorted(ANALYZE_FIELDS))})")
+    return fields
+
 @api_bp.route('/analyze', methods=['POST'])
 def analyze_text():
     """Comprehensive text analysis including translation and pinyin"""
@@ -191,17 +248,68 @@ def analyze_text():
         if not chinese_text:
             return jsonify({'error': 'No text provided'}), 400
         
-        # Get all analysis in parallel
-        pinyin = pinyin_service.generate_pinyin(chinese_text)
-        translation = translation_service.translate(chinese_text)
-        char_analysis = text_service.analyze_characters(chinese_text)
+        # Opt in to reusing translations of near-duplicate sentences
+        try:
+            fuzzy = _opt_in(data.get('fuzzy'))
+        except ValueError as e:
+            return jsonify({'error': f"fuzzy: {e}"}), 400
+        # Only compute the requested fields; without 'translation' the response carries a
+        # content_hash to fetch it later from /analyze/translation/<content_hash>
+        try:
+            include = _analyze_fields(data.get('include', request.args.get('include')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Opt in to the compact format: a table of distinct characters and words
+        # referenced by index from per-word tokens (see AnalysisPipeline.analyze_compact)
+        compact = data.get('format') == 'compact'
+        analyze = analysis_pipeline.analyze_compact if compact else analysis_pipeline.analyze
         
-        return jsonify({
-            'original': chinese_text,
-            'pinyin': pinyin,
-            'translation': translation,
-            'character_analysis': char_analysis
-        })
+        # Get all analysis in parallel: the translation (which may wait on the upstream)
+        # runs in the background while this thread builds pinyin and characters from
+        # one segmentation
+        start = time.perf_counter()
+        stages = {}
+        translation_future = None
+        if 'translation' in include:
+            translation_future = stage_executor.submit(
+                timed, translation_service.translate, chinese_text, budget=TRANSLATION_BUDGET_SECONDS, fuzzy=fuzzy)
+        analysis, stages['analysis'] = timed(analyze, chinese_text, include)
+        
+        result = {'original': chinese_text}
+        if translation_future is not None:
+            result['translation'], stages['translation'] = translation_future.result()
+        else:
+            result['content_hash'] = deferred_texts.add(chinese_text)
+        result.update(analysis)
+        if compact:
+            result['format'] = 'compact'
+        response, stages['serialize'] = timed(jsonify, result)
+        stages['total'] = (time.perf_counter() - start) * 1000
+        response.headers['Server-Timing'] = _server_timing(**stages)
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/analyze/translation/<content_hash>', methods=['GET'])
+def get_deferred_translation(content_hash):
+    """Translation of a text /api/analyze was asked to leave out, by the content_hash it returned"""
+    try:
+        text = deferred_texts.get(content_hash)
+        if text is None:
+            return jsonify({'error': 'Unknown or expired content hash'}), 404
+        
+        try:
+            fuzzy = _opt_in(request.args.get('fuzzy'))
+        except ValueError as e:
+            return jsonify({'error': f"fuzzy: {e}"}), 400
+        translation, translation_ms = timed(
+            translation_service.translate, text, budget=TRANSLATION_BUDGET_SECONDS, fuzzy=fuzzy)
+        response = jsonify({'content_hash': content_hash, 'translation': translation})
+        response.headers['Server-Timing'] = _server_timing(translation=translation_ms)
+        # Translations come from the translation cache after the first fetch; the ETag
+        # (of the body) lets clients revalidate without downloading it again
+        response.add_etag()
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -215,8 +323,17 @@ def detect_script():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        script_type = dictionary_service.detect_script_type(text)
-        return jsonify({'scriptType': script_type})
+        # Large documents stop scanning once the verdict is settled; pass fullScan to count everything
+        detection = dictionary_service.detect_script(text, early_exit=not data.get('fullScan', False))
+        return jsonify({
+            'scriptType': detection['script_type'],
+            'confidence': detection['confidence'],
+            'hanCount': detection['han'],
+            'simplifiedCount': detection['simplified_only'],
+            'traditionalCount': detection['traditional_only'],
+            'charactersExamined': detection['characters_examined'],
+            'earlyExit': detection['early_exit']
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -251,5 +368,99 @@ def get_dictionary_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/dictionary/search', methods=['GET'])
+def search_dictionary():
+    """Search dictionary words by pinyin (tone marks, tone numbers or toneless), with paging"""
+    try:
+        pinyin = request.args.get('pinyin', '')
+        
+        if not pinyin.strip():
+            return jsonify({'error': 'No pinyin provided'}), 400
+        
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
+        except ValueError:
+            return jsonify({'error': 'page and per_page must be integers'}), 400
+        
+        total = dictionary_service.count_by_pinyin(pinyin)
+        matches = dictionary_service.search_by_pinyin(pinyin, offset=(page - 1) * per_page, limit=per_page)
+        
+        return jsonify({
+            'pinyin': pinyin,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'results': [
+                {
+                    'word': word,
+                    'simplified': entry['simplified'],
+                    'pinyin': entry['pinyin'],
+                    'definition': entry['definition'],
+                    'frequency': entry['frequency']
+                }
+                for word, entry in matches
+            ]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/dictionary/matches', methods=['POST'])
+def dictionary_matches():
+    """Find the dictionary words that start at a position in the text (for hover/selection lookups)"""
+    try:
+        data = request.get_json()
+        text = data.get('text', '')
+        pos = data.get('pos', 0)
+        
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+        
+        if not isinstance(pos, int) or not 0 <= pos < len(text):
+            return jsonify({'error': 'pos must be an index into text'}), 400
+        
+        matches = [
+            {
+                'word': word,
+                'length': len(word),
+                'pinyin': dictionary_service.get_pinyin(word),
+                'definition': dictionary_service.get_translation(word)
+            }
+            for word in dictionary_service.prefix_matches(text, pos)
+        ]
+        
+        return jsonify({
+            'pos': pos,
+            'matches': matches,
+            'longest': matches[-1]['word'] if matches else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Cache and upstream counters for this worker process"""
+    try:
+        return jsonify({
+            'translation_mode': translation_service.mode,
+            'offline_translator': translation_service.offline_translator.stats(),
+            'analysis_pipeline': analysis_pipeline.stats(),
+            'deferred_texts': deferred_texts.stats(),
+            'translation_cache': translation_service.translation_cache.stats(),
+            'upstream': translation_service.upstream.stats(),
+            'batch_packing': translation_service.batch_stats.stats(),
+            'single_flight': translation_service.single_flight.stats(),
+            'micro_batcher': translation_service.micro_batcher.stats() if translation_service.micro_batcher else None,
+            'translation_memory': (translation_service.translation_memory.stats()
+                                   if translation_service.translation_memory else None),
+            'cache_keys': {
+                'computed': translation_service.cache_keys,
+                'normalized': translation_service.normalized_keys
+            },
+            'latency_budget': {
+                'seconds': TRANSLATION_BUDGET_SECONDS,
+                'exceeded': translation_service.budget_exceeded
+            }
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,254 @@
+"""
+Analysis Pipeline
+Pinyin, character meanings and word grouping for a text from a single segmentation.
+
+The text is segmented by jieba once. Each distinct word is converted to pinyin once, in
+context (so 银行 reads yín háng, not yín xíng), and each distinct character is looked up
+in the dictionary store's character table once; both are memoized for the request. The
+whole-text pinyin string and the per-character records of /api/analyze are then
+assembled from those tokens, so they always agree with each other.
+
+analyze_compact returns the same analysis with each distinct character reading and word
+listed once in a table that the per-word tokens reference by index, instead of repeating
+definitions in every character record.
+
+Both take the set of fields to compute (FIELDS by default) and skip the stages the
+others need: without 'meanings' no definition is looked up, without 'pinyin' no reading
+is computed, and with neither 'pinyin' nor 'words' the text is not segmented at all.
+"""
+
+import time
+from typing import AbstractSet, Any, Dict, List
+
+import jieba
+from pypinyin import Style, pinyin
+
+from app.services.dictionary_service import dictionary_service
+
+
+# Fields the pipeline computes (/api/analyze adds 'translation')
+FIELDS = frozenset({'pinyin', 'meanings', 'words'})
+
+
+def is_han(char: str) -> bool:
+    return '\u4e00' <= char <= '\u9fff'
+
+
+class AnalysisPipeline:
+    def __init__(self, dictionary=dictionary_service):
+        self.dictionary_service = dictionary
+        self.analyses = 0
+        self.total_seconds = 0.0
+
+    def tokenize(self, text: str, readings: bool = True) -> List[Dict[str, Any]]:
+        """
+        Segment text into words with their per-character readings.
+
+        Returns:
+            One {'word', 'start', 'readings'} dict per jieba word; readings has one entry
+            per character (the character itself where it is not Han, or everywhere when
+            readings is False)
+        """
+        words = jieba.lcut(text, cut_all=False)
+        word_readings = self._readings(dict.fromkeys(words)) if readings else None
+        tokens = []
+        start = 0
+        for word in words:
+            tokens.append({'word': word, 'start': start,
+                           'readings': word_readings[word] if readings else list(word)})
+            start += len(word)
+        return tokens
+
+    def _tokens(self, text: str, include: AbstractSet[str]) -> List[Dict[str, Any]]:
+        """Tokens for the requested fields: one per character when neither pinyin nor words is requested."""
+        if 'pinyin' in include or 'words' in include:
+            return self.tokenize(text, readings='pinyin' in include)
+        return [{'word': char, 'start': start, 'readings': [char]} for start, char in enumerate(text)]
+
+    def _readings(self, words) -> Dict[str, List[str]]:
+        """Per-character readings of distinct words, converting all-Han words in one pypinyin call."""
+        han_words = [word for word in words if all(is_han(char) for char in word)]
+        readings = {}
+        try:
+            # A list is taken as already segmented: each word is read in its own context
+            syllables = [item[0] for item in pinyin(han_words, style=Style.TONE)]
+            if len(syllables) == sum(len(word) for word in han_words):
+                position = 0
+                for word in han_words:
+                    readings[word] = syllables[position:position + len(word)]
+                    position += len(word)
+        except Exception:
+            pass
+
+        for word in words:
+            if word not in readings:
+                readings[word] = [self._character_reading(char) for char in word]
+        return readings
+
+    def _character_reading(self, char: str) -> str:
+        if not is_han(char):
+            return char
+        return self.dictionary_service.char_info.pinyin(char) or char
+
+    @staticmethod
+    def _pinyin_string(tokens: List[Dict[str, Any]]) -> str:
+        """Tone-marked pinyin of the tokens, with runs of non-Han characters kept as they are."""
+        items = []
+        other_run = []
+        for token in tokens:
+            for char, reading in zip(token['word'], token['readings']):
+                if not is_han(char):
+                    other_run.append(char)
+                    continue
+                if other_run:
+                    items.append(''.join(other_run))
+                    other_run = []
+                items.append(reading)
+        if other_run:
+            items.append(''.join(other_run))
+        return ' '.join(items)
+
+    def analyze(self, text: str, include: AbstractSet[str] = FIELDS) -> Dict[str, Any]:
+        """
+        Analyze text for /api/analyze.
+
+        Args:
+            include: fields to compute, out of FIELDS; other stages are skipped
+
+        Returns:
+            {'pinyin': tone-marked pinyin of the whole text (non-Han runs kept as they
+            are), 'character_analysis': one record per character with its pinyin,
+            meaning and word-boundary flags (as TextService.analyze_characters)}.
+            Without 'pinyin' the pinyin string is left out, and so are each record's
+            pinyin, meaning or word fields when not included; {} when nothing is.
+        """
+        with_pinyin = 'pinyin' in include
+        with_meanings = 'meanings' in include
+        with_words = 'words' in include
+        if not (with_pinyin or with_meanings or with_words):
+            return {}
+
+        started = time.perf_counter()
+        meanings: Dict[str, str] = {}
+        characters = []
+
+        tokens = self._tokens(text, include)
+        for token in tokens:
+            word = token['word']
+            length = len(word)
+            for position, (char, reading) in enumerate(zip(word, token['readings'])):
+                record = {'character': char}
+                if not is_han(char):
+                    if with_pinyin:
+                        record['pinyin'] = char
+                    if with_meanings:
+                        record['meaning'] = char
+                    if with_words:
+                        record.update(word=char, word_position=0, word_length=1,
+                                      is_word_start=True, is_word_end=True)
+                    characters.append(record)
+                    continue
+
+                if with_pinyin:
+                    record['pinyin'] = reading
+                if with_meanings:
+                    meaning = meanings.get(char)
+                    if meaning is None:
+                        meaning = meanings[char] = self.dictionary_service.char_info.definition(char) or 'Unknown'
+                    record['meaning'] = meaning
+                if with_words:
+                    record.update(word=word, word_position=position, word_length=length,
+                                  is_word_start=position == 0, is_word_end=position == length - 1)
+                characters.append(record)
+
+        result = {'character_analysis': characters}
+        if with_pinyin:
+            result['pinyin'] = self._pinyin_string(tokens)
+
+        self.analyses += 1
+        self.total_seconds += time.perf_counter() - started
+        return result
+
+    def analyze_compact(self, text: str, include: AbstractSet[str] = FIELDS) -> Dict[str, Any]:
+        """
+        Analyze text for /api/analyze in the compact format.
+
+        Args:
+            include: fields to compute, out of FIELDS; other stages are skipped
+
+        Returns:
+            {'pinyin': as analyze, 'table': one {'text', 'pinyin', 'meaning'} entry per
+            distinct character reading and per distinct multi-character word (whose
+            meaning is None outside the dictionary), 'tokens': one list of table indices
+            per word, [word, first character, ...] for multi-character words and
+            [character] for the rest}
+
+            Words without Han characters are split into one token per character, which
+            is its own pinyin and meaning, as in analyze. Without 'words' every
+            character is a token of its own and the table holds no words; without
+            'pinyin' or 'meanings' the entries and result leave those out; {} when
+            nothing is included.
+        """
+        with_pinyin = 'pinyin' in include
+        with_meanings = 'meanings' in include
+        with_words = 'words' in include
+        if not (with_pinyin or with_meanings or with_words):
+            return {}
+
+        started = time.perf_counter()
+        table = []
+        slots: Dict[tuple, int] = {}
+        compact_tokens = []
+
+        tokens = self._tokens(text, include)
+        for token in tokens:
+            word = token['word']
+            readings = token['readings']
+            indices = []
+            for char, reading in zip(word, readings):
+                index = slots.get((char, reading))
+                if index is None:
+                    index = slots[(char, reading)] = len(table)
+                    entry = {'text': char}
+                    if with_pinyin:
+                        entry['pinyin'] = reading
+                    if with_meanings:
+                        entry['meaning'] = (self.dictionary_service.char_info.definition(char) or 'Unknown') \
+                            if is_han(char) else char
+                    table.append(entry)
+                indices.append(index)
+
+            if len(word) == 1:
+                compact_tokens.append(indices)
+            elif not with_words or not any(is_han(char) for char in word):
+                compact_tokens.extend([index] for index in indices)
+            else:
+                word_reading = ' '.join(readings)
+                index = slots.get((word, word_reading))
+                if index is None:
+                    index = slots[(word, word_reading)] = len(table)
+                    entry = {'text': word}
+                    if with_pinyin:
+                        entry['pinyin'] = word_reading
+                    if with_meanings:
+                        entry['meaning'] = self.dictionary_service.get_translation(word)
+                    table.append(entry)
+                compact_tokens.append([index] + indices)
+
+        result = {'table': table, 'tokens': compact_tokens}
+        if with_pinyin:
+            result['pinyin'] = self._pinyin_string(tokens)
+
+        self.analyses += 1
+        self.total_seconds += time.perf_counter() - started
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'analyses': self.analyses,
+            'mean_ms': round(self.total_seconds / self.analyses * 1000, 3) if self.analyses else None
+        }
+
+
+# Create a singleton instance
+analysis_pipeline = AnalysisPipeline()
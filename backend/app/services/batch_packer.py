@@ -0,0 +1,115 @@
+"""
+Batch Packer
+Packs many short texts into few upstream requests, and maps the results back.
+
+Each item is framed on its own line: the upstream translator keeps line breaks, so the
+translated text splits back into exactly one line per item. Unlike a comma-separated
+list, this survives items that contain commas and translations that add or drop them.
+A chunk whose line count does not match is rejected as a whole instead of being
+misaligned. Items are packed greedily into chunks whose URL-encoded query stays under
+the length the upstream GET endpoint accepts.
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+# Longest URL-encoded q parameter sent in one request
+MAX_QUERY_LENGTH = int(os.getenv('UPSTREAM_MAX_QUERY_LENGTH', '1800'))
+# Most items framed into one request
+MAX_CHUNK_ITEMS = int(os.getenv('UPSTREAM_MAX_CHUNK_ITEMS', '50'))
+
+SEPARATOR = '\n'
+_ENCODED_SEPARATOR_LENGTH = len(quote(SEPARATOR, safe=''))
+_WHITESPACE = re.compile(r'\s+')
+
+
+def frame_item(item: str) -> str:
+    """Collapse whitespace (including line breaks) so the item occupies exactly one line."""
+    return _WHITESPACE.sub(' ', item).strip()
+
+
+def pack_chunks(items: Sequence[str], max_query_length: int = MAX_QUERY_LENGTH,
+                max_items: int = MAX_CHUNK_ITEMS) -> List[Tuple[str, ...]]:
+    """
+    Split items into chunks that each fit in one upstream request.
+
+    Items keep their order. An item too long to share a request gets a chunk of its own.
+    """
+    chunks = []
+    current: List[str] = []
+    length = 0
+    for item in items:
+        item_length = len(quote(frame_item(item), safe=''))
+        added = item_length + (_ENCODED_SEPARATOR_LENGTH if current else 0)
+        if current and (length + added > max_query_length or len(current) >= max_items):
+            chunks.append(tuple(current))
+            current, length, added = [], 0, item_length
+        current.append(item)
+        length += added
+    if current:
+        chunks.append(tuple(current))
+    return chunks
+
+
+def join_chunk(chunk: Sequence[str]) -> str:
+    """Frame the items of a chunk into the text sent upstream."""
+    return SEPARATOR.join(frame_item(item) for item in chunk)
+
+
+def split_chunk(chunk: Sequence[str], translation: str) -> Optional[List[str]]:
+    """
+    Split the upstream translation of a chunk back into one translation per item.
+
+    Returns:
+        Translations in chunk order, or None if the lines do not align with the items
+    """
+    if len(chunk) == 1:
+        return [frame_item(translation)]
+    lines = [line.strip() for line in translation.split(SEPARATOR)]
+    if len(lines) != len(chunk):
+        return None
+    return lines
+
+
+class BatchStats:
+    """Thread-safe counters for how well packed chunks align, reported by /api/metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.aligned_chunks = 0
+        self.misaligned_chunks = 0
+        self.failed_chunks = 0
+        self.items = 0
+        self.aligned_items = 0
+
+    def record(self, items: int, outcome: str) -> None:
+        """Record one chunk; outcome is 'aligned', 'misaligned' or 'failed'."""
+        with self._lock:
+            self.chunks += 1
+            self.items += items
+            if outcome == 'aligned':
+                self.aligned_chunks += 1
+                self.aligned_items += items
+            elif outcome == 'misaligned':
+                self.misaligned_chunks += 1
+            else:
+                self.failed_chunks += 1
+
+    def stats(self) -> Dict:
+        # Failed requests say nothing about framing, so they are left out of the rate
+        answered = self.aligned_chunks + self.misaligned_chunks
+        return {
+            'chunks': self.chunks,
+            'aligned_chunks': self.aligned_chunks,
+            'misaligned_chunks': self.misaligned_chunks,
+            'failed_chunks': self.failed_chunks,
+            'items': self.items,
+            'aligned_items': self.aligned_items,
+            'alignment_rate': round(self.aligned_chunks / answered, 4) if answered else None,
+            'max_query_length': MAX_QUERY_LENGTH,
+            'max_chunk_items': MAX_CHUNK_ITEMS
+        }
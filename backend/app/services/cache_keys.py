@@ -0,0 +1,38 @@
+"""
+Cache Keys
+Canonical form of a text, used as its translation-cache and request-coalescing key.
+
+Texts that differ only in script, whitespace or punctuation style translate the same,
+so they share one key:
+
+- Unicode NFKC: full-width letters, digits and punctuation become their ASCII forms
+- the remaining CJK punctuation is mapped to ASCII equivalents
+- whitespace next to Han characters is removed, other whitespace collapsed
+- the text is converted to simplified script
+"""
+
+import re
+import unicodedata
+from typing import Callable
+
+# CJK punctuation that NFKC leaves alone
+_PUNCTUATION = str.maketrans({
+    '。': '.', '、': ',', '「': '"', '」': '"', '『': '"', '』': '"', '“': '"', '”': '"',
+    '‘': "'", '’': "'", '《': '<', '》': '>', '〈': '<', '〉': '>', '【': '[', '】': ']',
+    '〔': '[', '〕': ']'
+})
+_HAN_SPACE = re.compile(r'(?<=[\u4e00-\u9fff])\s+|\s+(?=[\u4e00-\u9fff])')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def canonical_key(text: str, to_simplified: Callable[[str], str]) -> str:
+    """
+    Canonicalize text for cache lookups.
+
+    Args:
+        text: Text as received
+        to_simplified: Script converter (DictionaryService.convert_to_simplified)
+    """
+    text = unicodedata.normalize('NFKC', text).translate(_PUNCTUATION)
+    text = _WHITESPACE.sub(' ', _HAN_SPACE.sub('', text)).strip()
+    return to_simplified(text)
@@ -0,0 +1,49 @@
+"""
+Character Info
+Build-time data for the per-character table of the dictionary store.
+
+The table has one slot per code point of the CJK Unified Ideographs block
+(U+4E00-U+9FFF), indexed by ord(char) - CJK_FIRST, holding the character's default
+pinyin, its dictionary word index (for the merged definition), stroke count and
+frequency rank. It is compiled into the store's 'CHAR' section and read through
+DictionaryStore.char_info, so per-character lookups are array indexing into memory
+shared by every worker.
+"""
+
+from typing import Optional
+
+CJK_FIRST = 0x4E00
+CJK_LAST = 0x9FFF
+CJK_SIZE = CJK_LAST - CJK_FIRST + 1
+
+# Stroke counts known so far (0 elsewhere)
+STROKE_COUNTS = {
+    '轉': 18, '法': 8, '輪': 15, '李': 7, '洪': 9, '志': 7,
+    '目': 5, '錄': 16, '論': 15, '語': 14, '第': 11, '一': 1,
+    '講': 17, '真': 10, '正': 5, '往': 8, '高': 10, '層': 15,
+    '次': 6, '上': 3, '帶': 11, '人': 2, '不': 4, '同': 6,
+    '有': 6, '善': 12, '忍': 7, '是': 9, '衡': 16, '量': 12,
+    '好': 6, '壞': 19, '唯': 11, '標': 15, '準': 13, '氣': 10,
+    '功': 5, '史': 5, '前': 9, '文': 4, '化': 4, '就': 12,
+    '修': 9, '煉': 13, '為': 9, '甚': 9, '麼': 14, '長': 8,
+    '特': 10, '點': 17
+}
+
+
+def cjk_index(char: str) -> int:
+    """Slot of char in the table, or -1 outside the CJK block."""
+    index = ord(char) - CJK_FIRST if len(char) == 1 else -1
+    return index if 0 <= index < CJK_SIZE else -1
+
+
+def default_pinyin(char: str) -> Optional[str]:
+    """
+    The tone-marked reading pypinyin gives the character on its own (as
+    PinyinService.generate_character_pinyin does), or None if pypinyin has none.
+    """
+    try:
+        from pypinyin import Style, pinyin
+    except ImportError:
+        return None
+    reading = pinyin(char, style=Style.TONE)[0][0]
+    return reading if reading != char else None
@@ -0,0 +1,130 @@
+"""
+Circuit Breaker
+Stops calling the upstream translator while it is failing or slow.
+
+- closed: calls go through; the outcomes of the most recent calls are tracked
+- open: once enough recent calls failed or were slow, calls are rejected immediately
+  for a cool-down period, so callers fall back to dictionary glosses without waiting
+- half-open: after the cool-down a few probe calls go through; if they all succeed
+  quickly the circuit closes, otherwise it opens again
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Recent calls the error and slow-call rates are computed over
+DEFAULT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', '20'))
+# Calls needed in the window before the circuit can open
+DEFAULT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+# Fraction of failed calls that opens the circuit
+DEFAULT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))
+# Calls slower than this (seconds) count as slow
+DEFAULT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '3'))
+# Fraction of slow calls that opens the circuit
+DEFAULT_SLOW_RATE = float(os.getenv('CIRCUIT_SLOW_RATE', '0.5'))
+# Seconds the circuit stays open before probing
+DEFAULT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+# Probe calls allowed (and required to succeed) while half-open
+DEFAULT_HALF_OPEN_CALLS = int(os.getenv('CIRCUIT_HALF_OPEN_CALLS', '3'))
+
+
+class CircuitBreaker:
+    def __init__(self, window: int = DEFAULT_WINDOW, min_calls: int = DEFAULT_MIN_CALLS,
+                 error_rate: float = DEFAULT_ERROR_RATE, slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS,
+                 slow_rate: float = DEFAULT_SLOW_RATE, open_seconds: float = DEFAULT_OPEN_SECONDS,
+                 half_open_calls: int = DEFAULT_HALF_OPEN_CALLS):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # (failed, slow) per recent call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance()
+            return self._state
+
+    def _advance(self) -> None:
+        """Move from open to half-open once the cool-down has passed (lock held)."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_started = 0
+            self._probes_passed = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; every allowed call must be recorded."""
+        with self._lock:
+            self._advance()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_started < self.half_open_calls:
+                self._probes_started += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool, latency: float) -> None:
+        """Record the outcome of an allowed call."""
+        slow = latency > self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not success or slow:
+                    self._open()
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.half_open_calls:
+                        self._state = CLOSED
+                        self._outcomes.clear()
+                        print("Upstream circuit closed")
+                return
+            if self._state == OPEN:
+                # A call that was allowed before the circuit opened
+                return
+
+            self._outcomes.append((not success, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, was_slow in self._outcomes if was_slow)
+            if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        print(f"Upstream circuit opened for {self.open_seconds:g}s")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._advance()
+            calls = len(self._outcomes)
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+            return {
+                'state': self._state,
+                'window_calls': calls,
+                'window_error_rate': round(failures / calls, 4) if calls else 0.0,
+                'window_slow_rate': round(slow_calls / calls, 4) if calls else 0.0,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
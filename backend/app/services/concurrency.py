@@ -0,0 +1,89 @@
+"""
+Concurrency helpers
+Shared thread pool for blocking upstream work, and deadline-bounded fan-out over it.
+
+Upstream translation is network-bound, so a thread pool gives real concurrency under
+gunicorn's sync workers. The pool is shared by every request in the process, which
+caps the number of concurrent upstream calls per worker.
+
+Request stages that wait on the network (e.g. the translation in /api/analyze) run on a
+second pool while the request thread does the local work. They wait on upstream calls
+themselves, so they must not run on the upstream pool, where enough of them could
+occupy every thread and wait forever.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', '8'))
+STAGE_CONCURRENCY = int(os.getenv('STAGE_CONCURRENCY', '8'))
+
+T = TypeVar('T', bound=Hashable)
+R = TypeVar('R')
+
+# Create a singleton executor for upstream calls
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY, thread_name_prefix='upstream')
+# Create a singleton executor for request stages that wait on upstream calls
+stage_executor = ThreadPoolExecutor(max_workers=STAGE_CONCURRENCY, thread_name_prefix='stage')
+
+
+def timed(func: Callable[..., R], *args, **kwargs) -> Tuple[R, float]:
+    """Call func, returning (its result, milliseconds it took)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def map_with_deadline(func: Callable[[T], R], items: Iterable[T], timeout: float,
+                      max_concurrency: Optional[int] = None,
+                      executor: ThreadPoolExecutor = upstream_executor) -> Tuple[Dict[T, R], List[T]]:
+    """
+    Apply func to each item on the executor, at most max_concurrency at a time, until
+    the timeout expires.
+
+    Calls still running at the deadline are left to finish in the background (so any
+    caching they do still happens), but their results are not waited for.
+
+    Args:
+        func: Function to apply to each item
+        items: Distinct items to process
+        timeout: Seconds until the deadline
+        max_concurrency: Items in flight at once (default: UPSTREAM_CONCURRENCY)
+        executor: Pool to run on
+
+    Returns:
+        (results for items that completed, items that did not complete by the deadline,
+        in input order). An item whose call raised is reported as not completed.
+    """
+    items = list(items)
+    deadline = time.monotonic() + timeout
+    limit = max_concurrency or UPSTREAM_CONCURRENCY
+
+    results: Dict[T, R] = {}
+    in_flight: Dict[Future, T] = {}
+    next_index = 0
+
+    while next_index < len(items) or in_flight:
+        while next_index < len(items) and len(in_flight) < limit:
+            item = items[next_index]
+            in_flight[executor.submit(func, item)] = item
+            next_index += 1
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        done, _ = wait(in_flight, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            item = in_flight.pop(future)
+            if future.exception() is None:
+                results[item] = future.result()
+            else:
+                print(f"Error processing '{item}': {future.exception()}")
+
+    incomplete = [item for item in items if item not in results]
+    return results, incomplete
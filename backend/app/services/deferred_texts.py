@@ -0,0 +1,93 @@
+"""
+Deferred Texts
+Texts whose translation /api/analyze left out (include without 'translation'), by
+content hash, so that any worker can translate them later for
+/api/analyze/translation/<content_hash>.
+
+The texts are kept in a cache of their own with the same two tiers as the translation
+cache: a per-process LRU in front of a SQLite table shared by every worker, so the
+follow-up request does not have to reach the worker that served the first one. Entries
+expire after DEFERRED_TEXT_TTL; the translations themselves go through
+TranslationService and its cache as usual.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Optional
+
+from app.services.translation_cache import MemoryCache, SQLiteCache, TranslationCache
+
+# Shared on-disk tier ('' keeps texts per process only)
+DEFAULT_DEFERRED_PATH = os.getenv(
+    'DEFERRED_TEXTS_PATH',
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '../../data/deferred_texts.sqlite3'))
+)
+DEFAULT_MAX_ENTRIES = int(os.getenv('DEFERRED_TEXTS_MAX_ENTRIES', '100000'))
+# Seconds a text stays fetchable after it was deferred (1 day)
+DEFERRED_TEXT_TTL = float(os.getenv('DEFERRED_TEXT_TTL', str(24 * 3600)))
+
+# 128 bits of SHA-256, as lowercase hex
+_CONTENT_HASH = re.compile(r'^[0-9a-f]{32}$')
+
+
+def content_hash(text: str) -> str:
+    """Content hash of a text as sent to /api/analyze."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+class DeferredTexts:
+    def __init__(self, cache: TranslationCache, ttl: float = DEFERRED_TEXT_TTL):
+        self.cache = cache
+        self.ttl = ttl
+        self.deferred = 0
+        self.fetched = 0
+        self.unknown = 0
+
+    def add(self, text: str) -> str:
+        """Remember text for a later translation; return its content hash."""
+        key = content_hash(text)
+        # Other workers only see the shared tier, so check the row there rather than this
+        # worker's copy (it may have been evicted); a row with over half its lifetime left
+        # is kept as is, so repeated texts cost a read instead of a write lock
+        shared = self.cache.shared
+        entry = shared.peek(key) if shared is not None else None
+        if entry is None or entry[2] - time.time() < self.ttl / 2:
+            self.cache.set(key, text, self.ttl)
+        self.deferred += 1
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        """The text with this content hash, or None if it is unknown or expired."""
+        text = self.cache.get(key) if _CONTENT_HASH.match(key) else None
+        if text is None:
+            self.unknown += 1
+        else:
+            self.fetched += 1
+        return text
+
+    def stats(self) -> Dict:
+        return {
+            'deferred': self.deferred,
+            'fetched': self.fetched,
+            'unknown': self.unknown,
+            'cache': self.cache.stats()
+        }
+
+
+def create_deferred_texts() -> DeferredTexts:
+    """Build the store from the DEFERRED_TEXT* environment settings."""
+    shared = None
+    if DEFAULT_DEFERRED_PATH:
+        try:
+            shared = SQLiteCache(DEFAULT_DEFERRED_PATH, DEFAULT_MAX_ENTRIES, DEFERRED_TEXT_TTL)
+            print(f"Shared deferred texts at {DEFAULT_DEFERRED_PATH}")
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: shared deferred texts disabled: {e}")
+    return DeferredTexts(TranslationCache(MemoryCache(ttl=DEFERRED_TEXT_TTL), shared))
+
+
+# Create a singleton instance
+deferred_texts = create_deferred_texts()
@@ -6,114 +6,120 @@ Provides dictionary lookup, script detection, and conversion between simplified/
 from typing import Dict, List, Optional, Tuple
 import sys
 import os
+import tempfile
 
-# Add backend directory to path to import local_dictionary
+# Add backend directory to path to import local_dictionary (fallback when no store is compiled)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
-from data.local_dictionary import DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED
+from app.services.dictionary_store import (
+    FORMAT_VERSION, DictionaryStore, normalize_pinyin_query, open_dictionary_store, source_digest, write_dictionary_store
+)
+from app.services.script_converter import ScriptConverter
+from app.services.script_detector import ScriptDetector
+
+# Compiled binary dictionary, shared between worker processes via mmap
+DICTIONARY_STORE_PATH = os.getenv(
+    'DICTIONARY_STORE_PATH',
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '../../data/dictionary.bin'))
+)
+# Generated module the store is compiled from
+LOCAL_DICTIONARY_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../data/local_dictionary.py'))
+
+
+def load_dictionary_store(store_path: str = DICTIONARY_STORE_PATH) -> DictionaryStore:
+    """
+    Open the memory-mapped dictionary store.
+
+    If the store is missing, was written in an older format or was compiled from a
+    different data/local_dictionary.py, it is compiled from the module first so later
+    workers can map it directly. When the data
+    directory is not writable the store is compiled to the temporary directory instead,
+    under a name derived from the format version and source digest, so every worker
+    (and later restarts) maps the same file rather than compiling its own.
+    """
+    # None when only the compiled store is deployed: then any compatible store is used
+    digest = source_digest(LOCAL_DICTIONARY_PATH)
+    store = open_dictionary_store(store_path, digest)
+    if store:
+        print(f"Dictionary store mapped from {store_path}")
+        return store
+    
+    if not os.access(os.path.dirname(os.path.abspath(store_path)), os.W_OK):
+        # An earlier worker (or run) may already have compiled the fallback
+        store_path = os.path.join(tempfile.gettempdir(),
+                                  f"dictionary-v{FORMAT_VERSION}-{digest.hex() if digest else 'unversioned'}.bin")
+        store = open_dictionary_store(store_path, digest)
+        if store:
+            print(f"Dictionary store mapped from {store_path}")
+            return store
+    
+    print(f"Warning: dictionary store missing or outdated at {store_path}, compiling from data.local_dictionary")
+    from data.local_dictionary import DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED
+    
+    # Written atomically (temporary file and rename), so workers compiling at the same
+    # time just replace each other's identical copy
+    write_dictionary_store(DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED, store_path, digest)
+    print(f"Compiled dictionary store to {store_path}")
+    return DictionaryStore(store_path)
 
 
 class DictionaryService:
-    def __init__(self):
-        self.dictionary = DICTIONARY
-        self.simp_to_trad = SIMPLIFIED_TO_TRADITIONAL
-        self.trad_to_simp = TRADITIONAL_TO_SIMPLIFIED
+    def __init__(self, store_path: str = DICTIONARY_STORE_PATH):
+        self.store = load_dictionary_store(store_path)
+        self.dictionary = self.store.dictionary
+        self.simp_to_trad = self.store.simplified_to_traditional
+        self.trad_to_simp = self.store.traditional_to_simplified
+        # Per-character pinyin, definition and stroke data over the CJK block
+        self.char_info = self.store.char_info
+        
+        # Trie over traditional and simplified forms, each mapped to the traditional key
+        # (a double-array trie compiled into the store, shared by every worker)
+        self.word_trie = self.store.word_trie
+        
+        # Built from the compiled conversion and classification tables, not the full mappings
+        self.to_traditional = ScriptConverter(self.store.to_traditional_mapping)
+        self.to_simplified = ScriptConverter(self.store.to_simplified_mapping)
+        self.script_detector = ScriptDetector.from_flags(self.store.script_flags)
         
         print(f"Dictionary loaded: {len(self.dictionary)} entries")
     
-    def lookup(self, word: str, pinyin: Optional[str] = None) -> Optional[Dict]:
+    def _word_index(self, word: str) -> int:
         """
-        Look up a word in the dictionary.
-        
-        Args:
-            word: The Chinese word to look up
-            pinyin: Optional pinyin to disambiguate (if word has multiple pronunciations)
+        Resolve a word (traditional or simplified) to its record index in the store.
         
         Returns:
-            Dictionary entry or None if not found
+            The record index, or -1 if the word is not in the dictionary
         """
-        # Try direct lookup (traditional)
-        if word in self.dictionary:
-            entries = self.dictionary[word]
-            
-            # If pinyin provided, find matching entry
-            if pinyin:
-                for entry in entries:
-                    if entry['pinyin'].lower() == pinyin.lower():
-                        return entry
-            
-            # When no pinyin specified, prefer non-surname entries
-            return self._get_preferred_entry(entries)
-        
-        # Try converting simplified to traditional and lookup
-        if word in self.simp_to_trad:
-            traditional = self.simp_to_trad[word]
-            if traditional in self.dictionary:
-                entries = self.dictionary[traditional]
-                
-                if pinyin:
-                    for entry in entries:
-                        if entry['pinyin'].lower() == pinyin.lower():
-                            return entry
-                
-                # When no pinyin specified, prefer non-surname entries
-                return self._get_preferred_entry(entries)
-        
-        return None
+        index = self.dictionary.index_of(word)
+        if index < 0 and word in self.simp_to_trad:
+            index = self.dictionary.index_of(self.simp_to_trad[word])
+        return index
     
-    def _get_preferred_entry(self, entries: List[Dict]) -> Optional[Dict]:
+    def lookup(self, word: str, pinyin: Optional[str] = None) -> Optional[Dict]:
         """
-        Get the preferred entry from a list of entries.
-        
-        Priority order:
-        1. Lowercase pinyin (common words) over capitalized (proper nouns)
-        2. Non-surname entries over surname entries
-        3. First entry if all else equal
+        Look up a word in the dictionary.
         
         Args:
-            entries: List of dictionary entries
+            word: The Chinese word to look up
+            pinyin: Optional pinyin to disambiguate (if word has multiple pronunciations)
         
         Returns:
-            The preferred entry, or None if list is empty
+            Dictionary entry or None if not found
         """
-        if not entries:
+        # Direct lookup (traditional), then via simplified -> traditional
+        index = self._word_index(word)
+        if index < 0:
             return None
         
-        # Separate entries by type
-        lowercase_non_surname = []
-        lowercase_surname = []
-        capitalized_non_surname = []
-        capitalized_surname = []
-        
-        for entry in entries:
-            pinyin = entry.get('pinyin', '')
-            definition = entry.get('definition', '').lower()
-            is_surname = 'surname' in definition
-            is_capitalized = pinyin and pinyin[0].isupper()
-            
-            if not is_capitalized:
-                if not is_surname:
-                    lowercase_non_surname.append(entry)
-                else:
-                    lowercase_surname.append(entry)
-            else:
-                if not is_surname:
-                    capitalized_non_surname.append(entry)
-                else:
-                    capitalized_surname.append(entry)
-        
-        # Return in priority order
-        if lowercase_non_surname:
-            return lowercase_non_surname[0]
-        if lowercase_surname:
-            return lowercase_surname[0]
-        if capitalized_non_surname:
-            return capitalized_non_surname[0]
-        if capitalized_surname:
-            return capitalized_surname[0]
+        # If pinyin provided, find matching entry
+        if pinyin:
+            for entry in self.dictionary.entries_at(index):
+                if entry['pinyin'].lower() == pinyin.lower():
+                    return entry
         
-        # Fallback to first entry
-        return entries[0]
+        # When no pinyin specified, use the preferred entry chosen at compile time
+        # (common words over proper nouns over surnames)
+        return self.dictionary.preferred_entry(index)
     
     def lookup_all_variants(self, word: str) -> List[Dict]:
         """
@@ -122,17 +128,10 @@ class DictionaryService:
         Returns:
             List of all dictionary entries for this word
         """
-        # Try direct lookup
-        if word in self.dictionary:
-            return self.dictionary[word]
-        
-        # Try converting simplified to traditional
-        if word in self.simp_to_trad:
-            traditional = self.simp_to_trad[word]
-            if traditional in self.dictionary:
-                return self.dictionary[traditional]
-        
-        return []
+        index = self._word_index(word)
+        if index < 0:
+            return []
+        return self.dictionary.entries_at(index)
     
     def detect_script_type(self, text: str) -> str:
         """
@@ -149,89 +148,65 @@ class DictionaryService:
         if not text:
             return 'traditional'
         
-        simp_only_count = 0
-        trad_only_count = 0
-        total_chinese_chars = 0
-        
-        for char in text:
-            # Only check Chinese characters
-            if not ('\u4e00' <= char <= '\u9fff'):
-                continue
-            
-            total_chinese_chars += 1
-            
-            # Check if this character has a different form
-            if char in self.simp_to_trad:
-                traditional = self.simp_to_trad[char]
-                if traditional != char:
-                    simp_only_count += 1
-            
-            if char in self.trad_to_simp:
-                simplified = self.trad_to_simp[char]
-                if simplified != char:
-                    trad_only_count += 1
-        
-        # If very few Chinese characters, default to traditional
-        if total_chinese_chars < 5:
-            return 'traditional'
-        
-        # Calculate ratios
-        simp_ratio = simp_only_count / total_chinese_chars if total_chinese_chars > 0 else 0
-        trad_ratio = trad_only_count / total_chinese_chars if total_chinese_chars > 0 else 0
+        return self.detect_script(text)['script_type']
+    
+    def detect_script(self, text: str, early_exit: bool = True) -> Dict:
+        """
+        Detect the script of text, with the counts and confidence behind the verdict.
         
-        # If difference is small, consider it mixed
-        if abs(simp_ratio - trad_ratio) < 0.1:
-            return 'mixed'
+        Args:
+            text: The text to classify
+            early_exit: Stop scanning large texts once the verdict is statistically settled
         
-        # Return the dominant type
-        if simp_only_count > trad_only_count:
-            return 'simplified'
-        elif trad_only_count > simp_only_count:
-            return 'traditional'
-        else:
-            # No clear distinction, default to traditional
-            return 'traditional'
+        Returns:
+            Dict with script_type, han, simplified_only, traditional_only, confidence,
+            characters_examined and early_exit (see ScriptDetector.detect)
+        """
+        return self.script_detector.detect(text, early_exit)
     
     def convert_to_traditional(self, text: str) -> str:
         """
         Convert simplified Chinese to traditional.
+        Multi-character word mappings take precedence over single characters.
         Characters without mapping remain unchanged.
         """
-        result = []
-        for char in text:
-            if char in self.simp_to_trad:
-                result.append(self.simp_to_trad[char])
-            else:
-                result.append(char)
-        return ''.join(result)
+        return self.to_traditional.convert(text)
     
     def convert_to_simplified(self, text: str) -> str:
         """
         Convert traditional Chinese to simplified.
+        Multi-character word mappings take precedence over single characters.
         Characters without mapping remain unchanged.
         """
-        result = []
-        for char in text:
-            if char in self.trad_to_simp:
-                result.append(self.trad_to_simp[char])
-            else:
-                result.append(char)
-        return ''.join(result)
+        return self.to_simplified.convert(text)
     
     def is_in_dictionary(self, word: str) -> bool:
         """
         Check if a word exists in the dictionary.
         Checks both traditional and simplified forms.
         """
-        if word in self.dictionary:
-            return True
+        return self._word_index(word) >= 0
+    
+    def prefix_matches(self, text: str, pos: int = 0) -> List[str]:
+        """
+        Find all dictionary words (traditional or simplified) that start at text[pos].
         
-        if word in self.simp_to_trad:
-            traditional = self.simp_to_trad[word]
-            if traditional in self.dictionary:
-                return True
+        Returns:
+            The matching words as they appear in text, shortest first
+        """
+        return [text[pos:end] for end, _ in self.word_trie.prefix_matches(text, pos)]
+    
+    def longest_match(self, text: str, pos: int = 0) -> Optional[str]:
+        """
+        Find the longest dictionary word (traditional or simplified) that starts at text[pos].
         
-        return False
+        Returns:
+            The matching word as it appears in text, or None if no word starts there
+        """
+        match = self.word_trie.longest_match(text, pos)
+        if match:
+            return text[pos:match[0]]
+        return None
     
     def get_translation(self, word: str, pinyin: Optional[str] = None) -> Optional[str]:
         """
@@ -251,91 +226,11 @@ class DictionaryService:
                 return entry['definition']
             return None
         
-        # Otherwise, combine all entries sorted by priority
-        all_entries = self.lookup_all_variants(word)
-        if not all_entries:
+        # Otherwise, use the combined definition precomputed at compile time
+        index = self._word_index(word)
+        if index < 0:
             return None
-        
-        # Sort entries by priority
-        sorted_entries = self._sort_entries_by_priority(all_entries)
-        
-        # Combine definitions from all entries
-        return self._combine_definitions(sorted_entries)
-    
-    def _sort_entries_by_priority(self, entries: List[Dict]) -> List[Dict]:
-        """
-        Sort entries by priority:
-        1. Lowercase pinyin, non-surname (common words)
-        2. Capitalized pinyin, non-surname (proper nouns)
-        3. Lowercase pinyin, surname
-        4. Capitalized pinyin, surname
-        """
-        lowercase_non_surname = []
-        capitalized_non_surname = []
-        lowercase_surname = []
-        capitalized_surname = []
-        
-        for entry in entries:
-            pinyin = entry.get('pinyin', '')
-            definition = entry.get('definition', '').lower()
-            is_surname = 'surname' in definition
-            is_capitalized = pinyin and pinyin[0].isupper()
-            
-            if not is_capitalized:
-                if not is_surname:
-                    lowercase_non_surname.append(entry)
-                else:
-                    lowercase_surname.append(entry)
-            else:
-                if not is_surname:
-                    capitalized_non_surname.append(entry)
-                else:
-                    capitalized_surname.append(entry)
-        
-        # Combine in priority order
-        return lowercase_non_surname + capitalized_non_surname + lowercase_surname + capitalized_surname
-    
-    def _combine_definitions(self, sorted_entries: List[Dict]) -> str:
-        """
-        Combine definitions from multiple entries (different pinyin variants).
-        Parse each entry's definitions, track numbering, and combine without duplicates.
-        """
-        import re
-        
-        all_definitions = []
-        seen_definitions = set()  # Track to avoid duplicates
-        
-        for entry in sorted_entries:
-            definition_str = entry.get('definition', '')
-            
-            # Split by semicolon and numbered pattern (1. 2. 3. etc.)
-            parts = re.split(r';\s*', definition_str)
-            
-            for part in parts:
-                part = part.strip()
-                if not part:
-                    continue
-                
-                # Remove leading number if present
-                clean_part = re.sub(r'^\d+\.\s*', '', part)
-                clean_part = clean_part.strip()
-                
-                # Normalize for comparison (lowercase, no extra spaces)
-                normalized = clean_part.lower().strip()
-                
-                # Skip if we've seen this definition already
-                if normalized in seen_definitions:
-                    continue
-                
-                seen_definitions.add(normalized)
-                all_definitions.append(clean_part)
-        
-        # Renumber all definitions sequentially
-        if not all_definitions:
-            return ''
-        
-        numbered = [f"{i+1}. {def_text}" for i, def_text in enumerate(all_definitions)]
-        return '; '.join(numbered)
+        return self.dictionary.combined_definition(index)
     
     def get_pinyin(self, word: str) -> Optional[str]:
         """
@@ -350,30 +245,45 @@ class DictionaryService:
             return entry['pinyin']
         return None
     
-    def search_by_pinyin(self, pinyin: str) -> List[Tuple[str, Dict]]:
+    def search_by_pinyin(self, pinyin: str, offset: int = 0, limit: Optional[int] = None) -> List[Tuple[str, Dict]]:
         """
-        Search for words by pinyin.
+        Search for words by pinyin using the prebuilt pinyin index.
+        
+        Accepts pinyin with tone marks ('nǐ hǎo'), without tones ('ni hao') or with
+        tone numbers ('ni3 hao3'). Case and extra whitespace are ignored.
+        
+        Args:
+            pinyin: The pinyin to search for
+            offset: Number of matches to skip (for paging)
+            limit: Maximum number of matches to return (None for all)
         
         Returns:
-            List of (word, entry) tuples matching the pinyin
+            List of (word, entry) tuples matching the pinyin, in dictionary order
         """
-        results = []
-        pinyin_lower = pinyin.lower().strip()
+        key = normalize_pinyin_query(pinyin)
+        if not key:
+            return []
         
-        for word, entries in self.dictionary.items():
-            for entry in entries:
-                if entry['pinyin'].lower() == pinyin_lower:
-                    results.append((word, entry))
-        
-        return results
+        entry_ids = self.store.pinyin_index.postings(key, offset, limit)
+        return [self.dictionary.entry_with_word(entry_id) for entry_id in entry_ids]
+    
+    def count_by_pinyin(self, pinyin: str) -> int:
+        """
+        Count the words matching a pinyin search (see search_by_pinyin).
+        """
+        key = normalize_pinyin_query(pinyin)
+        if not key:
+            return 0
+        return self.store.pinyin_index.count(key)
     
     def get_dictionary_stats(self) -> Dict:
         """
         Get statistics about the dictionary.
         """
         total_words = len(self.dictionary)
-        total_entries = sum(len(entries) for entries in self.dictionary.values())
-        words_with_multiple_pinyin = sum(1 for entries in self.dictionary.values() if len(entries) > 1)
+        # Counted from the fixed-size records, without decoding any entry
+        total_entries = self.dictionary.entry_count
+        words_with_multiple_pinyin = self.dictionary.multi_entry_words()
         
         return {
             'total_words': total_words,
@@ -0,0 +1,959 @@
+"""
+Dictionary Store
+Compiled, memory-mapped binary format for the local dictionary.
+
+The generated data/local_dictionary.py module has to be parsed and unmarshalled by
+every worker process, and each worker keeps its own copy of the tables. The binary
+store is written once at build time and opened with mmap, so all workers share a
+single page-cache copy and startup only reads a small header.
+
+File layout (all integers little-endian):
+    header      magic (8 bytes), version (u32), section count (u32), source digest
+                (16 bytes: BLAKE2b of the local_dictionary.py the store was compiled
+                from, zeros if unknown)
+    directory   one (name: 4 bytes, offset: u64, size: u64) record per section
+    sections    'STRS' string pool (UTF-8)
+                'WORD' word records sorted by UTF-8 key bytes, each carrying the
+                       precomputed combined definition and preferred entry
+                'ENTR' entry records, grouped by word
+                'S2T_' simplified -> traditional records sorted by key bytes
+                'T2S_' traditional -> simplified records sorted by key bytes
+                'PINY' normalized pinyin key records sorted by key bytes
+                'POST' pinyin posting lists (u32 entry indices)
+                'CHAR' per-character table over the CJK block (see char_info): a
+                       syllable list, then columns indexed by ord(char) - 0x4E00 of
+                       word index (i32), combined definition off/len (u32 each),
+                       frequency (f32), pinyin syllable (u16) and stroke count (u8)
+                'TRIE' double-array trie over every surface form (traditional words and
+                       their entries' simplified forms) for DictionaryService.word_trie:
+                       header, then base, check and word index (i32 each) per node
+                'S2TX' simplified -> traditional records ScriptConverter uses (see
+                'T2SX' ScriptConverter.reduced_mapping), sorted by key bytes
+                'SCRP' script classification flags per CJK code point (see
+                       script_detector.classification_flags)
+
+Sections start on 8-byte boundaries, so the 'CHAR' and 'TRIE' columns can be viewed in
+place as typed arrays. With the trie and the converter and detector tables compiled
+here, a worker's dictionary service starts without decoding the dictionary.
+
+A store whose source digest differs from the current data/local_dictionary.py is
+treated as stale (see open_dictionary_store), so editing the module triggers a rebuild.
+
+Lookups are binary searches over the sorted record tables. Sorting by UTF-8 bytes
+matches Python's code point ordering of str, so iteration order is the same as
+sorted(DICTIONARY).
+
+The entry priority rules used by DictionaryService (common words before proper nouns
+before surnames) are applied here at compile time, so requests never re-sort entries
+or re-split definitions.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+import unicodedata
+from collections import defaultdict
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.char_info import CJK_FIRST, CJK_SIZE, STROKE_COUNTS, cjk_index, default_pinyin
+from app.services.script_converter import ScriptConverter
+from app.services.script_detector import classification_flags
+
+MAGIC = b'CNDICT\x00\x00'
+FORMAT_VERSION = 6
+
+_HEADER = struct.Struct('<8sII16s')
+NO_SOURCE_DIGEST = b'\x00' * 16
+_SECTION = struct.Struct('<4sQQ')
+SECTION_ALIGNMENT = 8
+
+# key_off, key_len, entry_start, entry_count, preferred_entry, combined_off, combined_len
+_WORD_RECORD = struct.Struct('<IIIIIII')
+# word_index, pinyin_off, pinyin_len, definition_off, definition_len,
+# simplified_off, simplified_len, frequency
+_ENTRY_RECORD = struct.Struct('<IIIIIIId')
+# key_off, key_len, value_off, value_len
+_MAPPING_RECORD = struct.Struct('<IIII')
+# key_off, key_len, posting_start, posting_count
+_PINYIN_RECORD = struct.Struct('<IIII')
+# character count, syllable count; then (off, len) per syllable
+_CHAR_HEADER = struct.Struct('<II')
+_SYLLABLE_RECORD = struct.Struct('<II')
+# node count, alphabet_off, alphabet_len, word count, longest word
+_TRIE_HEADER = struct.Struct('<IIIII')
+
+# Combining tone marks (NFD) -> tone number; the diaeresis of ü is kept
+_TONE_MARKS = {'\u0304': '1', '\u0301': '2', '\u030c': '3', '\u0300': '4'}
+
+# Number of decoded lookups each table keeps per process
+LOOKUP_CACHE_SIZE = 8192
+
+
+class _StringPool:
+    """Collects UTF-8 strings into one blob, storing each distinct string once."""
+
+    def __init__(self):
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def add(self, value: str) -> Tuple[int, int]:
+        if value in self._offsets:
+            return self._offsets[value]
+        encoded = value.encode('utf-8')
+        location = (self._size, len(encoded))
+        self._offsets[value] = location
+        self._chunks.append(encoded)
+        self._size += len(encoded)
+        return location
+
+    def to_bytes(self) -> bytes:
+        return b''.join(self._chunks)
+
+
+def _sort_key(value: str) -> bytes:
+    return value.encode('utf-8')
+
+
+def _clean_pinyin(pinyin: str) -> str:
+    """Lowercase, collapse whitespace and spell ü consistently (v and u: are accepted)."""
+    pinyin = ' '.join(pinyin.lower().split())
+    pinyin = pinyin.replace('u:', 'ü').replace('v', 'ü')
+    return unicodedata.normalize('NFC', pinyin)
+
+
+def _split_tones(syllable: str) -> Tuple[str, List[str]]:
+    """Strip tone marks from a syllable, returning (toneless syllable, tone numbers found)."""
+    tones = []
+    chars = []
+    for char in unicodedata.normalize('NFD', syllable):
+        if char in _TONE_MARKS:
+            tones.append(_TONE_MARKS[char])
+        else:
+            chars.append(char)
+    return unicodedata.normalize('NFC', ''.join(chars)), tones
+
+
+def pinyin_index_keys(pinyin: str) -> List[str]:
+    """
+    Normalized keys under which an entry's pinyin is indexed.
+    
+    'Nǐ hǎo' is indexed as 'nǐ hǎo' (exact with tones), 'ni hao' (toneless)
+    and 'ni3 hao3' (numbered tones, neutral tone as 5). Numbered keys are only
+    produced when every syllable carries at most one tone mark.
+    """
+    exact = _clean_pinyin(pinyin)
+    if not exact:
+        return []
+    
+    toneless = []
+    numbered = []
+    for syllable in exact.split(' '):
+        bare, tones = _split_tones(syllable)
+        toneless.append(bare)
+        if len(tones) > 1:
+            numbered = None
+        elif numbered is not None:
+            numbered.append(bare + (tones[0] if tones else '5'))
+    
+    keys = [exact, ' '.join(toneless)]
+    if numbered is not None:
+        keys.append(' '.join(numbered))
+    return list(dict.fromkeys(keys))
+
+
+def normalize_pinyin_query(pinyin: str) -> str:
+    """
+    Normalize a search query to one of the index key forms.
+    
+    Queries with tone marks or without tones are matched as-is; queries using tone
+    numbers get an explicit 5 on syllables that have no number (e.g. 'ni3 hao3 ma').
+    """
+    query = _clean_pinyin(pinyin)
+    if not any(char.isdigit() for char in query):
+        return query
+    
+    syllables = []
+    for syllable in query.split(' '):
+        if syllable[-1] == '0':
+            syllable = syllable[:-1] + '5'
+        elif not syllable[-1].isdigit():
+            syllable += '5'
+        syllables.append(syllable)
+    return ' '.join(syllables)
+
+
+def _priority_groups(entries: List[Dict]) -> Tuple[List[int], List[int], List[int], List[int]]:
+    """
+    Split entry indices into (lowercase non-surname, lowercase surname,
+    capitalized non-surname, capitalized surname) groups, preserving order.
+    """
+    lowercase_non_surname = []
+    lowercase_surname = []
+    capitalized_non_surname = []
+    capitalized_surname = []
+    
+    for index, entry in enumerate(entries):
+        pinyin = entry.get('pinyin', '')
+        definition = entry.get('definition', '').lower()
+        is_surname = 'surname' in definition
+        is_capitalized = pinyin and pinyin[0].isupper()
+        
+        if not is_capitalized:
+            if not is_surname:
+                lowercase_non_surname.append(index)
+            else:
+                lowercase_surname.append(index)
+        else:
+            if not is_surname:
+                capitalized_non_surname.append(index)
+            else:
+                capitalized_surname.append(index)
+    
+    return lowercase_non_surname, lowercase_surname, capitalized_non_surname, capitalized_surname
+
+
+def preferred_entry_index(entries: List[Dict]) -> int:
+    """
+    Get the index of the preferred entry from a list of entries.
+    
+    Priority order:
+    1. Lowercase pinyin (common words) over capitalized (proper nouns)
+    2. Non-surname entries over surname entries
+    3. First entry if all else equal
+    
+    Returns:
+        Index into entries, or -1 if the list is empty
+    """
+    if not entries:
+        return -1
+    
+    for group in _priority_groups(entries):
+        if group:
+            return group[0]
+    
+    return 0
+
+
+def sort_entries_by_priority(entries: List[Dict]) -> List[Dict]:
+    """
+    Sort entries by priority:
+    1. Lowercase pinyin, non-surname (common words)
+    2. Capitalized pinyin, non-surname (proper nouns)
+    3. Lowercase pinyin, surname
+    4. Capitalized pinyin, surname
+    """
+    lowercase_non_surname, lowercase_surname, capitalized_non_surname, capitalized_surname = \
+        _priority_groups(entries)
+    order = lowercase_non_surname + capitalized_non_surname + lowercase_surname + capitalized_surname
+    return [entries[i] for i in order]
+
+
+def combine_definitions(sorted_entries: List[Dict]) -> str:
+    """
+    Combine definitions from multiple entries (different pinyin variants).
+    Parse each entry's definitions, track numbering, and combine without duplicates.
+    """
+    all_definitions = []
+    seen_definitions = set()  # Track to avoid duplicates
+    
+    for entry in sorted_entries:
+        definition_str = entry.get('definition', '')
+        
+        # Split by semicolon and numbered pattern (1. 2. 3. etc.)
+        parts = re.split(r';\s*', definition_str)
+        
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            
+            # Remove leading number if present
+            clean_part = re.sub(r'^\d+\.\s*', '', part)
+            clean_part = clean_part.strip()
+            
+            # Normalize for comparison (lowercase, no extra spaces)
+            normalized = clean_part.lower().strip()
+            
+            # Skip if we've seen this definition already
+            if normalized in seen_definitions:
+                continue
+            
+            seen_definitions.add(normalized)
+            all_definitions.append(clean_part)
+    
+    # Renumber all definitions sequentially
+    if not all_definitions:
+        return ''
+    
+    numbered = [f"{i+1}. {def_text}" for i, def_text in enumerate(all_definitions)]
+    return '; '.join(numbered)
+
+
+def _char_section(dictionary: Dict[str, List[Dict]], word_locations: Dict[str, Tuple[int, int, int]],
+                  simp_to_trad: Dict[str, str], pool: _StringPool) -> bytes:
+    """Build the 'CHAR' section: per-code-point columns over the CJK block."""
+    syllables = {'': 0}
+    word_index = array('i', [-1]) * CJK_SIZE
+    definition_offsets = array('I', [0]) * CJK_SIZE
+    definition_lengths = array('I', [0]) * CJK_SIZE
+    frequency = array('f', [0.0]) * CJK_SIZE
+    pinyin_ids = array('H', [0]) * CJK_SIZE
+    stroke_counts = array('B', [0]) * CJK_SIZE
+
+    for index in range(CJK_SIZE):
+        char = chr(CJK_FIRST + index)
+        # Same resolution as DictionaryService._word_index: direct, then simplified -> traditional
+        word = char if char in word_locations else simp_to_trad.get(char)
+        entries = dictionary.get(word, []) if word else []
+        reading = default_pinyin(char)
+        if entries:
+            word_index[index], definition_offsets[index], definition_lengths[index] = word_locations[word]
+            frequency[index] = min((entry.get('frequency', 0.0) for entry in entries), default=0.0)
+            if reading is None:
+                reading = entries[max(preferred_entry_index(entries), 0)]['pinyin']
+        if reading:
+            pinyin_ids[index] = syllables.setdefault(reading, len(syllables))
+        stroke_counts[index] = STROKE_COUNTS.get(char, 0)
+
+    columns = [word_index, definition_offsets, definition_lengths, frequency, pinyin_ids, stroke_counts]
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    section = bytearray(_CHAR_HEADER.pack(CJK_SIZE, len(syllables)))
+    for syllable in syllables:
+        section += _SYLLABLE_RECORD.pack(*pool.add(syllable))
+    for column in columns:
+        section += column.tobytes()
+    return bytes(section)
+
+
+def _trie_section(dictionary: Dict[str, List[Dict]], word_locations: Dict[str, Tuple[int, int, int]],
+                  pool: _StringPool) -> bytes:
+    """
+    Build the 'TRIE' section: a double-array trie from each surface form to its word index.
+
+    Node s has the child for alphabet code c at t = base[s] + c when check[t] == s; the
+    root is node 0 and free slots have check -1. Codes number the distinct characters
+    of the keys from 1, in code point order.
+    """
+    # Same surface forms and values as the dict trie DictionaryService used to build:
+    # later words replace earlier ones for a shared form
+    values: Dict[str, int] = {}
+    for word in sorted(dictionary, key=_sort_key):
+        word_index = word_locations[word][0]
+        values[word] = word_index
+        for entry in dictionary[word]:
+            simplified = entry.get('simplified', word)
+            if simplified and simplified != word:
+                values[simplified] = word_index
+
+    alphabet = ''.join(sorted({char for key in values for char in key}))
+    codes = {char: code for code, char in enumerate(alphabet, 1)}
+    root: Dict = {}
+    for key, word_index in values.items():
+        node = root
+        for char in key:
+            node = node.setdefault(codes[char], {})
+        node[0] = word_index
+
+    base = array('i', [0])
+    check = array('i', [-2])
+    value = array('i', [-1])
+    # Free slots as a doubly linked list (slot 0, the root, is its head sentinel), so
+    # placing a node only visits free slots
+    next_free = [0]
+    prev_free = [0]
+
+    def grow(size: int) -> None:
+        for slot in range(len(check), size):
+            base.append(0)
+            check.append(-1)
+            value.append(-1)
+            last = prev_free[0]
+            next_free.append(0)
+            prev_free.append(last)
+            next_free[last] = slot
+            prev_free[0] = slot
+
+    def take(slot: int) -> None:
+        next_free[prev_free[slot]] = next_free[slot]
+        prev_free[next_free[slot]] = prev_free[slot]
+
+    queue = [(0, root)]
+    for state, node in queue:
+        if 0 in node:
+            value[state] = node[0]
+        children = sorted(code for code in node if code)
+        if not children:
+            continue
+        first, last = children[0], children[-1]
+        slot = next_free[0]
+        while True:
+            if slot == 0:
+                # No free slot left: place the children past the end
+                offset = max(len(check) - first, 1)
+                grow(offset + last + 1)
+                break
+            offset = slot - first
+            if offset >= 1:
+                grow(offset + last + 1)
+                if all(check[offset + code] == -1 for code in children):
+                    break
+            slot = next_free[slot]
+        base[state] = offset
+        for code in children:
+            check[offset + code] = state
+            take(offset + code)
+            queue.append((offset + code, node[code]))
+
+    # Pad so that base[s] + code is always a slot, which spares readers a bounds check
+    grow(max(base) + len(alphabet) + 1)
+
+    columns = [base, check, value]
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    section = bytearray(_TRIE_HEADER.pack(len(check), *pool.add(alphabet), len(values),
+                                          max(map(len, values), default=0)))
+    for column in columns:
+        section += column.tobytes()
+    return bytes(section)
+
+
+def source_digest(path: str) -> Optional[bytes]:
+    """Digest of the dictionary module at path, as recorded in the store header; None if missing."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).digest()
+    except OSError:
+        return None
+
+
+def write_dictionary_store(dictionary: Dict[str, List[Dict]], simp_to_trad: Dict[str, str],
+                           trad_to_simp: Dict[str, str], output_file: str,
+                           digest: Optional[bytes] = None) -> None:
+    """
+    Compile dictionary tables into the binary store format.
+
+    The file is written to a temporary path and atomically renamed, so workers that
+    are starting up never observe a partially written store.
+
+    Args:
+        dictionary: word -> list of entries (pinyin, definition, frequency, simplified)
+        simp_to_trad: simplified -> traditional mapping
+        trad_to_simp: traditional -> simplified mapping
+        output_file: Path of the store to write
+        digest: source_digest() of the module the tables come from, if any
+    """
+    pool = _StringPool()
+
+    word_records = bytearray()
+    entry_records = bytearray()
+    entry_index = 0
+    word_locations = {}
+    for word_index, word in enumerate(sorted(dictionary, key=_sort_key)):
+        entries = dictionary[word]
+        key_off, key_len = pool.add(word)
+        preferred = entry_index + max(preferred_entry_index(entries), 0)
+        combined_off, combined_len = pool.add(combine_definitions(sort_entries_by_priority(entries)))
+        word_locations[word] = (word_index, combined_off, combined_len)
+        word_records += _WORD_RECORD.pack(key_off, key_len, entry_index, len(entries),
+                                          preferred, combined_off, combined_len)
+        for entry in entries:
+            pinyin_off, pinyin_len = pool.add(entry['pinyin'])
+            def_off, def_len = pool.add(entry['definition'])
+            simp_off, simp_len = pool.add(entry.get('simplified', word))
+            entry_records += _ENTRY_RECORD.pack(word_index, pinyin_off, pinyin_len, def_off, def_len,
+                                                simp_off, simp_len, float(entry.get('frequency', 0.0)))
+            entry_index += 1
+
+    def mapping_records(mapping: Dict[str, str]) -> bytes:
+        records = bytearray()
+        for key in sorted(mapping, key=_sort_key):
+            records += _MAPPING_RECORD.pack(*pool.add(key), *pool.add(mapping[key]))
+        return bytes(records)
+
+    s2t_records = mapping_records(simp_to_trad)
+    t2s_records = mapping_records(trad_to_simp)
+    s2t_conversions = mapping_records(ScriptConverter(simp_to_trad).reduced_mapping())
+    t2s_conversions = mapping_records(ScriptConverter(trad_to_simp).reduced_mapping())
+
+    # Inverted index: normalized pinyin -> entry indices (in word order)
+    postings = defaultdict(list)
+    entry_index = 0
+    for word in sorted(dictionary, key=_sort_key):
+        for entry in dictionary[word]:
+            for key in pinyin_index_keys(entry['pinyin']):
+                postings[key].append(entry_index)
+            entry_index += 1
+
+    pinyin_records = bytearray()
+    posting_records = bytearray()
+    posting_start = 0
+    for key in sorted(postings, key=_sort_key):
+        entry_ids = postings[key]
+        pinyin_records += _PINYIN_RECORD.pack(*pool.add(key), posting_start, len(entry_ids))
+        posting_records += struct.pack(f'<{len(entry_ids)}I', *entry_ids)
+        posting_start += len(entry_ids)
+
+    # Built before the pool is serialized, since it adds the pinyin syllables to it
+    char_records = _char_section(dictionary, word_locations, simp_to_trad, pool)
+    trie_records = _trie_section(dictionary, word_locations, pool)
+
+    sections = [
+        (b'STRS', pool.to_bytes()),
+        (b'WORD', bytes(word_records)),
+        (b'ENTR', bytes(entry_records)),
+        (b'S2T_', s2t_records),
+        (b'T2S_', t2s_records),
+        (b'PINY', bytes(pinyin_records)),
+        (b'POST', bytes(posting_records)),
+        (b'CHAR', char_records),
+        (b'TRIE', trie_records),
+        (b'S2TX', s2t_conversions),
+        (b'T2SX', t2s_conversions),
+        (b'SCRP', classification_flags(simp_to_trad, trad_to_simp)),
+    ]
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = bytearray()
+    padding = []
+    for name, data in sections:
+        padding.append(-offset % SECTION_ALIGNMENT)
+        offset += padding[-1]
+        directory += _SECTION.pack(name, offset, len(data))
+        offset += len(data)
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.dictionary-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), digest or NO_SOURCE_DIGEST))
+            f.write(directory)
+            for (_, data), pad in zip(sections, padding):
+                f.write(b'\x00' * pad)
+                f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class _SortedTable:
+    """Binary search over a section of fixed-size records whose first two fields are (key_off, key_len)."""
+
+    def __init__(self, buffer, strings_offset: int, offset: int, size: int, record: struct.Struct):
+        self._buffer = buffer
+        self._strings = strings_offset
+        self._offset = offset
+        self._record = record
+        self.count = size // record.size
+        self.find = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._find)
+
+    def record(self, index: int) -> Tuple:
+        return self._record.unpack_from(self._buffer, self._offset + index * self._record.size)
+
+    def records(self) -> Iterator[Tuple]:
+        """Every record in order, unpacked in bulk."""
+        return self._record.iter_unpack(self._buffer[self._offset:self._offset + self.count * self._record.size])
+
+    def string(self, offset: int, length: int) -> str:
+        start = self._strings + offset
+        return self._buffer[start:start + length].decode('utf-8')
+
+    def key_bytes(self, index: int) -> bytes:
+        key_off, key_len = struct.unpack_from('<II', self._buffer, self._offset + index * self._record.size)
+        start = self._strings + key_off
+        return self._buffer[start:start + key_len]
+
+    def _find(self, key: str) -> int:
+        """Return the record index for key, or -1 if it is not present."""
+        target = key.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.key_bytes(lo) == target:
+            return lo
+        return -1
+
+
+class StoreMapping(Mapping):
+    """Read-only str -> str mapping backed by a sorted mapping section."""
+
+    def __init__(self, table: _SortedTable):
+        self._table = table
+
+    def __getitem__(self, key: str) -> str:
+        if not isinstance(key, str):
+            raise KeyError(key)
+        index = self._table.find(key)
+        if index < 0:
+            raise KeyError(key)
+        _, _, value_off, value_len = self._table.record(index)
+        return self._table.string(value_off, value_len)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._table.find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._table.count):
+            key_off, key_len, _, _ = self._table.record(index)
+            yield self._table.string(key_off, key_len)
+
+    def __len__(self) -> int:
+        return self._table.count
+
+    def items(self):
+        # Full scans decode records in order rather than searching for every key
+        for index in range(self._table.count):
+            key_off, key_len, value_off, value_len = self._table.record(index)
+            yield self._table.string(key_off, key_len), self._table.string(value_off, value_len)
+
+
+class StoreDictionary(Mapping):
+    """Read-only word -> entries mapping with the same shape as DICTIONARY."""
+
+    def __init__(self, words: _SortedTable, buffer, strings_offset: int, entries_offset: int, entries_size: int):
+        self._words = words
+        self._buffer = buffer
+        self._strings = strings_offset
+        self._entries_offset = entries_offset
+        self.entry_count = entries_size // _ENTRY_RECORD.size
+        self._multi_entry_words: Optional[int] = None
+        self.entries_at = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._decode_entries)
+
+    def _entry(self, index: int) -> Dict:
+        (_, pinyin_off, pinyin_len, def_off, def_len,
+         simp_off, simp_len, frequency) = _ENTRY_RECORD.unpack_from(
+            self._buffer, self._entries_offset + index * _ENTRY_RECORD.size)
+        return {
+            'pinyin': self._words.string(pinyin_off, pinyin_len),
+            'definition': self._words.string(def_off, def_len),
+            'frequency': frequency,
+            'simplified': self._words.string(simp_off, simp_len)
+        }
+
+    def _decode_entries(self, word_index: int) -> List[Dict]:
+        entry_start, entry_count = self._words.record(word_index)[2:4]
+        return [self._entry(i) for i in range(entry_start, entry_start + entry_count)]
+
+    def multi_entry_words(self) -> int:
+        """Number of words with more than one entry (read from the word records, once)."""
+        if self._multi_entry_words is None:
+            self._multi_entry_words = sum(1 for record in self._words.records() if record[3] > 1)
+        return self._multi_entry_words
+
+    def index_of(self, word: str) -> int:
+        """Return the word's record index, or -1 if it is not in the dictionary."""
+        return self._words.find(word)
+
+    def preferred_entry(self, word_index: int) -> Dict:
+        """The entry to use when no pinyin is specified (see preferred_entry_index)."""
+        entry_start, _, preferred = self._words.record(word_index)[2:5]
+        return self.entries_at(word_index)[preferred - entry_start]
+
+    def combined_definition(self, word_index: int) -> str:
+        """All definitions of the word, priority-ordered, de-duplicated and renumbered."""
+        combined_off, combined_len = self._words.record(word_index)[5:7]
+        return self._words.string(combined_off, combined_len)
+
+    def entry_with_word(self, entry_index: int) -> Tuple[str, Dict]:
+        """Return (word, entry) for an entry index, e.g. one taken from a pinyin posting list."""
+        word_index = _ENTRY_RECORD.unpack_from(self._buffer, self._entries_offset + entry_index * _ENTRY_RECORD.size)[0]
+        key_off, key_len, entry_start = self._words.record(word_index)[:3]
+        return self._words.string(key_off, key_len), self.entries_at(word_index)[entry_index - entry_start]
+
+    def __getitem__(self, word: str) -> List[Dict]:
+        if not isinstance(word, str):
+            raise KeyError(word)
+        index = self._words.find(word)
+        if index < 0:
+            raise KeyError(word)
+        return self.entries_at(index)
+
+    def __contains__(self, word) -> bool:
+        return isinstance(word, str) and self._words.find(word) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._words.count):
+            key_off, key_len = self._words.record(index)[:2]
+            yield self._words.string(key_off, key_len)
+
+    def __len__(self) -> int:
+        return self._words.count
+
+    def items(self):
+        for index in range(self._words.count):
+            key_off, key_len = self._words.record(index)[:2]
+            yield self._words.string(key_off, key_len), self._decode_entries(index)
+
+    def values(self):
+        # Full scans decode directly so they don't evict hot entries from the lookup cache
+        for index in range(self._words.count):
+            yield self._decode_entries(index)
+
+
+class PinyinIndex:
+    """Inverted index from normalized pinyin (see pinyin_index_keys) to entry indices."""
+
+    def __init__(self, keys: _SortedTable, buffer, postings_offset: int):
+        self._keys = keys
+        self._buffer = buffer
+        self._postings = postings_offset
+
+    def count(self, key: str) -> int:
+        index = self._keys.find(key)
+        if index < 0:
+            return 0
+        return self._keys.record(index)[3]
+
+    def postings(self, key: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[int, ...]:
+        """Entry indices for key, sliced to [offset, offset + limit)."""
+        index = self._keys.find(key)
+        if index < 0:
+            return ()
+        posting_start, posting_count = self._keys.record(index)[2:4]
+        offset = min(max(offset, 0), posting_count)
+        end = posting_count if limit is None else min(posting_count, offset + max(limit, 0))
+        return struct.unpack_from(f'<{end - offset}I', self._buffer, self._postings + (posting_start + offset) * 4)
+
+
+def _typed_columns(view: memoryview, position: int, count: int, codes: str) -> List:
+    """View consecutive little-endian columns of count items each, one per array typecode."""
+    columns = []
+    for code in codes:
+        width = array(code).itemsize
+        column = view[position:position + count * width].cast(code)
+        if sys.byteorder != 'little':
+            # Private, byte-swapped copy on big-endian hosts
+            column = array(code, column)
+            column.byteswap()
+        columns.append(column)
+        position += count * width
+    return columns
+
+
+class StoreTrie:
+    """
+    Double-array trie over dictionary surface forms, read in place from the store.
+
+    Same interface as WordTrie; the value of each word is its traditional dictionary key.
+    """
+
+    def __init__(self, buffer, strings_offset: int, offset: int, size: int, words: _SortedTable):
+        node_count, alphabet_off, alphabet_len, self.size, self.max_length = _TRIE_HEADER.unpack_from(buffer, offset)
+        start = strings_offset + alphabet_off
+        alphabet = buffer[start:start + alphabet_len].decode('utf-8')
+        self._codes = {char: code for code, char in enumerate(alphabet, 1)}
+        self._view = memoryview(buffer)
+        self._columns = _typed_columns(self._view, offset + _TRIE_HEADER.size, node_count, 'iii')
+        self._base, self._check, self._value = self._columns
+        self._words = words
+        # Word index -> decoded key; bounded by the dictionary size
+        self._keys: Dict[int, str] = {}
+
+    def _key(self, word_index: int) -> str:
+        key = self._keys.get(word_index)
+        if key is None:
+            key = self._keys[word_index] = self._words.string(*self._words.record(word_index)[:2])
+        return key
+
+    def __contains__(self, word: str) -> bool:
+        if not isinstance(word, str) or not word:
+            return False
+        match = self.longest_match(word)
+        return match is not None and match[0] == len(word)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def prefix_matches(self, text: str, pos: int = 0) -> List[Tuple[int, str]]:
+        """Every word that starts at text[pos], as (end, key) pairs, shortest first."""
+        codes, base, check, value = self._codes, self._base, self._check, self._value
+        matches = []
+        state = 0
+        for end in range(pos, len(text)):
+            code = codes.get(text[end])
+            if code is None:
+                break
+            child = base[state] + code
+            if check[child] != state:
+                break
+            state = child
+            if value[state] >= 0:
+                matches.append((end + 1, self._key(value[state])))
+        return matches
+
+    def longest_match(self, text: str, pos: int = 0) -> Optional[Tuple[int, str]]:
+        """(end, key) of the longest word that starts at text[pos], or None."""
+        codes, base, check, value = self._codes, self._base, self._check, self._value
+        longest = None
+        state = 0
+        for end in range(pos, len(text)):
+            code = codes.get(text[end])
+            if code is None:
+                break
+            child = base[state] + code
+            if check[child] != state:
+                break
+            state = child
+            if value[state] >= 0:
+                longest = (end + 1, value[state])
+        return (longest[0], self._key(longest[1])) if longest else None
+
+    def release(self) -> None:
+        for column in self._columns:
+            if isinstance(column, memoryview):
+                column.release()
+        self._view.release()
+
+
+class CharInfoTable:
+    """Per-character columns over the CJK block (see char_info), viewed in place in the store."""
+
+    def __init__(self, buffer, strings_offset: int, offset: int, size: int):
+        self._strings_offset = strings_offset
+        count, syllable_count = _CHAR_HEADER.unpack_from(buffer, offset)
+        position = offset + _CHAR_HEADER.size
+        self.syllables = []
+        for i in range(syllable_count):
+            syllable_off, syllable_len = _SYLLABLE_RECORD.unpack_from(buffer, position + i * _SYLLABLE_RECORD.size)
+            start = strings_offset + syllable_off
+            self.syllables.append(buffer[start:start + syllable_len].decode('utf-8'))
+        position += syllable_count * _SYLLABLE_RECORD.size
+
+        self._view = memoryview(buffer)
+        self._columns = _typed_columns(self._view, position, count, 'iIIfHB')
+        (self.word_index, self.definition_offsets, self.definition_lengths,
+         self.frequency, self.pinyin_ids, self.stroke_counts) = self._columns
+
+    def pinyin(self, char: str) -> Optional[str]:
+        """Default tone-marked reading of a CJK character, or None."""
+        index = cjk_index(char)
+        if index < 0:
+            return None
+        return self.syllables[self.pinyin_ids[index]] or None
+
+    def definition(self, char: str) -> Optional[str]:
+        """Merged definition of a CJK character (as DictionaryService.get_translation), or None."""
+        index = cjk_index(char)
+        if index < 0 or self.word_index[index] < 0:
+            return None
+        start = self._strings_offset + self.definition_offsets[index]
+        return str(self._view[start:start + self.definition_lengths[index]], 'utf-8')
+
+    def stroke_count(self, char: str) -> int:
+        index = cjk_index(char)
+        return self.stroke_counts[index] if index >= 0 else 0
+
+    def frequency_rank(self, char: str) -> float:
+        """Dictionary frequency rank (lower is more common; 0 if unknown)."""
+        index = cjk_index(char)
+        return self.frequency[index] if index >= 0 else 0.0
+
+    def release(self) -> None:
+        for column in self._columns:
+            if isinstance(column, memoryview):
+                column.release()
+        self._view.release()
+
+
+class DictionaryStore:
+    """
+    Memory-mapped view of a compiled dictionary store.
+
+    Exposes `dictionary`, `simplified_to_traditional` and `traditional_to_simplified`
+    as read-only mappings that behave like the dicts in data/local_dictionary.py,
+    plus `pinyin_index` for pinyin search, `char_info` for per-character data,
+    `word_trie` for word matching, `to_traditional_mapping` / `to_simplified_mapping`
+    for ScriptConverter and `script_flags` for ScriptDetector.from_flags.
+
+    close() unmaps the file; objects built on script_flags must be gone by then.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open_sections()
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def _open_sections(self) -> None:
+        path = self.path
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"{path} is truncated")
+        magic, version, section_count, digest = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a dictionary store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        self.source_digest = digest if digest != NO_SOURCE_DIGEST else None
+
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(section_count):
+            name, offset, size = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            self.sections[name.decode('ascii')] = (offset, size)
+
+        strings_offset, _ = self.sections['STRS']
+        words = _SortedTable(self._mmap, strings_offset, *self.sections['WORD'], _WORD_RECORD)
+
+        self.dictionary = StoreDictionary(words, self._mmap, strings_offset, *self.sections['ENTR'])
+        self.simplified_to_traditional = StoreMapping(
+            _SortedTable(self._mmap, strings_offset, *self.sections['S2T_'], _MAPPING_RECORD))
+        self.traditional_to_simplified = StoreMapping(
+            _SortedTable(self._mmap, strings_offset, *self.sections['T2S_'], _MAPPING_RECORD))
+        self.pinyin_index = PinyinIndex(
+            _SortedTable(self._mmap, strings_offset, *self.sections['PINY'], _PINYIN_RECORD),
+            self._mmap, self.sections['POST'][0])
+        self.char_info = CharInfoTable(self._mmap, strings_offset, *self.sections['CHAR'])
+        self.word_trie = StoreTrie(self._mmap, strings_offset, *self.sections['TRIE'], words)
+        self.to_traditional_mapping = StoreMapping(
+            _SortedTable(self._mmap, strings_offset, *self.sections['S2TX'], _MAPPING_RECORD))
+        self.to_simplified_mapping = StoreMapping(
+            _SortedTable(self._mmap, strings_offset, *self.sections['T2SX'], _MAPPING_RECORD))
+        flags_offset, flags_size = self.sections['SCRP']
+        self.script_flags = memoryview(self._mmap)[flags_offset:flags_offset + flags_size]
+
+    def close(self) -> None:
+        self.char_info.release()
+        self.word_trie.release()
+        self.script_flags.release()
+        self._mmap.close()
+
+
+def open_dictionary_store(path: str, digest: Optional[bytes] = None) -> Optional[DictionaryStore]:
+    """
+    Open the store at path, returning None if it is missing, was written by an
+    incompatible version of this module, or (given the current source_digest) was
+    compiled from a different dictionary module.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        store = DictionaryStore(path)
+    except (ValueError, KeyError, struct.error) as e:
+        print(f"Warning: ignoring dictionary store {path}: {e}")
+        return None
+    if digest is not None and store.source_digest != digest:
+        print(f"Warning: ignoring dictionary store {path}: compiled from another version of the dictionary module")
+        store.close()
+        return None
+    return store
@@ -0,0 +1,219 @@
+"""
+Fuzzy Index
+Near-duplicate sentence lookup with MinHash locality-sensitive hashing.
+
+Each sentence is reduced to its set of character n-grams (letters and digits only, so
+punctuation differences vanish). A MinHash signature of NUM_PERM values estimates the
+Jaccard similarity of two such sets; the signature is cut into BANDS bands, and two
+sentences become candidates when any band matches exactly. Candidates are then checked
+with their exact n-gram Jaccard similarity against the threshold.
+
+Bands are stored as sorted NumPy arrays of band hashes (16 bytes per sentence per
+band) searched with binary search, plus a small dict of recent additions that is merged
+in periodically. Without NumPy the dicts hold everything.
+"""
+
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional, the index falls back to dicts
+    np = None
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+NGRAM = 2
+# Sentences with fewer n-grams are too short to match approximately
+MIN_NGRAMS = 4
+# Most candidates verified per lookup (the ones sharing the most bands)
+MAX_CANDIDATES = 32
+# Recent additions merged into the sorted arrays once they exceed this
+MERGE_THRESHOLD = 4096
+# Sentences hashed per NumPy batch when adding many at once
+BULK_SIZE = 8192
+
+_MASK64 = (1 << 64) - 1
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def _random_odd(count: int, seed: int) -> List[int]:
+    """Deterministic odd 64-bit multipliers, so signatures are the same in every process."""
+    values = []
+    state = seed
+    for _ in range(count):
+        state = (state * 6364136223846793005 + 1442695040888963407) & _MASK64
+        values.append(state | 1)
+    return values
+
+
+_PERM_A = _random_odd(NUM_PERM, 1)
+_PERM_B = _random_odd(NUM_PERM, 2)
+_BAND_MULT = _random_odd(ROWS, 3)
+
+
+def ngrams(text: str) -> Set[str]:
+    """Character n-grams of the letters and digits in text."""
+    text = _NON_WORD.sub('', text)
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class FuzzyIndex:
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._keys: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Merged bands: per band, (sorted hashes, matching entry ids), replaced as a whole on merge
+        self._bands = ([(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32)) for _ in range(BANDS)]
+                       if np is not None else None)
+        # Recent additions: (band, hash) -> entry ids
+        self._pending: Dict[Tuple[int, int], List[int]] = {}
+        self._pending_count = 0
+        self.lookups = 0
+        self.matches = 0
+
+        if np is not None:
+            self._perm_a = np.array(_PERM_A, dtype=np.uint64)[:, None]
+            self._perm_b = np.array(_PERM_B, dtype=np.uint64)[:, None]
+            self._band_mult = np.array(_BAND_MULT, dtype=np.uint64)
+
+    def _band_hashes_of(self, gram_sets: List[Set[str]]):
+        """
+        MinHash each set of n-grams and fold each band of its signature into one 64-bit hash.
+
+        Returns:
+            One row of BANDS hashes per set (a uint64 array with NumPy, else lists)
+        """
+        if np is not None:
+            hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for grams in gram_sets for gram in grams),
+                                 dtype=np.uint64)
+            offsets = np.cumsum([0] + [len(grams) for grams in gram_sets[:-1]])
+            # Multiply-shift universal hashing; uint64 arithmetic wraps like mod 2**64
+            mixed = (self._perm_a * hashes[None, :] + self._perm_b) >> np.uint64(32)
+            signatures = np.minimum.reduceat(mixed, offsets, axis=1).T
+            return (signatures.reshape(len(gram_sets), BANDS, ROWS) * self._band_mult).sum(axis=2)
+
+        result = []
+        for grams in gram_sets:
+            hashes = [zlib.crc32(gram.encode('utf-8')) for gram in grams]
+            signature = [min((((a * h + b) & _MASK64) >> 32) for h in hashes) for a, b in zip(_PERM_A, _PERM_B)]
+            result.append([sum(signature[band * ROWS + row] * _BAND_MULT[row] for row in range(ROWS)) & _MASK64
+                           for band in range(BANDS)])
+        return result
+
+    def add(self, key: str) -> None:
+        """Index a sentence key (ignored if already indexed or too short)."""
+        self.add_many([key])
+
+    def add_many(self, keys: Iterable[str]) -> None:
+        """Index many sentence keys, hashing them in bulk."""
+        new = {}
+        for key in keys:
+            if key not in self._ids and key not in new:
+                grams = ngrams(key)
+                if len(grams) >= MIN_NGRAMS:
+                    new[key] = grams
+        items = list(new.items())
+
+        for start in range(0, len(items), BULK_SIZE):
+            batch = items[start:start + BULK_SIZE]
+            band_hashes = self._band_hashes_of([grams for _, grams in batch])
+            with self._lock:
+                first = len(self._keys)
+                for offset, (key, _) in enumerate(batch):
+                    self._keys.append(key)
+                    self._ids[key] = first + offset
+                if np is not None and len(batch) >= MERGE_THRESHOLD:
+                    # Large batches (the initial build) go straight into the sorted arrays
+                    ids = np.arange(first, first + len(batch), dtype=np.int32)
+                    for band in range(BANDS):
+                        self._merge_band(band, band_hashes[:, band], ids)
+                    continue
+                for offset, bands in enumerate(band_hashes.tolist() if np is not None else band_hashes):
+                    for band, value in enumerate(bands):
+                        self._pending.setdefault((band, value), []).append(first + offset)
+                self._pending_count += len(batch)
+                if np is not None and self._pending_count >= MERGE_THRESHOLD:
+                    self._merge()
+
+    def _merge(self) -> None:
+        """Fold the recent additions into the sorted band arrays (lock held)."""
+        pending = [[] for _ in range(BANDS)]
+        for (band, value), entries in self._pending.items():
+            pending[band].extend((value, entry) for entry in entries)
+        for band, items in enumerate(pending):
+            self._merge_band(band, np.array([value for value, _ in items], dtype=np.uint64),
+                             np.array([entry for _, entry in items], dtype=np.int32))
+        self._pending = {}
+        self._pending_count = 0
+
+    def _merge_band(self, band: int, hashes, ids) -> None:
+        merged_hashes, merged_ids = self._bands[band]
+        hashes = np.concatenate([merged_hashes, hashes])
+        ids = np.concatenate([merged_ids, ids])
+        order = np.argsort(hashes, kind='stable')
+        # Replace the pair at once, so concurrent queries never see hashes and ids out of step
+        self._bands[band] = (hashes[order], ids[order])
+
+    def query(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the indexed sentence most similar to key.
+
+        Returns:
+            (indexed key, n-gram Jaccard similarity) of the best match at or above the
+            threshold, or None. An exact match of key itself is not returned.
+        """
+        self.lookups += 1
+        grams = ngrams(key)
+        if len(grams) < MIN_NGRAMS:
+            return None
+
+        votes: Dict[int, int] = {}
+        bands = self._band_hashes_of([grams])[0]
+        for band, value in enumerate(bands.tolist() if np is not None else bands):
+            for entry in self._pending.get((band, value), ()):
+                votes[entry] = votes.get(entry, 0) + 1
+            if np is not None:
+                hashes, ids = self._bands[band]
+                target = np.uint64(value)
+                start = int(np.searchsorted(hashes, target, side='left'))
+                if start < len(hashes) and hashes[start] == target:
+                    end = int(np.searchsorted(hashes, target, side='right'))
+                    for entry in ids[start:end].tolist():
+                        votes[entry] = votes.get(entry, 0) + 1
+
+        best = None
+        for entry in sorted(votes, key=votes.get, reverse=True)[:MAX_CANDIDATES]:
+            candidate = self._keys[entry]
+            if candidate == key:
+                continue
+            similarity = jaccard(grams, ngrams(candidate))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+
+        if best is not None:
+            self.matches += 1
+        return best
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def stats(self) -> Dict:
+        return {
+            'sentences': len(self._keys),
+            'threshold': self.threshold,
+            'lookups': self.lookups,
+            'matches': self.matches,
+            'numpy': np is not None
+        }
@@ -0,0 +1,201 @@
+"""
+Micro Batcher
+Merges upstream translations from concurrent requests into shared upstream calls.
+
+Callers hand their text to the batcher and block on a Future. A collector thread
+gathers pending texts for a short window after the first one arrives (or until the
+size cap is reached), frames them one per line like the batch packer does, and sends
+them as one request from its own sender pool. The results are then fanned back out to
+the waiting callers. If a chunk comes back misaligned, its texts are retried one by one.
+
+Each batch holds texts of a single rate-limiter priority class, so batch and offline
+texts never ride along at interactive priority. Texts that contain line breaks are sent
+directly, because framing would flatten them. A caller whose result has not arrived
+within its timeout (by default, the longest an upstream call can take plus the window)
+withdraws its text and sends it directly, so a stuck collector or sender cannot hang it.
+Disabled unless MICRO_BATCH_WINDOW_MS is set.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+
+from app.services.batch_packer import join_chunk, pack_chunks, split_chunk
+from app.services.concurrency import UPSTREAM_CONCURRENCY
+from app.services.rate_limiter import INTERACTIVE
+from app.services.upstream_client import UpstreamTranslator
+
+# Collection window in milliseconds after the first pending text (0 disables batching)
+DEFAULT_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', '0'))
+# Pending texts that close the window early
+DEFAULT_MAX_ITEMS = int(os.getenv('MICRO_BATCH_MAX_ITEMS', '20'))
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+# Number of recent queue waits kept for percentiles
+WAIT_WINDOW = 1024
+
+
+class MicroBatcher:
+    def __init__(self, upstream: UpstreamTranslator, window_ms: float = DEFAULT_WINDOW_MS,
+                 max_items: int = DEFAULT_MAX_ITEMS):
+        self.upstream = upstream
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        # Default bound on a caller's wait: its batch may wait out the window, then the call
+        self.max_wait = self.window + upstream.max_call_seconds()
+
+        self._condition = threading.Condition()
+        self._pending: List[Tuple[str, Future, float, int]] = []
+        self._collector: Optional[threading.Thread] = None
+        self._collector_pid: Optional[int] = None
+        # Callers may themselves be running on the shared upstream pool and block on their
+        # Future, so batches are sent from a pool of their own to rule out deadlock
+        self._sender = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY, thread_name_prefix='micro-batch')
+
+        self._waits = deque(maxlen=WAIT_WINDOW)
+        self.batches = 0
+        self.items = 0
+        self.direct = 0
+        self.misaligned = 0
+        self.timeouts = 0
+        self.batch_sizes: Dict[str, int] = {}
+
+    def translate(self, text: str, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> str:
+        """
+        Translate text as part of the next batch, blocking until its result arrives.
+
+        Args:
+            timeout: Seconds to wait for the batch (default max_wait) before sending the
+                text directly instead
+        """
+        if '\n' in text:
+            with self._condition:
+                self.direct += 1
+            return self.upstream.translate(text, priority=priority)
+
+        future = Future()
+        entry = (text, future, time.monotonic(), priority)
+        with self._condition:
+            self._ensure_collector()
+            self._pending.append(entry)
+            self._condition.notify()
+        try:
+            return future.result(timeout=self.max_wait if timeout is None else timeout)
+        except FutureTimeoutError:
+            with self._condition:
+                # Still queued if the collector is stuck; don't let it be sent later too
+                self._pending = [item for item in self._pending if item is not entry]
+                self.timeouts += 1
+                self.direct += 1
+            print(f"Micro-batch wait timed out for '{text}', sending it directly")
+            return self.upstream.translate(text, priority=priority)
+
+    def _ensure_collector(self) -> None:
+        # Threads do not survive a fork, so each worker process starts its own collector
+        # (or after the collector died)
+        if self._collector is None or self._collector_pid != os.getpid() or not self._collector.is_alive():
+            self._collector = threading.Thread(target=self._collect, name='micro-batcher', daemon=True)
+            self._collector_pid = os.getpid()
+            self._collector.start()
+
+    def _collect(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Batch the oldest text with others of its priority class only
+                _, _, first_queued_at, priority = self._pending[0]
+                window_end = first_queued_at + self.window
+                while self._count(priority) < self.max_items:
+                    remaining = window_end - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = [item for item in self._pending if item[3] == priority][:self.max_items]
+                taken = set(map(id, batch))
+                self._pending = [item for item in self._pending if id(item) not in taken]
+            if not batch:
+                # Its callers timed out and withdrew them
+                continue
+
+            sent_at = time.monotonic()
+            with self._condition:
+                self.batches += 1
+                self.items += len(batch)
+                self._waits.extend(sent_at - queued_at for _, _, queued_at, _ in batch)
+                bucket = next((f"<={size}" for size in BATCH_SIZE_BUCKETS if len(batch) <= size),
+                              f">{BATCH_SIZE_BUCKETS[-1]}")
+                self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+            self._sender.submit(self._send, batch, priority)
+
+    def _count(self, priority: int) -> int:
+        return sum(1 for item in self._pending if item[3] == priority)
+
+    def _send(self, batch: List[Tuple[str, Future, float, int]], priority: int) -> None:
+        futures: Dict[str, List[Future]] = {}
+        for text, future, _, _ in batch:
+            futures.setdefault(text, []).append(future)
+
+        for chunk in pack_chunks(list(futures), max_items=self.max_items):
+            try:
+                translations = self._translate_chunk(chunk, priority)
+            except Exception as e:
+                for text in chunk:
+                    for future in futures[text]:
+                        future.set_exception(e)
+                continue
+            for text, translation in zip(chunk, translations):
+                for future in futures[text]:
+                    future.set_result(translation)
+
+    def _translate_chunk(self, chunk: Tuple[str, ...], priority: int) -> List[str]:
+        if len(chunk) == 1:
+            return [self.upstream.translate(chunk[0], priority=priority)]
+        translations = split_chunk(chunk, self.upstream.translate(join_chunk(chunk), priority=priority))
+        if translations is None:
+            with self._condition:
+                self.misaligned += 1
+            translations = [self.upstream.translate(text, priority=priority) for text in chunk]
+        return translations
+
+    def stats(self) -> Dict:
+        with self._condition:
+            waits = sorted(self._waits)
+            batch_sizes = dict(self.batch_sizes)
+            pending = len(self._pending)
+
+        def percentile(p: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1)
+
+        return {
+            'window_ms': self.window * 1000,
+            'max_items': self.max_items,
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+            'batch_sizes': batch_sizes,
+            'direct': self.direct,
+            'misaligned': self.misaligned,
+            'timeouts': self.timeouts,
+            'pending': pending,
+            'queue_wait_ms': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': round(waits[-1] * 1000, 1) if waits else None
+            }
+        }
+
+
+def create_micro_batcher(upstream: UpstreamTranslator) -> Optional[MicroBatcher]:
+    """Build a batcher from the MICRO_BATCH_* environment settings, or None when disabled."""
+    if DEFAULT_WINDOW_MS <= 0:
+        return None
+    print(f"Micro-batching upstream translations ({DEFAULT_WINDOW_MS:g} ms window, up to {DEFAULT_MAX_ITEMS} texts)")
+    return MicroBatcher(upstream)
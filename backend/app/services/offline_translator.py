@@ -0,0 +1,154 @@
+"""
+Offline Translator
+Word-by-word English gloss of Chinese text from the local dictionary, with no network.
+
+Each run of Han characters is segmented along the most probable path through the
+dictionary trie. The dictionary's frequency field is a rank in which lower values are
+more common (的 is about 6, rare words approach 100), so a word costs the log of its rank
+plus a fixed per-word cost; the segmentation with the lowest total cost wins, which
+favours few, common words. Characters no word covers cost extra and are kept as they are.
+
+Each word is glossed with the first usable meaning of its preferred entry (grammatical
+markers such as "(completed action marker)" are dropped). Costs and glosses are computed
+once per dictionary word and kept for the life of the process.
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# Cost of every word, on top of log(rank): keeps segmentations with fewer words ahead
+WORD_COST = math.log(100)
+# Cost of a character covered by no dictionary word
+UNKNOWN_COST = 3 * WORD_COST + 10
+# Rank used for entries without frequency data
+DEFAULT_RANK = 100.0
+
+_HAN_RUN = re.compile(r'([\u4e00-\u9fff]+)')
+_PARENTHETICAL = re.compile(r'\s*\([^)]*\)')
+_NUMBERED = re.compile(r'^\d+\.\s*')
+# Meanings that say nothing about the word's sense in running text
+_SKIPPED_MEANINGS = ('CL:', 'surname ', 'variant of ', 'old variant of ', 'see ', 'also written ')
+# CJK punctuation NFKC leaves alone
+_PUNCTUATION = str.maketrans({'。': '.', '、': ',', '「': '"', '」': '"', '『': '"', '』': '"',
+                              '《': '"', '》': '"', '【': '[', '】': ']'})
+# Tokens that attach to the previous word without a space
+_CLOSING = re.compile(r'^[.,!?;:)\]"\'%]')
+
+
+def first_meaning(definition: str) -> str:
+    """
+    Pick the gloss for running text from a definition ("1. of; 2. ~'s (possessive particle)").
+
+    Returns the first meaning that is not a classifier note, surname, cross-reference or
+    purely grammatical marker, with parenthetical remarks removed; '' for markers only.
+    """
+    meanings = [_NUMBERED.sub('', meaning.strip()) for meaning in definition.split(';')]
+    for meaning in meanings:
+        if not meaning or meaning.startswith(_SKIPPED_MEANINGS):
+            continue
+        gloss = _PARENTHETICAL.sub('', meaning).strip()
+        if gloss:
+            return gloss
+    return ''
+
+
+class OfflineTranslator:
+    def __init__(self, dictionary_service):
+        self.dictionary_service = dictionary_service
+        # Dictionary word -> (path cost, gloss); bounded by the dictionary size
+        self._words: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self.translations = 0
+        self.total_seconds = 0.0
+
+    def _word(self, word: str, key: str) -> Tuple[float, str]:
+        """(path cost, gloss) of a word as written, with key the dictionary word the trie found."""
+        info = self._words.get(word)
+        if info is None:
+            # By the word as written first: the trie maps simplified forms shared by
+            # several traditional words to just one of them
+            entries = self.dictionary_service.lookup_all_variants(word) or \
+                self.dictionary_service.lookup_all_variants(key)
+            entry = self.dictionary_service.lookup(word) or self.dictionary_service.lookup(key)
+            rank = min((entry['frequency'] or DEFAULT_RANK for entry in entries), default=DEFAULT_RANK)
+            info = (math.log(max(rank, 1.0)) + WORD_COST, first_meaning(entry['definition']) if entry else word)
+            with self._lock:
+                self._words[word] = info
+        return info
+
+    def segment(self, text: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        Split text into (token, dictionary key) pairs.
+
+        Han runs are split into dictionary words along the lowest-cost path; the key is
+        None for characters outside the dictionary and for non-Han text, which is kept
+        in runs as it appears.
+        """
+        tokens = []
+        for i, part in enumerate(_HAN_RUN.split(text)):
+            if not part:
+                continue
+            if i % 2 == 0:
+                tokens.append((part, None))
+            else:
+                tokens.extend(self._segment_han(part))
+        return tokens
+
+    def _segment_han(self, run: str) -> List[Tuple[str, Optional[str]]]:
+        trie = self.dictionary_service.word_trie
+        length = len(run)
+        best = [0.0] + [math.inf] * length
+        back: List[Tuple[int, Optional[str]]] = [(0, None)] * (length + 1)
+        for start in range(length):
+            base = best[start]
+            if base + UNKNOWN_COST < best[start + 1]:
+                best[start + 1] = base + UNKNOWN_COST
+                back[start + 1] = (start, None)
+            for end, key in trie.prefix_matches(run, start):
+                cost = base + self._word(run[start:end], key)[0]
+                if cost < best[end]:
+                    best[end] = cost
+                    back[end] = (start, key)
+
+        tokens = []
+        end = length
+        while end > 0:
+            start, key = back[end]
+            tokens.append((run[start:end], key))
+            end = start
+        tokens.reverse()
+        return tokens
+
+    def translate(self, text: str) -> str:
+        """Gloss text word by word, e.g. '我们去图书馆了。' -> 'We to go library.'"""
+        started = time.perf_counter()
+        words = []
+        for token, key in self.segment(text):
+            if key is not None:
+                gloss = self._word(token, key)[1]
+            else:
+                gloss = unicodedata.normalize('NFKC', token).translate(_PUNCTUATION).strip()
+            if not gloss:
+                continue
+            if words and _CLOSING.match(gloss):
+                words[-1] += gloss
+            else:
+                words.append(gloss)
+
+        result = ' '.join(words) if words else text
+        if result:
+            result = result[0].upper() + result[1:]
+        self.translations += 1
+        self.total_seconds += time.perf_counter() - started
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'translations': self.translations,
+            'mean_us': round(self.total_seconds / self.translations * 1e6, 1) if self.translations else None,
+            'glossed_words': len(self._words)
+        }
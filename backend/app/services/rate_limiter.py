@@ -0,0 +1,260 @@
+"""
+Rate Limiter
+Token bucket shared by every process that calls the upstream translator, with
+priority classes.
+
+The bucket lives in a row of the shared translation-cache database. Each upstream
+attempt takes one token; the bucket refills at a steady rate up to a burst size. Calls
+that find no token are queued, never fired:
+
+- Within a process, waiting calls are served in priority order: interactive
+  (/api/analyze, /api/translate) before batch (/api/translate-batch) before offline
+  (scripts). Only the head of the queue draws from the bucket.
+- Across processes, lower classes may only draw while the bucket holds more than a
+  reserve, so bulk jobs in other processes cannot drain the tokens interactive calls need.
+
+Queue depth and wait times per class are reported by /api/metrics.
+"""
+
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.services.translation_cache import DEFAULT_CACHE_PATH
+
+# Priority classes (lower is served first)
+INTERACTIVE = 0
+BATCH = 1
+OFFLINE = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch', OFFLINE: 'offline'}
+
+# Sustained upstream calls per second across all processes (0 disables limiting)
+DEFAULT_RATE = float(os.getenv('UPSTREAM_RATE_LIMIT', '10'))
+# Bucket size: calls that may be made at once after a quiet period
+DEFAULT_BURST = float(os.getenv('UPSTREAM_RATE_BURST', '20'))
+# Fraction of the burst that batch and offline calls must leave in the bucket
+DEFAULT_RESERVES = {
+    INTERACTIVE: 0.0,
+    BATCH: float(os.getenv('UPSTREAM_RATE_BATCH_RESERVE', '0.2')),
+    OFFLINE: float(os.getenv('UPSTREAM_RATE_OFFLINE_RESERVE', '0.5'))
+}
+# Longest a call may wait in the queue before giving up (seconds)
+DEFAULT_MAX_WAIT = float(os.getenv('UPSTREAM_RATE_MAX_WAIT', '30'))
+
+# Longest single sleep while queued, so newly arrived higher-priority calls get their turn
+MAX_SLEEP = 0.05
+# Number of recent queue waits kept per class for percentiles
+WAIT_WINDOW = 1024
+
+
+class RateLimitTimeout(Exception):
+    """A call waited longer than the allowed maximum for a token."""
+
+
+class LocalTokenBucket:
+    """Token bucket for a single process (used when there is no shared database)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, reserve: float) -> float:
+        """
+        Take one token if more than reserve tokens would remain.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one may be available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens - 1 >= reserve:
+                self._tokens -= 1
+                return 0.0
+            return (reserve + 1 - self._tokens) / self.rate
+
+    def stats(self) -> Dict:
+        return {'shared': False}
+
+
+class SQLiteTokenBucket:
+    """Token bucket stored in a SQLite row, shared by every process using the database."""
+
+    def __init__(self, path: str, rate: float, burst: float, name: str = 'upstream'):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self._local = threading.local()
+        self.errors = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            ' name TEXT PRIMARY KEY,'
+            ' tokens REAL NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode, so take() can open an IMMEDIATE transaction itself
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, reserve: float) -> float:
+        """Same contract as LocalTokenBucket.take; database errors grant the token."""
+        try:
+            conn = self._connection()
+            # Take the write lock before reading, so the read-modify-write is atomic across processes
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE name = ?',
+                                   (self.name,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(now - row[1], 0) * self.rate)
+                wait = 0.0
+                if tokens - 1 >= reserve:
+                    tokens -= 1
+                else:
+                    wait = (reserve + 1 - tokens) / self.rate
+                conn.execute('INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)',
+                             (self.name, tokens, now))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return wait
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Rate limiter error: {e}")
+            return 0.0
+
+    def stats(self) -> Dict:
+        return {'shared': True, 'path': self.path, 'errors': self.errors}
+
+
+class RateLimiter:
+    """Priority queue in front of a token bucket."""
+
+    def __init__(self, bucket, reserves: Optional[Dict[int, float]] = None, max_wait: float = DEFAULT_MAX_WAIT):
+        self.bucket = bucket
+        self.reserves = {priority: fraction * bucket.burst
+                         for priority, fraction in (reserves or DEFAULT_RESERVES).items()}
+        self.max_wait = max_wait
+
+        self._condition = threading.Condition()
+        self._queue = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._waits = {priority: deque(maxlen=WAIT_WINDOW) for priority in PRIORITY_NAMES}
+        self.acquired = {priority: 0 for priority in PRIORITY_NAMES}
+        self.queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self.timeouts = {priority: 0 for priority in PRIORITY_NAMES}
+
+    def acquire(self, priority: int = INTERACTIVE) -> float:
+        """
+        Wait for a token for one upstream call.
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitTimeout: if no token became available within max_wait
+        """
+        start = time.monotonic()
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self.queued[priority] += 1
+        try:
+            while True:
+                with self._condition:
+                    while self._queue[0] != ticket:
+                        if not self._condition.wait(max(start + self.max_wait - time.monotonic(), 0)):
+                            break
+                    at_head = self._queue[0] == ticket
+                if at_head:
+                    wait = self.bucket.take(self.reserves.get(priority, 0.0))
+                    if wait == 0:
+                        break
+                remaining = start + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    with self._condition:
+                        self.timeouts[priority] += 1
+                    raise RateLimitTimeout(f"No upstream capacity within {self.max_wait:g}s")
+                if at_head:
+                    time.sleep(min(wait, MAX_SLEEP, remaining))
+        finally:
+            with self._condition:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self.queued[priority] -= 1
+                self._condition.notify_all()
+
+        waited = time.monotonic() - start
+        with self._condition:
+            self.acquired[priority] += 1
+            self._waits[priority].append(waited)
+        return waited
+
+    def stats(self) -> Dict:
+        with self._condition:
+            waits = {priority: sorted(values) for priority, values in self._waits.items()}
+            queued = dict(self.queued)
+            depth = len(self._queue)
+
+        def percentile(values, p: float) -> Optional[float]:
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1)
+
+        classes = {}
+        for priority, name in PRIORITY_NAMES.items():
+            values = waits[priority]
+            classes[name] = {
+                'queued': queued[priority],
+                'acquired': self.acquired[priority],
+                'timeouts': self.timeouts[priority],
+                'wait_ms': {
+                    'p50': percentile(values, 0.50),
+                    'p95': percentile(values, 0.95),
+                    'max': round(values[-1] * 1000, 1) if values else None
+                }
+            }
+
+        return {
+            'rate': self.bucket.rate,
+            'burst': self.bucket.burst,
+            'queue_depth': depth,
+            'classes': classes,
+            'bucket': self.bucket.stats()
+        }
+
+
+def create_rate_limiter() -> Optional[RateLimiter]:
+    """Build the limiter from the UPSTREAM_RATE_* environment settings, or None when disabled."""
+    if DEFAULT_RATE <= 0:
+        return None
+    bucket = None
+    if DEFAULT_CACHE_PATH:
+        try:
+            bucket = SQLiteTokenBucket(DEFAULT_CACHE_PATH, DEFAULT_RATE, DEFAULT_BURST)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: shared rate limiter unavailable, limiting per process: {e}")
+    if bucket is None:
+        bucket = LocalTokenBucket(DEFAULT_RATE, DEFAULT_BURST)
+    return RateLimiter(bucket)
@@ -0,0 +1,124 @@
+"""
+Script Converter
+Table-driven conversion between simplified and traditional Chinese.
+
+Single characters are converted with a precompiled str.translate table. Multi-character
+mappings (e.g. 點鐘 -> 点钟) disambiguate one-to-many conversions, so they are applied
+with a leftmost-longest trie match, and the text between phrase matches goes through
+the translate table.
+
+Only phrases whose mapping differs from character-by-character conversion are kept,
+and each of them contains at least one "ambiguous" character where the two disagree.
+A regex character class finds those characters in C, so the trie is only walked from
+the few start positions that can reach one, instead of at every character.
+
+reduced_mapping() keeps just those entries; the dictionary store compiles it, so workers
+build their converters from a few thousand records instead of the whole mapping.
+"""
+
+import re
+from typing import Dict, List, Mapping, Tuple
+
+from app.services.word_trie import WordTrie
+
+
+class ScriptConverter:
+    def __init__(self, mapping: Mapping[str, str]):
+        """
+        Args:
+            mapping: Source form -> target form, for characters and multi-character words
+        """
+        self.table = {}
+        phrases = {}
+        for source, target in mapping.items():
+            if len(source) == 1:
+                if source != target:
+                    self.table[ord(source)] = target
+            elif source:
+                phrases[source] = target
+        
+        # Phrases that convert the same way character by character add nothing but
+        # work for the matcher, so only the ones that disambiguate are kept
+        self.phrases = {source: target for source, target in phrases.items()
+                        if source.translate(self.table) != target}
+        self.phrase_trie = WordTrie(self.phrases.items())
+        # Two-character prefixes, checked before walking the trie from a start position
+        self._phrase_prefixes = {source[:2] for source in self.phrases}
+        
+        # Ambiguous character -> offsets at which it occurs in a kept phrase (descending,
+        # so the candidate start positions for a hit come out in ascending order)
+        offsets_by_char: Dict[str, set] = {}
+        for source, target in self.phrases.items():
+            by_char = source.translate(self.table)
+            if len(by_char) == len(target):
+                offsets = [i for i in range(len(source)) if by_char[i] != target[i]]
+            else:
+                offsets = list(range(len(source)))
+            for offset in offsets:
+                offsets_by_char.setdefault(source[offset], set()).add(offset)
+        self._ambiguous_offsets: Dict[str, Tuple[int, ...]] = {
+            char: tuple(sorted(offsets, reverse=True)) for char, offsets in offsets_by_char.items()
+        }
+        
+        self._ambiguous_pattern = None
+        if self._ambiguous_offsets:
+            self._ambiguous_pattern = re.compile(
+                '[' + ''.join(re.escape(char) for char in sorted(self._ambiguous_offsets)) + ']')
+    
+    def reduced_mapping(self) -> Dict[str, str]:
+        """The entries this converter uses: changed characters and disambiguating phrases."""
+        mapping = {chr(code): target for code, target in self.table.items()}
+        mapping.update(self.phrases)
+        return mapping
+    
+    def _phrase_matches(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Find non-overlapping phrase matches, leftmost-longest.
+        
+        Returns:
+            List of (start, end, converted phrase) in text order
+        """
+        # Every phrase match covers an ambiguous character, so the only possible start
+        # positions are (hit - offset); the prefix check discards most of them cheaply
+        prefixes = self._phrase_prefixes
+        starts = set()
+        for hit in self._ambiguous_pattern.finditer(text):
+            position = hit.start()
+            for offset in self._ambiguous_offsets[text[position]]:
+                start = position - offset
+                if start >= 0 and text[start:start + 2] in prefixes:
+                    starts.add(start)
+        
+        matches = []
+        next_start = 0
+        for start in sorted(starts):
+            if start < next_start:
+                continue
+            match = self.phrase_trie.longest_match(text, start)
+            if match:
+                end, target = match
+                matches.append((start, end, target))
+                next_start = end
+        return matches
+    
+    def convert(self, text: str) -> str:
+        """
+        Convert text, preferring phrase mappings over character mappings.
+        Characters without mapping remain unchanged.
+        """
+        if not self._ambiguous_pattern:
+            return text.translate(self.table)
+        
+        matches = self._phrase_matches(text)
+        if not matches:
+            return text.translate(self.table)
+        
+        pieces = []
+        last = 0
+        for start, end, target in matches:
+            if start > last:
+                pieces.append(text[last:start].translate(self.table))
+            pieces.append(target)
+            last = end
+        pieces.append(text[last:].translate(self.table))
+        return ''.join(pieces)
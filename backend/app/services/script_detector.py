@@ -0,0 +1,153 @@
+"""
+Script Detector
+Classifies text as simplified, traditional or mixed Chinese.
+
+A table over the CJK Unified Ideographs block (U+4E00-U+9FFF) records for each code
+point whether it only occurs in simplified text, only in traditional text, or both.
+Text is scanned in chunks; with NumPy each chunk is classified as one array operation
+over its UTF-32 code points. After each chunk a sequential test checks whether the
+verdict is already settled, so large documents usually stop after a few chunks.
+
+The table is compiled into the dictionary store (classification_flags), and workers
+use it in place through ScriptDetector.from_flags.
+"""
+
+import math
+from typing import Dict, Mapping
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional, the scan falls back to pure Python
+    np = None
+
+CJK_START = 0x4E00
+CJK_END = 0x9FFF
+
+# Classification flags
+SIMPLIFIED_ONLY = 1
+TRADITIONAL_ONLY = 2
+
+# Characters scanned per chunk between early-exit checks
+CHUNK_SIZE = 4096
+# Han characters required before an early exit is considered
+MIN_HAN_FOR_EARLY_EXIT = 256
+# z-score the ratio difference must clear to stop early (~99.9% one-sided)
+EARLY_EXIT_Z = 3.1
+# Below this ratio difference the text is considered mixed
+MIXED_THRESHOLD = 0.1
+# Texts with fewer Han characters default to traditional
+MIN_HAN = 5
+
+
+def classification_flags(simp_to_trad: Mapping[str, str], trad_to_simp: Mapping[str, str]) -> bytes:
+    """One SIMPLIFIED_ONLY/TRADITIONAL_ONLY flag byte per code point of the CJK block."""
+    flags = bytearray(CJK_END - CJK_START + 1)
+    for mapping, flag in ((simp_to_trad, SIMPLIFIED_ONLY), (trad_to_simp, TRADITIONAL_ONLY)):
+        for source, target in mapping.items():
+            if len(source) == 1 and source != target and CJK_START <= ord(source) <= CJK_END:
+                flags[ord(source) - CJK_START] |= flag
+    return bytes(flags)
+
+
+class ScriptDetector:
+    def __init__(self, simp_to_trad: Mapping[str, str], trad_to_simp: Mapping[str, str]):
+        self._use_flags(classification_flags(simp_to_trad, trad_to_simp))
+
+    @classmethod
+    def from_flags(cls, flags) -> 'ScriptDetector':
+        """Detector over a precompiled classification_flags table (bytes or a memoryview of it)."""
+        detector = cls.__new__(cls)
+        detector._use_flags(flags)
+        return detector
+
+    def _use_flags(self, flags) -> None:
+        self.flags = flags
+        self._flags_array = np.frombuffer(flags, dtype=np.uint8) if np is not None else None
+
+    def _count_chunk(self, chunk: str):
+        """Return (han, simplified-only, traditional-only) counts for a chunk of text."""
+        if self._flags_array is not None:
+            # Lone surrogates (legal in a str) encode as their own code points, outside the block
+            code_points = np.frombuffer(chunk.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+            han = code_points[(code_points >= CJK_START) & (code_points <= CJK_END)]
+            flags = self._flags_array[han - CJK_START]
+            return (int(han.size),
+                    int(np.count_nonzero(flags & SIMPLIFIED_ONLY)),
+                    int(np.count_nonzero(flags & TRADITIONAL_ONLY)))
+
+        han = simp_only = trad_only = 0
+        for char in chunk:
+            code_point = ord(char)
+            if CJK_START <= code_point <= CJK_END:
+                han += 1
+                flag = self.flags[code_point - CJK_START]
+                simp_only += flag & SIMPLIFIED_ONLY
+                trad_only += (flag & TRADITIONAL_ONLY) >> 1
+        return han, simp_only, trad_only
+
+    @staticmethod
+    def _z_score(han: int, simp_only: int, trad_only: int) -> float:
+        """
+        How many standard errors the simplified/traditional ratio difference is away
+        from the mixed threshold (positive means outside the mixed band).
+        """
+        diff = abs(simp_only - trad_only) / han
+        # Each Han character contributes +1, -1 or 0 to the difference
+        variance = (simp_only + trad_only) / han - diff * diff
+        std_error = math.sqrt(max(variance, 1e-12) / han)
+        return (diff - MIXED_THRESHOLD) / std_error
+
+    def detect(self, text: str, early_exit: bool = True) -> Dict:
+        """
+        Detect if text is primarily simplified or traditional Chinese.
+
+        Args:
+            text: The text to classify
+            early_exit: Stop scanning once the verdict is statistically settled
+
+        Returns:
+            Dict with script_type ('simplified', 'traditional' or 'mixed'), the
+            han/simplified_only/traditional_only counts, confidence (0-1),
+            characters_examined and early_exit (whether the scan stopped early)
+        """
+        han = simp_only = trad_only = 0
+        examined = 0
+        stopped_early = False
+
+        for start in range(0, len(text), CHUNK_SIZE):
+            chunk = text[start:start + CHUNK_SIZE]
+            chunk_han, chunk_simp, chunk_trad = self._count_chunk(chunk)
+            han += chunk_han
+            simp_only += chunk_simp
+            trad_only += chunk_trad
+            examined += len(chunk)
+
+            if (early_exit and examined < len(text) and han >= MIN_HAN_FOR_EARLY_EXIT
+                    and self._z_score(han, simp_only, trad_only) > EARLY_EXIT_Z):
+                stopped_early = True
+                break
+
+        result = {
+            'script_type': 'traditional',
+            'han': han,
+            'simplified_only': simp_only,
+            'traditional_only': trad_only,
+            'confidence': 0.0,
+            'characters_examined': examined,
+            'early_exit': stopped_early
+        }
+
+        # If very few Chinese characters, default to traditional
+        if han < MIN_HAN:
+            return result
+
+        z_score = self._z_score(han, simp_only, trad_only)
+        if abs(simp_only - trad_only) / han < MIXED_THRESHOLD:
+            result['script_type'] = 'mixed'
+            z_score = -z_score
+        elif simp_only > trad_only:
+            result['script_type'] = 'simplified'
+
+        # Normal CDF of the z-score: confidence that the text is on this side of the mixed band
+        result['confidence'] = round(0.5 * (1 + math.erf(z_score / math.sqrt(2))), 4)
+        return result
@@ -0,0 +1,137 @@
+"""
+Single Flight
+Coalesces concurrent identical upstream translations into one call.
+
+Within a worker, the first thread to ask for a text becomes the leader and the others
+wait on its Future. Across workers, the leader also takes a lease row in the shared
+translation cache; leaders in other workers that find the lease taken poll the cache
+for the result instead of calling upstream. If the lease holder fails or its lease
+expires, a waiter takes over the lease and makes the call itself.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from app.services.translation_cache import TranslationCache
+
+# Seconds a worker may hold the lease on a text (covers the client's retries)
+DEFAULT_LEASE_TTL = float(os.getenv('SINGLE_FLIGHT_LEASE_TTL', '15'))
+# Seconds between cache checks while another worker holds the lease
+DEFAULT_POLL_INTERVAL = float(os.getenv('SINGLE_FLIGHT_POLL_INTERVAL', '0.05'))
+
+
+class SingleFlight:
+    """Per-process coalescing of concurrent calls with the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], str]) -> str:
+        """
+        Run func for key, unless a call for key is already in flight, in which case wait
+        for that call and return (or raise) its outcome.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls)
+        }
+
+
+class SharedSingleFlight(SingleFlight):
+    """SingleFlight that also coalesces across workers through leases in the shared cache."""
+
+    def __init__(self, cache: TranslationCache, lease_ttl: float = DEFAULT_LEASE_TTL,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        super().__init__()
+        self.cache = cache
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.lease_waits = 0
+        self.lease_hits = 0
+        self.lease_takeovers = 0
+
+    def do(self, key: str, func: Callable[[], str]) -> str:
+        return super().do(key, lambda: self._call_with_lease(key, func))
+
+    def _call_with_lease(self, key: str, func: Callable[[], str]) -> str:
+        if not self.cache.acquire_lease(key, self.lease_ttl):
+            result = self._wait_for_holder(key)
+            if result is not None:
+                return result
+
+        try:
+            return func()
+        finally:
+            self.cache.release_lease(key)
+
+    def _wait_for_holder(self, key: str) -> Optional[str]:
+        """
+        Poll the cache while another worker holds the lease.
+
+        Returns:
+            The other worker's result, or None once this worker holds the lease itself
+            (the holder failed or timed out)
+        """
+        self.lease_waits += 1
+        deadline = time.monotonic() + self.lease_ttl
+        while True:
+            time.sleep(self.poll_interval)
+            result = self.cache.peek(key)
+            if result is not None:
+                self.lease_hits += 1
+                return result
+            # The lease is free again once the holder releases it or it expires
+            if self.cache.acquire_lease(key, self.lease_ttl):
+                # The holder may have stored its result just before releasing
+                result = self.cache.peek(key)
+                if result is not None:
+                    self.cache.release_lease(key)
+                    self.lease_hits += 1
+                    return result
+                self.lease_takeovers += 1
+                return None
+            if time.monotonic() > deadline:
+                self.lease_takeovers += 1
+                return None
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update({
+            'lease_waits': self.lease_waits,
+            'lease_hits': self.lease_hits,
+            'lease_takeovers': self.lease_takeovers
+        })
+        return stats
@@ -1,14 +1,14 @@
 import re
-import jieba
 from typing import Dict, List, Any
 from app.services.pinyin_service import PinyinService
-from app.services.translation_service import TranslationService
+from app.services.translation_service import translation_service
 from app.services.dictionary_service import dictionary_service
+from app.services.analysis_pipeline import analysis_pipeline
 
 class TextService:
     def __init__(self):
         self.pinyin_service = PinyinService()
-        self.translation_service = TranslationService()
+        self.translation_service = translation_service
         
     def get_text_by_id(self, text_id: str) -> Dict[str, Any]:
         """Get text content by ID - simplified for copy-paste approach"""
@@ -52,45 +52,7 @@ class TextService:
     
     def analyze_characters(self, text: str) -> List[Dict[str, Any]]:
         """Analyze each character in the text using proper services with word grouping"""
-        analysis = []
-        
-        # First, segment the text into words using jieba
-        words = list(jieba.cut(text, cut_all=False))
-        
-        # Track position in original text
-        char_index = 0
-        
-        for word in words:
-            # For each word, analyze its characters
-            for i, char in enumerate(word):
-                if '\u4e00' <= char <= '\u9fff':  # Chinese character range
-                    # Use PinyinService for better character coverage
-                    char_pinyin = self._get_character_pinyin(char)
-                    analysis.append({
-                        'character': char,
-                        'pinyin': char_pinyin,
-                        'meaning': self._get_character_meaning(char),
-                        'word': word,  # The complete word this character belongs to
-                        'word_position': i,  # Position within the word (0 = first char)
-                        'word_length': len(word),  # Total length of the word
-                        'is_word_start': i == 0,  # True if this is the first character of a word
-                        'is_word_end': i == len(word) - 1  # True if this is the last character of a word
-                    })
-                else:
-                    # Handle non-Chinese characters (spaces, punctuation, etc.)
-                    analysis.append({
-                        'character': char,
-                        'pinyin': char,
-                        'meaning': char,
-                        'word': char,
-                        'word_position': 0,
-                        'word_length': 1,
-                        'is_word_start': True,
-                        'is_word_end': True
-                    })
-                char_index += 1
-        
-        return analysis
+        return analysis_pipeline.analyze(text)['character_analysis']
     
     def get_character_info(self, char: str) -> Dict[str, Any]:
         """Get detailed information about a Chinese character"""
@@ -106,17 +68,12 @@ class TextService:
         }
     
     def _get_character_pinyin(self, char: str) -> str:
-        """Get pinyin for a single character using PinyinService"""
-        try:
-            # Use the PinyinService for better coverage
-            char_analysis = self.pinyin_service.generate_character_pinyin(char)
-            if char_analysis and len(char_analysis) > 0:
-                return char_analysis[0]['pinyin']
-            else:
-                return char
-        except Exception as e:
-            # Fallback to hardcoded dictionary if pypinyin fails
-            return self._fallback_pinyin(char)
+        """Get pinyin for a single character from the compiled character table"""
+        # Default pypinyin reading, precomputed when the dictionary store was compiled
+        reading = dictionary_service.char_info.pinyin(char)
+        if reading:
+            return reading
+        return self._fallback_pinyin(char)
     
     def _fallback_pinyin(self, char: str) -> str:
         """Fallback pinyin for when pypinyin fails"""
@@ -142,9 +99,9 @@ class TextService:
         return pinyin_dict.get(char, char)
     
     def _get_character_meaning(self, char: str) -> str:
-        """Get English meaning for a character using dictionary service"""
-        # Use the dictionary service to get the full definition
-        translation = dictionary_service.get_translation(char)
+        """Get English meaning for a character from the compiled character table"""
+        # Same combined definition as dictionary_service.get_translation(char)
+        translation = dictionary_service.char_info.definition(char)
         if translation:
             # Return the full definition with all numbered meanings
             return translation
@@ -152,20 +109,9 @@ class TextService:
         return 'Unknown'
     
     def _get_stroke_count(self, char: str) -> int:
-        """Get stroke count for a character"""
-        # This would integrate with a stroke count database
-        stroke_dict = {
-            '轉': 18, '法': 8, '輪': 15, '李': 7, '洪': 9, '志': 7,
-            '目': 5, '錄': 16, '論': 15, '語': 14, '第': 11, '一': 1,
-            '講': 17, '真': 10, '正': 5, '往': 8, '高': 10, '層': 15,
-            '次': 6, '上': 3, '帶': 11, '人': 2, '不': 4, '同': 6,
-            '有': 6, '善': 12, '忍': 7, '是': 9, '衡': 16, '量': 12,
-            '好': 6, '壞': 19, '唯': 11, '標': 15, '準': 13, '氣': 10,
-            '功': 5, '史': 5, '前': 9, '文': 4, '化': 4, '就': 12,
-            '修': 9, '煉': 13, '為': 9, '甚': 9, '麼': 14, '長': 8,
-            '特': 10, '點': 17
-        }
-        return stroke_dict.get(char, 0)
+        """Get stroke count for a character (0 if unknown)"""
+        # Compiled from char_info.STROKE_COUNTS; a stroke count database would feed that table
+        return dictionary_service.char_info.stroke_count(char)
     
     def _get_common_phrases(self, char: str) -> List[str]:
         """Get common phrases that use this character"""
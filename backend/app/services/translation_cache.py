@@ -0,0 +1,399 @@
+"""
+Translation Cache
+Two-tier cache for upstream translations.
+
+- MemoryCache: per-process LRU with TTL, answers repeated lookups without any I/O
+- SQLiteCache: on-disk tier in WAL mode, shared by every worker process on the host
+- TranslationCache: checks memory first, then the shared tier (promoting hits)
+
+Negative entries record texts the upstream could not translate (returned unchanged,
+empty or "unknown") with a reason code and a shorter lifetime, so they stop generating
+upstream traffic without being remembered for as long as real translations.
+
+The shared database also holds short-lived leases, so that only one worker at a time
+calls upstream for a given text while the others wait for its result.
+
+Every tier keeps hit/miss/eviction counters for /api/metrics. The shared tier never
+raises: database errors are logged and treated as misses so translation keeps working.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# In-process tier
+DEFAULT_MEMORY_SIZE = int(os.getenv('TRANSLATION_CACHE_MEMORY_SIZE', '2048'))
+# Shared on-disk tier ('' disables it)
+DEFAULT_CACHE_PATH = os.getenv(
+    'TRANSLATION_CACHE_PATH',
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '../../data/translation_cache.sqlite3'))
+)
+DEFAULT_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '100000'))
+# Entry lifetime in seconds (30 days)
+DEFAULT_TTL = float(os.getenv('TRANSLATION_CACHE_TTL', str(30 * 24 * 3600)))
+# Lifetime of negative entries in seconds (1 day)
+NEGATIVE_TTL = float(os.getenv('TRANSLATION_CACHE_NEGATIVE_TTL', str(24 * 3600)))
+
+# Shared-tier size is checked every this many writes
+EVICTION_CHECK_INTERVAL = 256
+# Shared-tier access times are only refreshed when older than this (seconds), to keep reads read-only
+ACCESS_REFRESH_INTERVAL = 3600
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_SIZE, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, reason, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Return (value, reason) for a live entry; reason is None unless the entry is negative."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, reason, expires_at = item
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if reason is not None:
+                self.negative_hits += 1
+            return value, reason
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None, reason: Optional[str] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, reason, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class SQLiteCache:
+    """
+    Size-capped cache table in a SQLite database shared between processes.
+
+    WAL mode lets every worker read concurrently while one writes. Each thread uses its
+    own connection. Eviction removes the least recently accessed rows once the table
+    grows past max_entries.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS translations ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL,'
+                ' reason TEXT)'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(translations)')}
+            if 'reason' not in columns:
+                # Databases created before negative caching
+                conn.execute('ALTER TABLE translations ADD COLUMN reason TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed_at)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS leases ('
+                ' key TEXT PRIMARY KEY,'
+                ' owner TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key: str) -> Optional[Tuple[str, Optional[str], float]]:
+        """Return (value, reason, expires_at) for a live entry; reason is None unless the entry is negative."""
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, reason, expires_at, accessed_at FROM translations WHERE key = ?', (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None:
+                self.misses += 1
+                return None
+            value, reason, expires_at, accessed_at = row
+            if expires_at < now:
+                with conn:
+                    conn.execute('DELETE FROM translations WHERE key = ? AND expires_at < ?', (key, now))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if now - accessed_at > ACCESS_REFRESH_INTERVAL:
+                with conn:
+                    conn.execute('UPDATE translations SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            if reason is not None:
+                self.negative_hits += 1
+            return value, reason, expires_at
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation cache read error: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        return entry[0] if entry else None
+
+    def peek(self, key: str) -> Optional[Tuple[str, Optional[str], float]]:
+        """Read a live (value, reason, expires_at) without touching counters or access times (for polling)."""
+        try:
+            return self._connection().execute(
+                'SELECT value, reason, expires_at FROM translations WHERE key = ? AND expires_at >= ?',
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation cache read error: {e}")
+            return None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None, reason: Optional[str] = None) -> None:
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO translations (key, value, expires_at, accessed_at, reason)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (key, value, expires_at, now, reason)
+                )
+            with self._lock:
+                self._writes += 1
+                check = self._writes % EVICTION_CHECK_INTERVAL == 0
+            if check:
+                self.evict()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation cache write error: {e}")
+
+    @staticmethod
+    def _lease_owner() -> str:
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        """
+        Try to take the lease on key for ttl seconds.
+
+        Returns False while another live lease is held. Database errors grant the
+        lease, so a broken database never blocks translation.
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM leases WHERE key = ? AND expires_at < ?', (key, now))
+                acquired = conn.execute(
+                    'INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                    (key, self._lease_owner(), now + ttl)
+                ).rowcount == 1
+            return acquired
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation cache lease error: {e}")
+            return True
+
+    def release_lease(self, key: str) -> None:
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, self._lease_owner()))
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation cache lease error: {e}")
+
+    def evict(self) -> int:
+        """Drop expired rows, then the least recently accessed rows above max_entries."""
+        conn = self._connection()
+        with conn:
+            removed = conn.execute('DELETE FROM translations WHERE expires_at < ?', (time.time(),)).rowcount
+            self.expirations += removed
+            count = conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                evicted = conn.execute(
+                    'DELETE FROM translations WHERE key IN '
+                    '(SELECT key FROM translations ORDER BY accessed_at LIMIT ?)', (excess,)
+                ).rowcount
+                self.evictions += evicted
+                removed += evicted
+        return removed
+
+    def __len__(self) -> int:
+        try:
+            return self._connection().execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def negative_entries(self) -> Dict[str, int]:
+        """Number of negative entries per reason code."""
+        try:
+            rows = self._connection().execute(
+                'SELECT reason, COUNT(*) FROM translations WHERE reason IS NOT NULL GROUP BY reason'
+            ).fetchall()
+            return dict(rows)
+        except sqlite3.Error:
+            return {}
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'entries': len(self),
+            'negative_entries': self.negative_entries(),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'errors': self.errors
+        }
+
+
+class TranslationCache:
+    """Memory tier in front of an optional shared tier."""
+
+    def __init__(self, memory: Optional[MemoryCache] = None, shared: Optional[SQLiteCache] = None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.shared = shared
+
+    def lookup(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Return (value, reason) for a cached key; reason is None unless the entry is negative."""
+        entry = self.memory.lookup(key)
+        if entry is not None or self.shared is None:
+            return entry
+        entry = self.shared.lookup(key)
+        if entry is None:
+            return None
+        self._promote(key, entry)
+        return entry[:2]
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.lookup(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None, reason: Optional[str] = None) -> None:
+        """Store a translation, or a negative entry (with a reason code and NEGATIVE_TTL by default)."""
+        if ttl is None and reason is not None:
+            ttl = NEGATIVE_TTL
+        self.memory.set(key, value, ttl, reason)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl, reason)
+
+    def _promote(self, key: str, entry: Tuple[str, Optional[str], float]) -> None:
+        # Keep the shared row's remaining lifetime, so promotion never extends an entry
+        value, reason, expires_at = entry
+        self.memory.set(key, value, expires_at - time.time(), reason)
+
+    def peek(self, key: str) -> Optional[str]:
+        """Look up a value written by another worker, without counting a hit or miss."""
+        if self.shared is None:
+            return None
+        entry = self.shared.peek(key)
+        if entry is None:
+            return None
+        self._promote(key, entry)
+        return entry[0]
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        """Take the cross-worker lease on key; always granted without a shared tier."""
+        return self.shared is None or self.shared.acquire_lease(key, ttl)
+
+    def release_lease(self, key: str) -> None:
+        if self.shared is not None:
+            self.shared.release_lease(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def stats(self) -> Dict:
+        memory = self.memory.stats()
+        shared = self.shared.stats() if self.shared is not None else None
+        hits = memory['hits'] + (shared['hits'] if shared else 0)
+        negative_hits = memory['negative_hits'] + (shared['negative_hits'] if shared else 0)
+        # Every lookup reaches the memory tier, so its hits + misses count all lookups
+        lookups = memory['hits'] + memory['misses']
+        return {
+            'hits': hits,
+            'negative_hits': negative_hits,
+            'misses': lookups - hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory': memory,
+            'shared': shared
+        }
+
+
+def create_translation_cache() -> TranslationCache:
+    """Build the cache from the TRANSLATION_CACHE_* environment settings."""
+    shared = None
+    if DEFAULT_CACHE_PATH:
+        try:
+            shared = SQLiteCache(DEFAULT_CACHE_PATH)
+            print(f"Shared translation cache at {DEFAULT_CACHE_PATH}")
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: shared translation cache disabled: {e}")
+    return TranslationCache(MemoryCache(), shared)
+
+
+# Create a singleton instance, shared by every TranslationService in the process
+translation_cache = create_translation_cache()
@@ -0,0 +1,278 @@
+"""
+Translation Memory
+Persistent store of upstream translations per sentence.
+
+Texts are split into sentences at the boundaries TextService._segment_into_sentences
+uses (。！？ and line breaks). A multi-sentence request is assembled from remembered
+sentences, and only the sentences not yet in memory are sent upstream, so rereading a
+long text costs no upstream calls.
+
+Unlike the translation cache, entries do not expire: the memory lives in its own
+SQLite database (WAL mode, shared by all workers) and survives restarts. It is capped
+at max_sentences, beyond which the least recently stored sentences are evicted. A
+per-process LRU sits in front of it.
+
+Requests may opt in to fuzzy matching: a MinHash index over the remembered sentences
+(built in the background on first use, then kept in sync by rowid) supplies the
+translation of a near-duplicate sentence when there is no exact match. Evicted
+sentences stay in the index until restart but no longer match.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.fuzzy_index import FuzzyIndex
+from app.services.translation_cache import MemoryCache
+
+DEFAULT_MEMORY_PATH = os.getenv(
+    'TRANSLATION_MEMORY_PATH',
+    os.path.normpath(os.path.join(os.path.dirname(__file__), '../../data/translation_memory.sqlite3'))
+)
+# Sentences kept in the per-process LRU
+DEFAULT_MEMORY_SIZE = int(os.getenv('TRANSLATION_MEMORY_MEMORY_SIZE', '4096'))
+# Sentences kept on disk
+DEFAULT_MAX_SENTENCES = int(os.getenv('TRANSLATION_MEMORY_MAX_SENTENCES', '500000'))
+# Minimum character-bigram Jaccard similarity of a fuzzy match
+DEFAULT_FUZZY_THRESHOLD = float(os.getenv('TRANSLATION_MEMORY_FUZZY_THRESHOLD', '0.8'))
+# Seconds between picking up sentences added (by any worker) since the last sync
+FUZZY_SYNC_INTERVAL = 5.0
+
+_BOUNDARY = re.compile(r'([。！？\n]+)')
+# Keys per SELECT ... IN (...) query, below SQLite's variable limit
+_QUERY_BATCH = 500
+
+
+def split_sentences(text: str) -> List[Tuple[str, str]]:
+    """
+    Split text into (sentence, separator) pairs.
+
+    Each sentence keeps its closing punctuation. The separator is what joins its
+    translation to the next one: the line breaks that followed it, or a space.
+    """
+    parts = _BOUNDARY.split(text)
+    pairs = []
+    for i in range(0, len(parts), 2):
+        boundary = parts[i + 1] if i + 1 < len(parts) else ''
+        sentence = (parts[i] + boundary.replace('\n', '')).strip()
+        if not sentence:
+            continue
+        newlines = boundary.count('\n')
+        pairs.append((sentence, '\n' * newlines if newlines else ' '))
+    return pairs
+
+
+def join_sentences(translations: Iterable[str], separators: Iterable[str]) -> str:
+    """Join sentence translations back into one text."""
+    return ''.join(translation + separator for translation, separator in zip(translations, separators)).strip()
+
+
+class TranslationMemory:
+    def __init__(self, path: str = DEFAULT_MEMORY_PATH, memory_size: int = DEFAULT_MEMORY_SIZE,
+                 fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD, max_sentences: int = DEFAULT_MAX_SENTENCES):
+        self.path = path
+        self.max_sentences = max_sentences
+        self.memory = MemoryCache(memory_size, ttl=float('inf'))
+        self._local = threading.local()
+        self.fuzzy_index = FuzzyIndex(fuzzy_threshold)
+        self._fuzzy_lock = threading.Lock()
+        self._fuzzy_state = 'empty'  # empty -> building -> ready
+        self._fuzzy_rowid = 0
+        self._fuzzy_synced = 0.0
+        self.lookups = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.stored = 0
+        self.evicted = 0
+        self.errors = 0
+        self.requests = 0
+        self.sentences_requested = 0
+        self.sentences_reused = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sentences ('
+                ' key TEXT PRIMARY KEY,'
+                ' source TEXT NOT NULL,'
+                ' translation TEXT NOT NULL,'
+                ' created_at REAL NOT NULL)'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return the remembered translations for the given sentence keys."""
+        keys = list(dict.fromkeys(keys))
+        found = self._fetch(keys)
+        self.lookups += len(keys)
+        self.hits += len(found)
+        return found
+
+    def _fetch(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        missing = []
+        for key in keys:
+            translation = self.memory.get(key)
+            if translation is not None:
+                found[key] = translation
+            else:
+                missing.append(key)
+
+        try:
+            conn = self._connection()
+            for start in range(0, len(missing), _QUERY_BATCH):
+                batch = missing[start:start + _QUERY_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, translation FROM sentences WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, translation in rows:
+                    found[key] = translation
+                    self.memory.set(key, translation)
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation memory read error: {e}")
+        return found
+
+    def fuzzy_get(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Translation of the most similar remembered sentence.
+
+        Returns:
+            (translation, similarity), or None if nothing is similar enough or the
+            index is still being built
+        """
+        if not self._fuzzy_ready():
+            return None
+        match = self.fuzzy_index.query(key)
+        if match is None:
+            return None
+        matched_key, similarity = match
+        translation = self._fetch([matched_key]).get(matched_key)
+        if translation is None:
+            return None
+        self.fuzzy_hits += 1
+        return translation, similarity
+
+    def _fuzzy_ready(self) -> bool:
+        with self._fuzzy_lock:
+            state = self._fuzzy_state
+            if state == 'empty':
+                self._fuzzy_state = 'building'
+                threading.Thread(target=self._build_fuzzy_index, name='fuzzy-index', daemon=True).start()
+                return False
+        if state != 'ready':
+            return False
+        if time.monotonic() - self._fuzzy_synced > FUZZY_SYNC_INTERVAL and self._fuzzy_lock.acquire(blocking=False):
+            try:
+                self._sync_fuzzy_index()
+            finally:
+                self._fuzzy_lock.release()
+        return True
+
+    def _build_fuzzy_index(self) -> None:
+        start = time.perf_counter()
+        self._sync_fuzzy_index()
+        print(f"Fuzzy index built over {len(self.fuzzy_index)} sentences in {time.perf_counter() - start:.1f}s")
+        with self._fuzzy_lock:
+            self._fuzzy_state = 'ready'
+
+    def _sync_fuzzy_index(self) -> None:
+        """Index sentences stored since the last sync (rowids only grow, even on replace)."""
+        try:
+            rows = self._connection().execute(
+                'SELECT rowid, key FROM sentences WHERE rowid > ? ORDER BY rowid', (self._fuzzy_rowid,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation memory read error: {e}")
+            return
+        self.fuzzy_index.add_many(key for _, key in rows)
+        if rows:
+            self._fuzzy_rowid = rows[-1][0]
+        self._fuzzy_synced = time.monotonic()
+
+    def set_many(self, entries: Iterable[Tuple[str, str, str]]) -> None:
+        """Remember (key, source sentence, translation) entries."""
+        entries = list(entries)
+        if not entries:
+            return
+        now = time.time()
+        for key, _, translation in entries:
+            self.memory.set(key, translation)
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO sentences (key, source, translation, created_at) VALUES (?, ?, ?, ?)',
+                    [(key, source, translation, now) for key, source, translation in entries]
+                )
+                # Rowids only grow (a replaced row gets a new one), so everything more than
+                # max_sentences rowids behind the newest was stored least recently
+                evicted = conn.execute(
+                    'DELETE FROM sentences WHERE rowid <= (SELECT MAX(rowid) FROM sentences) - ?',
+                    (self.max_sentences,)
+                ).rowcount
+            self.stored += len(entries)
+            self.evicted += evicted
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Translation memory write error: {e}")
+
+    def record_request(self, sentences: int, reused: int) -> None:
+        """Count a request assembled from sentences, reused of which came from memory."""
+        self.requests += 1
+        self.sentences_requested += sentences
+        self.sentences_reused += reused
+
+    def __len__(self) -> int:
+        try:
+            return self._connection().execute('SELECT COUNT(*) FROM sentences').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'sentences': len(self),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            'fuzzy_hits': self.fuzzy_hits,
+            'fuzzy_index': dict(self.fuzzy_index.stats(), state=self._fuzzy_state),
+            'stored': self.stored,
+            'evicted': self.evicted,
+            'max_sentences': self.max_sentences,
+            'requests': self.requests,
+            'sentences_requested': self.sentences_requested,
+            'sentences_reused': self.sentences_reused,
+            'errors': self.errors,
+            'memory': self.memory.stats()
+        }
+
+
+def create_translation_memory() -> Optional[TranslationMemory]:
+    """Open the memory from the TRANSLATION_MEMORY_* environment settings, or None when disabled."""
+    if not DEFAULT_MEMORY_PATH:
+        return None
+    try:
+        memory = TranslationMemory(DEFAULT_MEMORY_PATH)
+        print(f"Translation memory at {DEFAULT_MEMORY_PATH}")
+        return memory
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: translation memory disabled: {e}")
+        return None
+
+
+# Create a singleton instance, shared by every TranslationService in the process
+translation_memory = create_translation_memory()
@@ -1,5 +1,5 @@
-import requests
-from typing import Dict, List
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, List, Optional, Tuple
 import jieba
 import os
 
@@ -12,27 +12,76 @@ else:
     print(f"Warning: Jieba custom dictionary not found at {jieba_dict_path}")
 
 from app.services.dictionary_service import dictionary_service
+from app.services.translation_cache import TranslationCache, translation_cache
+from app.services.translation_memory import TranslationMemory, join_sentences, split_sentences, translation_memory
+from app.services.upstream_client import UpstreamTranslator, upstream_client
+from app.services.cache_keys import canonical_key
+from app.services.batch_packer import BatchStats, join_chunk, pack_chunks, split_chunk
+from app.services.concurrency import map_with_deadline, upstream_executor
+from app.services.single_flight import SharedSingleFlight
+from app.services.micro_batcher import MicroBatcher, create_micro_batcher
+from app.services.rate_limiter import BATCH, INTERACTIVE, OFFLINE
+from app.services.offline_translator import OfflineTranslator
+
+# 'online': translate through the upstream; 'offline': never call it, gloss from the dictionary
+TRANSLATION_MODE = os.getenv('TRANSLATION_MODE', 'online')
+TRANSLATION_MODES = ('online', 'offline')
 
 
 class TranslationService:
-    def __init__(self):
+    def __init__(self, cache: Optional[TranslationCache] = None, upstream: Optional[UpstreamTranslator] = None,
+                 micro_batcher: Optional[MicroBatcher] = None, memory: Optional[TranslationMemory] = None,
+                 mode: str = TRANSLATION_MODE):
         self.dictionary_service = dictionary_service
         
-        # Google Translate API endpoint (free tier)
-        self.translate_url = "https://translate.googleapis.com/translate_a/single"
+        # Dictionary-segmentation glosses: the offline mode, and the fallback when the upstream fails
+        self.offline_translator = OfflineTranslator(self.dictionary_service)
+        if mode not in TRANSLATION_MODES:
+            print(f"Warning: unknown TRANSLATION_MODE '{mode}', using 'online'")
+            mode = 'online'
+        self.mode = mode
+        
+        # Google Translate API (free tier) through the pooled, retrying client
+        self.upstream = upstream if upstream is not None else upstream_client
+        # Optional: merges single translations from concurrent requests into shared calls
+        self.micro_batcher = micro_batcher if micro_batcher is not None else create_micro_batcher(self.upstream)
     
         # Cache for API translations to avoid repeated calls
-        self.translation_cache = {}
+        # (shared by all instances in the process, and across workers via its on-disk tier)
+        self.translation_cache = cache if cache is not None else translation_cache
+        
+        # Persistent per-sentence translations; only unseen sentences go upstream
+        self.translation_memory = memory if memory is not None else translation_memory
+        
+        # Concurrent requests for the same text share one upstream call (across workers too)
+        self.single_flight = SharedSingleFlight(self.translation_cache)
+        
+        # Alignment counters for packed batch requests
+        self.batch_stats = BatchStats()
+        # Upstream translations that outlived their latency budget
+        self.budget_exceeded = 0
+        # Cache keys computed, and how many differed from the raw text
+        self.cache_keys = 0
+        self.normalized_keys = 0
     
-    def translate(self, text: str, pinyin: str = None) -> str:
+    def translate(self, text: str, pinyin: str = None, budget: Optional[float] = None,
+                  priority: int = INTERACTIVE, fuzzy: bool = False) -> str:
         """
         Translate Chinese text to English.
         
         Priority:
         1. Local dictionary
         2. Translation cache
-        3. Google Translate API
-        4. Fallback: character-by-character using dictionary
+        3. Google Translate API (in offline mode, the dictionary gloss instead)
+        4. Fallback: word-by-word gloss from the dictionary
+        
+        With a budget (seconds), the fallback is returned as soon as the upstream call
+        takes longer; the call keeps running in the background and caches its result.
+        The priority is the rate-limiter class of the upstream call.
+        
+        With fuzzy, sentences missing from the translation memory may take the
+        translation of a near-duplicate remembered sentence. Such results are
+        approximate, so they are not cached for the whole text.
         """
         try:
             # Step 1: Check local dictionary first
@@ -41,87 +90,274 @@ class TranslationService:
                 print(f"Dictionary hit: '{text}' -> '{translation}'")
                 return translation
             
-            # Step 2: Check cache
-            if text in self.translation_cache:
-                print(f"Cache hit: '{text}' -> '{self.translation_cache[text]}'")
-                return self.translation_cache[text]
+            # Step 2: Check cache (including texts the upstream is known not to translate)
+            key = self._cache_key(text)
+            cached = self.translation_cache.lookup(key)
+            if cached is not None:
+                value, reason = cached
+                if reason is None:
+                    print(f"Cache hit: '{text}' -> '{value}'")
+                else:
+                    print(f"Negative cache hit ({reason}): '{text}'")
+                return value
+            
+            # Punctuation, digits and whitespace come back unchanged; don't ask upstream
+            if not any(char.isalpha() for char in text):
+                return text
+            
+            if self.mode == 'offline':
+                return self.offline_translator.translate(text)
             
-            # Step 3: Use Google Translate API
-            result = self._google_translate(text)
-            print(f"Google Translate: '{text}' -> '{result}'")
+            # Step 3: Use Google Translate API (once for all concurrent requests for this text)
+            if fuzzy and self.translation_memory is not None:
+                call = lambda: self._translate_sentences(text, priority, fuzzy=True)
+            else:
+                call = lambda: self.single_flight.do(key, lambda: self._translate_and_cache(text, key, priority))
+            if budget is None:
+                return call()
             
-            # Cache the result
-            self.translation_cache[text] = result
-            return result
+            future = upstream_executor.submit(call)
+            try:
+                return future.result(timeout=budget)
+            except FutureTimeoutError:
+                self.budget_exceeded += 1
+                print(f"Translation budget of {budget:g}s exceeded for '{text}', using fallback")
+                return self.gloss(text)
             
         except Exception as e:
             print(f"Translation failed, using fallback: {e}")
             # Step 4: Fallback to character-by-character dictionary lookup
-            return self._fallback_translation(text)
+            return self.gloss(text)
     
-    def _google_translate(self, text: str) -> str:
-        """Translate using Google Translate API"""
-        try:
-            params = {
-                'client': 'gtx',
-                'sl': 'zh',  # Source language: Chinese
-                'tl': 'en',  # Target language: English
-                'dt': 't',   # Translation type
-                'q': text
-            }
-            
-            response = requests.get(self.translate_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            # Parse the response
-            data = response.json()
-            if data and len(data) > 0 and len(data[0]) > 0:
-                # Extract the translated text
-                translated_parts = []
-                for part in data[0]:
-                    if part[0]:  # The translated text
-                        translated_parts.append(part[0])
-                
-                translation = ''.join(translated_parts)
-                return translation.strip()
+    def _cache_key(self, text: str) -> str:
+        """
+        Canonical cache and coalescing key: simplified and traditional forms, and
+        whitespace or punctuation variants, of a text share one entry.
+        """
+        key = canonical_key(text, self.dictionary_service.convert_to_simplified)
+        self.cache_keys += 1
+        if key != text:
+            self.normalized_keys += 1
+        return key
+    
+    def _translate_and_cache(self, text: str, key: str, priority: int = INTERACTIVE) -> str:
+        if self.translation_memory is not None:
+            result = self._translate_sentences(text, priority)
+        else:
+            result = self._google_translate(text, priority)
+        print(f"Google Translate: '{text}' -> '{result}'")
+        
+        # Cache the result (before the lease is released, so waiting workers find it);
+        # untranslatable texts are remembered for a shorter time
+        self.translation_cache.set(key, result, reason=self._negative_reason(text, result))
+        return result
+    
+    def _translate_sentences(self, text: str, priority: int = INTERACTIVE, fuzzy: bool = False) -> str:
+        """
+        Translate text sentence by sentence through the translation memory.
+        
+        Remembered sentences are reused (with fuzzy, near-duplicates too); the others are
+        framed one per line into as few upstream requests as possible, and remembered if
+        they translated. If a framed request comes back misaligned, the whole text is
+        translated in one piece instead.
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            return self._google_translate(text, priority)
+        
+        keys = [self._cache_key(sentence) for sentence, _ in sentences]
+        known = self.translation_memory.get_many(keys)
+        self.translation_memory.record_request(len(sentences), sum(1 for key in keys if key in known))
+        
+        missing = {}
+        for (sentence, _), key in zip(sentences, keys):
+            if key in known:
+                continue
+            if not any(char.isalpha() for char in sentence):
+                # Punctuation only: nothing to translate
+                known[key] = sentence
+                continue
+            match = self.translation_memory.fuzzy_get(key) if fuzzy else None
+            if match is not None:
+                known[key] = match[0]
+                print(f"Fuzzy memory hit ({match[1]:.2f}): '{sentence}'")
             else:
-                raise Exception("No translation data received")
-                
-        except requests.RequestException as e:
-            print(f"Translation API error: {e}")
-            raise e
+                missing.setdefault(key, sentence)
+        
+        if missing:
+            sources = list(missing.values())
+            translations = self._translate_framed(sources, priority)
+            if translations is None:
+                print(f"Sentence chunk came back misaligned, translating '{text}' whole")
+                return self._google_translate(text, priority)
+            
+            self.translation_memory.set_many(
+                (key, source, translation) for (key, source), translation in zip(missing.items(), translations)
+                if self._negative_reason(source, translation) is None
+            )
+            known.update(zip(missing, translations))
+        
+        return join_sentences((known[key] for key in keys), (separator for _, separator in sentences))
+    
+    def _translate_framed(self, sources: List[str], priority: int) -> Optional[List[str]]:
+        """Translate texts framed one per line in packed chunks, or None if a chunk came back misaligned."""
+        translations = []
+        for chunk in pack_chunks(sources):
+            chunk_translations = split_chunk(chunk, self._google_translate(join_chunk(chunk), priority))
+            if chunk_translations is None:
+                return None
+            translations.extend(chunk_translations)
+        return translations
+    
+    def pretranslate(self, texts: Iterable[str], priority: int = OFFLINE) -> Tuple[int, List[str]]:
+        """
+        Translate sentences or words ahead of time, for later requests to reuse.
+        
+        Texts already in the translation cache or memory are skipped. The rest are framed
+        into packed requests (one at a time if a request comes back misaligned), and the
+        results are stored as translate() would: in the cache, and in the translation
+        memory if they translated.
+        
+        Returns:
+            (number of texts translated, texts whose upstream call failed)
+        """
+        pending = {}
+        for text in texts:
+            if any(char.isalpha() for char in text):
+                pending.setdefault(self._cache_key(text), text)
+        pending = {key: text for key, text in pending.items() if self.translation_cache.get(key) is None}
+        if self.translation_memory is not None and pending:
+            for key, translation in self.translation_memory.get_many(pending).items():
+                self.translation_cache.set(key, translation)
+                del pending[key]
+        if not pending:
+            return 0, []
+        
+        sources = list(pending.values())
+        try:
+            translations = self._translate_framed(sources, priority)
         except Exception as e:
-            print(f"Translation parsing error: {e}")
-            raise e
+            print(f"Pre-translation of {len(sources)} texts failed: {e}")
+            return 0, sources
+        if translations is None:
+            translations = []
+            for source in sources:
+                try:
+                    translations.append(self._google_translate(source, priority))
+                except Exception as e:
+                    print(f"Pre-translation failed for '{source}': {e}")
+                    translations.append(None)
+        
+        remembered = []
+        failed = []
+        for (key, source), translation in zip(pending.items(), translations):
+            if translation is None:
+                failed.append(source)
+                continue
+            reason = self._negative_reason(source, translation)
+            self.translation_cache.set(key, translation, reason=reason)
+            if reason is None:
+                remembered.append((key, source, translation))
+        if self.translation_memory is not None:
+            self.translation_memory.set_many(remembered)
+        return len(sources) - len(failed), failed
+    
+    @staticmethod
+    def _negative_reason(text: str, result: str) -> Optional[str]:
+        """Reason code if an upstream result is not a real translation, else None."""
+        result = result.strip()
+        if not result:
+            return 'empty'
+        if result.lower() == 'unknown':
+            return 'unknown'
+        if result.lower() == text.strip().lower():
+            return 'unchanged'
+        return None
+    
+    def _google_translate(self, text: str, priority: int = INTERACTIVE) -> str:
+        """Translate using Google Translate API"""
+        if self.micro_batcher is not None:
+            return self.micro_batcher.translate(text, priority)
+        return self.upstream.translate(text, priority=priority)
     
-    def _fallback_translation(self, text: str) -> str:
+    def translate_batch(self, items: Iterable[str], timeout: float, priority: int = BATCH) -> Dict[str, str]:
         """
-        Fallback translation using dictionary service character-by-character.
+        Translate many texts with as few upstream requests as possible.
+        
+        Cached items are answered from the cache. The rest are framed one per line,
+        packed into chunks that fit in one request, and the chunks are sent concurrently.
+        Aligned results are cached.
+        
+        Args:
+            items: Texts to translate
+            timeout: Seconds to wait for the upstream chunks
+            priority: Rate-limiter class of the upstream calls
+        
+        Returns:
+            Translations for the items that were cached or came back aligned in time;
+            items missing from the result should be translated individually
         """
-        # Try dictionary service first for the whole text
-        translation = self.dictionary_service.get_translation(text)
-        if translation:
-            return self._extract_first_meaning(translation)
+        if self.mode == 'offline':
+            return {item: self.translate(item) for item in dict.fromkeys(items)}
         
-        # If not found, try character-by-character using dictionary service
-        translations = []
-        for char in text:
-            if '\u4e00' <= char <= '\u9fff':  # Chinese character range
-                char_translation = self.dictionary_service.get_translation(char)
-                if char_translation:
-                    # Extract just the first meaning
-                    first_meaning = self._extract_first_meaning(char_translation)
-                    translations.append(first_meaning)
-                else:
-                    translations.append(char)  # Keep original if not found
+        results = {}
+        # Uncached items grouped by cache key; one item per key is sent upstream
+        pending: Dict[str, List[str]] = {}
+        for item in dict.fromkeys(items):
+            key = self._cache_key(item)
+            cached = self.translation_cache.get(key)
+            if cached is not None:
+                results[item] = cached
             else:
-                translations.append(char)  # Non-Chinese characters kept as-is
+                pending.setdefault(key, []).append(item)
         
-        result = ' '.join(translations) if translations else text
-        # Capitalize first letter
-        if result:
-            result = result[0].upper() + result[1:] if len(result) > 1 else result.upper()
-        return result
+        if not pending:
+            return results
+        
+        groups = {group[0]: group for group in pending.values()}
+        misses = list(groups)
+        chunks = pack_chunks(misses)
+        print(f"Batch translating {len(misses)} items in {len(chunks)} chunks ({len(results)} cached)")
+        chunk_results, late = map_with_deadline(lambda chunk: self._translate_chunk(chunk, priority),
+                                              chunks, timeout=timeout)
+        if late:
+            print(f"{len(late)} batch chunks did not finish in time")
+        
+        for chunk, translations in chunk_results.items():
+            if translations is not None:
+                for item, translation in zip(chunk, translations):
+                    results.update(dict.fromkeys(groups[item], translation))
+        return results
+    
+    def _translate_chunk(self, chunk: Tuple[str, ...], priority: int = BATCH) -> Optional[List[str]]:
+        """Translate one packed chunk, returning per-item translations or None if misaligned."""
+        try:
+            translation = self._google_translate(join_chunk(chunk), priority)
+        except Exception as e:
+            self.batch_stats.record(len(chunk), 'failed')
+            print(f"Batch chunk of {len(chunk)} items failed: {e}")
+            return None
+        
+        translations = split_chunk(chunk, translation)
+        if translations is None:
+            self.batch_stats.record(len(chunk), 'misaligned')
+            print(f"Batch chunk of {len(chunk)} items came back misaligned: {translation!r}")
+            return None
+        
+        self.batch_stats.record(len(chunk), 'aligned')
+        for item, item_translation in zip(chunk, translations):
+            # Items that fail in a batch still get an individual attempt, so only cache successes
+            if self._negative_reason(item, item_translation) is None:
+                self.translation_cache.set(self._cache_key(item), item_translation)
+        return translations
+    
+    def gloss(self, text: str) -> str:
+        """
+        Fallback translation: the text segmented into dictionary words, glossed word by word.
+        
+        Needs no upstream call, so it is what callers out of time answer with.
+        """
+        return self.offline_translator.translate(text)
     
     def _extract_first_meaning(self, definition: str) -> str:
         """
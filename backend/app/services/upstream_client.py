@@ -0,0 +1,239 @@
+"""
+Upstream Client
+Pooled HTTP client for the upstream translation endpoint (translate_a/single).
+
+One requests.Session with a sized connection pool is shared by all threads in the
+process, so consecutive translations reuse keep-alive TCP+TLS connections. Failed
+attempts (connection errors, timeouts, truncated bodies, 429 and 5xx responses) are
+retried with jittered exponential backoff; other HTTP and request errors fail
+immediately. Every attempt's
+latency and outcome is recorded for /api/metrics, and feeds a circuit breaker that
+rejects calls outright while the upstream is failing or slow. Every attempt first
+waits for a token from the shared, priority-aware rate limiter.
+
+Point UPSTREAM_TRANSLATE_URL at scripts/stub_translate_server.py to test without
+network access.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.circuit_breaker import OPEN, CircuitBreaker
+from app.services.rate_limiter import INTERACTIVE, RateLimiter, RateLimitTimeout, create_rate_limiter
+
+DEFAULT_TRANSLATE_URL = os.getenv('UPSTREAM_TRANSLATE_URL', 'https://translate.googleapis.com/translate_a/single')
+DEFAULT_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '10'))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+DEFAULT_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '10'))
+DEFAULT_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', '2'))
+# Backoff before retry n is uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n)] seconds
+DEFAULT_BACKOFF_BASE = float(os.getenv('UPSTREAM_BACKOFF_BASE', '0.2'))
+DEFAULT_BACKOFF_MAX = float(os.getenv('UPSTREAM_BACKOFF_MAX', '2.0'))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Number of recent attempt latencies kept for percentiles
+LATENCY_WINDOW = 1024
+
+
+class UpstreamError(Exception):
+    """The upstream translator failed after all retries, or returned an unusable response."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The call was rejected without contacting the upstream because the circuit is open."""
+
+
+def parse_translation_response(data: Any) -> str:
+    """
+    Extract the translated text from a translate_a/single response.
+
+    The response is a nested list whose first element holds one
+    [translated, original, ...] part per source segment.
+    """
+    if data and len(data) > 0 and data[0]:
+        translated_parts = []
+        for part in data[0]:
+            if part and part[0]:  # The translated text
+                translated_parts.append(part[0])
+        return ''.join(translated_parts).strip()
+    raise UpstreamError("No translation data received")
+
+
+class UpstreamTranslator:
+    def __init__(self, url: str = DEFAULT_TRANSLATE_URL, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX, breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.limiter = limiter if limiter is not None else create_rate_limiter()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.successes = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.attempt_errors: Dict[str, int] = {}
+
+    def translate(self, text: str, source: str = 'zh', target: str = 'en', priority: int = INTERACTIVE) -> str:
+        """
+        Translate text through the upstream endpoint.
+
+        Args:
+            priority: Rate-limiter class (rate_limiter.INTERACTIVE, BATCH or OFFLINE)
+
+        Raises:
+            CircuitOpenError: if the circuit breaker rejected the call
+            UpstreamError: if every attempt failed, no rate-limit token became available
+                in time, or the response could not be parsed
+        """
+        params = {
+            'client': 'gtx',
+            'sl': source,  # Source language
+            'tl': target,  # Target language
+            'dt': 't',     # Translation type
+            'q': text
+        }
+        data = self._get_json(params, priority)
+        return parse_translation_response(data)
+
+    def _get_json(self, params: Dict, priority: int = INTERACTIVE) -> Any:
+        with self._lock:
+            self.requests += 1
+
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self._backoff(attempt - 1))
+                with self._lock:
+                    self.retries += 1
+
+            # Don't queue for a token only to be rejected by an open circuit
+            if self.breaker.state != OPEN and self.limiter is not None:
+                try:
+                    self.limiter.acquire(priority)
+                except RateLimitTimeout as e:
+                    with self._lock:
+                        self.failures += 1
+                    raise UpstreamError(str(e)) from e
+
+            if not self.breaker.allow():
+                with self._lock:
+                    self.short_circuited += 1
+                raise CircuitOpenError("Upstream circuit is open") from last_error
+
+            start = time.perf_counter()
+            outcome = 'ok'
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS:
+                    outcome = f"http_{response.status_code}"
+                    last_error = UpstreamError(f"Upstream returned HTTP {response.status_code}")
+                    continue
+                response.raise_for_status()
+                data = response.json()
+                with self._lock:
+                    self.successes += 1
+                return data
+            except requests.HTTPError as e:
+                # Not retryable (4xx other than 429)
+                outcome = f"http_{e.response.status_code}"
+                last_error = e
+                break
+            except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                if isinstance(e, requests.Timeout):
+                    outcome = 'timeout'
+                elif isinstance(e, requests.ConnectionError):
+                    outcome = 'connection_error'
+                else:
+                    outcome = 'incomplete_response'
+                last_error = e
+            except requests.JSONDecodeError as e:
+                outcome = 'invalid_json'
+                last_error = e
+                break
+            except requests.RequestException as e:
+                # Anything else requests raises (invalid URL or headers, redirect loops, ...)
+                outcome = 'request_error'
+                last_error = e
+                break
+            finally:
+                self._record_attempt(time.perf_counter() - start, outcome)
+
+        with self._lock:
+            self.failures += 1
+        print(f"Translation API error: {last_error}")
+        raise UpstreamError(str(last_error)) from last_error
+
+    def max_call_seconds(self) -> float:
+        """Roughly the longest a translate() call can take: every attempt waiting out the
+        rate limiter and its timeouts, with the longest backoff between them."""
+        limiter_wait = self.limiter.max_wait if self.limiter is not None else 0
+        return (self.max_retries + 1) * (limiter_wait + sum(self.timeout)) + self.max_retries * self.backoff_max
+
+    def _backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff for the given retry number (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+
+    def _record_attempt(self, latency: float, outcome: str) -> None:
+        # Client errors (other than rate limiting) say nothing about upstream health
+        client_error = outcome.startswith('http_4') and outcome != 'http_429'
+        self.breaker.record(outcome == 'ok' or client_error, latency)
+        with self._lock:
+            self.attempts += 1
+            self._latencies.append(latency)
+            if outcome != 'ok':
+                self.attempt_errors[outcome] = self.attempt_errors.get(outcome, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            attempt_errors = dict(self.attempt_errors)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            'url': self.url,
+            'requests': self.requests,
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'successes': self.successes,
+            'failures': self.failures,
+            'short_circuited': self.short_circuited,
+            'circuit': self.breaker.stats(),
+            'rate_limit': self.limiter.stats() if self.limiter is not None else None,
+            'attempt_errors': attempt_errors,
+            'latency_ms': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(latencies[-1] * 1000, 1) if latencies else None
+            }
+        }
+
+
+# Create a singleton instance, shared by all threads in the process
+upstream_client = UpstreamTranslator()
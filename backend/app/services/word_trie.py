@@ -0,0 +1,77 @@
+"""
+Word Trie
+Character trie over dictionary words for prefix and longest-match lookups.
+
+Each node is a dict keyed by the next character. A node that ends a word stores the
+word's value under the empty-string key, which can never collide with a character.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_END = ''
+
+
+class WordTrie:
+    def __init__(self, words: Iterable[Tuple[str, Any]] = ()):
+        self._root: Dict[str, Any] = {}
+        self.size = 0
+        self.max_length = 0
+        for word, value in words:
+            self.add(word, value)
+
+    def add(self, word: str, value: Any = None) -> None:
+        """Insert a word, storing value at its terminal node (replacing any previous value)."""
+        if not word:
+            return
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        if _END not in node:
+            self.size += 1
+        node[_END] = word if value is None else value
+        self.max_length = max(self.max_length, len(word))
+
+    def __contains__(self, word: str) -> bool:
+        node = self._root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return False
+        return _END in node
+
+    def __len__(self) -> int:
+        return self.size
+
+    def prefix_matches(self, text: str, pos: int = 0) -> List[Tuple[int, Any]]:
+        """
+        Find every word that starts at text[pos].
+
+        Returns:
+            List of (end, value) pairs, shortest word first, where text[pos:end] is the word
+        """
+        matches = []
+        node = self._root
+        for end in range(pos, len(text)):
+            node = node.get(text[end])
+            if node is None:
+                break
+            if _END in node:
+                matches.append((end + 1, node[_END]))
+        return matches
+
+    def longest_match(self, text: str, pos: int = 0) -> Optional[Tuple[int, Any]]:
+        """
+        Find the longest word that starts at text[pos].
+
+        Returns:
+            (end, value) for the longest match, or None if no word starts there
+        """
+        longest = None
+        node = self._root
+        for end in range(pos, len(text)):
+            node = node.get(text[end])
+            if node is None:
+                break
+            if _END in node:
+                longest = (end + 1, node[_END])
+        return longest
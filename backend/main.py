@@ -1,14 +1,16 @@
 import os
 from flask import Flask, request
 from flask_cors import CORS
-from app.routes import api_bp
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 # First try .env.local, then .env.production, then .env
+# (before importing the routes, since services read their settings at import time)
 env_file = '.env.local' if os.path.exists('.env.local') else '.env.production' if os.path.exists('.env.production') else '.env'
 load_dotenv(env_file)
 
+from app.routes import api_bp
+
 def create_app():
     app = Flask(__name__)
     
@@ -53,6 +55,8 @@ def create_app():
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
             response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
             response.headers['Access-Control-Allow-Credentials'] = 'true'
+            # Lets the frontend read Server-Timing through the Resource Timing API
+            response.headers['Timing-Allow-Origin'] = origin
         return response
     
     return app
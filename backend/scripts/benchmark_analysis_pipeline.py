@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CPU time /api/analyze spends on pinyin and character analysis per sentence.
+
+Compares the previous path (whole-text pypinyin, then a jieba segmentation with a
+pypinyin call and a dictionary lookup for every character) with AnalysisPipeline (one
+segmentation; each distinct word and character resolved once per request), and reports
+how often their output differs.
+
+Usage: python scripts/benchmark_analysis_pipeline.py [text_file] [sentences] [repeats]
+"""
+
+import os
+import re
+import sys
+import time
+
+# Add parent directory to path to import services
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import jieba
+
+from app.services.analysis_pipeline import analysis_pipeline
+from app.services.dictionary_service import dictionary_service
+from app.services.pinyin_service import PinyinService
+
+pinyin_service = PinyinService()
+
+
+def legacy_character_pinyin(char):
+    readings = pinyin_service.generate_character_pinyin(char)
+    return readings[0]['pinyin'] if readings else char
+
+
+def legacy_analyze_characters(text):
+    """The per-character loop TextService.analyze_characters ran before the pipeline."""
+    analysis = []
+    for word in jieba.cut(text, cut_all=False):
+        for i, char in enumerate(word):
+            if '\u4e00' <= char <= '\u9fff':
+                analysis.append({
+                    'character': char,
+                    'pinyin': legacy_character_pinyin(char),
+                    'meaning': dictionary_service.get_translation(char) or 'Unknown',
+                    'word': word,
+                    'word_position': i,
+                    'word_length': len(word),
+                    'is_word_start': i == 0,
+                    'is_word_end': i == len(word) - 1
+                })
+            else:
+                analysis.append({
+                    'character': char,
+                    'pinyin': char,
+                    'meaning': char,
+                    'word': char,
+                    'word_position': 0,
+                    'word_length': 1,
+                    'is_word_start': True,
+                    'is_word_end': True
+                })
+    return analysis
+
+
+def legacy_analyze(text):
+    return {'pinyin': pinyin_service.generate_pinyin(text), 'character_analysis': legacy_analyze_characters(text)}
+
+
+def cpu_time_per_sentence(func, sentences, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.process_time()
+        for sentence in sentences:
+            func(sentence)
+        best = min(best, time.process_time() - start)
+    return best / len(sentences)
+
+
+def main():
+    text_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(BACKEND_DIR, 'chinese_text.txt')
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    with open(text_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    # Sentence boundaries as TextService._segment_into_sentences, keeping the punctuation
+    sentences = [s.strip() for s in re.findall(r'[^。！？\n]+[。！？]?', text) if s.strip()][:count]
+    characters = sum(len(sentence) for sentence in sentences)
+
+    # Warm up jieba, pypinyin and the dictionary before timing
+    for sentence in sentences[:200]:
+        legacy_analyze(sentence)
+        analysis_pipeline.analyze(sentence)
+
+    print(f"Input: {len(sentences)} sentences from {text_file} "
+          f"({characters / len(sentences):.1f} characters on average, best of {repeats})")
+    legacy = cpu_time_per_sentence(legacy_analyze, sentences, repeats)
+    pipeline = cpu_time_per_sentence(analysis_pipeline.analyze, sentences, repeats)
+    print(f"   {'previous path':22s}{legacy * 1e6:9.1f} us CPU per sentence")
+    print(f"   {'AnalysisPipeline':22s}{pipeline * 1e6:9.1f} us CPU per sentence  ({legacy / pipeline:.1f}x)")
+
+    pinyin_differs = 0
+    records = 0
+    readings_differ = 0
+    other_fields_differ = 0
+    for sentence in sentences:
+        before, after = legacy_analyze(sentence), analysis_pipeline.analyze(sentence)
+        pinyin_differs += before['pinyin'] != after['pinyin']
+        for old, new in zip(before['character_analysis'], after['character_analysis']):
+            records += 1
+            readings_differ += old['pinyin'] != new['pinyin']
+            other_fields_differ += {k: v for k, v in old.items() if k != 'pinyin'} != \
+                {k: v for k, v in new.items() if k != 'pinyin'}
+    print(f"\nSentences whose pinyin string differs: {pinyin_differs} of {len(sentences)}")
+    print(f"Character readings that differ (in-word context instead of the isolated character): "
+          f"{readings_differ} of {records}")
+    print(f"Character records differing in any other field: {other_fields_differ}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Compare the default and compact /api/analyze response formats on paragraphs of a text.
+
+For each paragraph (non-empty line) both analyses are built and serialized the way the
+route does (Flask's JSON provider, with its defaults), and the payload size, gzipped
+size and CPU time to build and to serialize each are reported. The two formats are
+timed in alternation, best of several rounds, to even out noise on a shared machine.
+
+Usage: python scripts/benchmark_compact_analysis.py [text_file] [paragraphs] [repeats]
+"""
+
+import gzip
+import os
+import sys
+import time
+
+# Add parent directory to path to import services
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask
+
+from app.services.analysis_pipeline import analysis_pipeline
+
+json_provider = Flask(__name__).json
+
+
+def body(paragraph, analysis, compact):
+    """Response body as /api/analyze builds it, with an empty translation."""
+    result = {'original': paragraph, 'pinyin': analysis['pinyin'], 'translation': ''}
+    if compact:
+        result.update(format='compact', table=analysis['table'], tokens=analysis['tokens'])
+    else:
+        result['character_analysis'] = analysis['character_analysis']
+    return result
+
+
+def cpu_time(func, items):
+    start = time.process_time()
+    for item in items:
+        func(item)
+    return time.process_time() - start
+
+
+def main():
+    text_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(BACKEND_DIR, 'chinese_text.txt')
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 7
+
+    with open(text_file, 'r', encoding='utf-8') as f:
+        paragraphs = [line.strip() for line in f if line.strip()][:count]
+    characters = sum(len(paragraph) for paragraph in paragraphs)
+
+    analyzers = {'default': analysis_pipeline.analyze, 'compact': analysis_pipeline.analyze_compact}
+    formats = {}
+    bodies = {}
+    for name, analyze in analyzers.items():
+        bodies[name] = [body(paragraph, analyze(paragraph), name == 'compact') for paragraph in paragraphs]
+        payloads = [json_provider.dumps(item).encode('utf-8') for item in bodies[name]]
+        formats[name] = {
+            'bytes': sum(len(payload) for payload in payloads),
+            'gzip_bytes': sum(len(gzip.compress(payload)) for payload in payloads),
+            'analyze_s': float('inf'),
+            'serialize_s': float('inf')
+        }
+    for _ in range(repeats):
+        for name, analyze in analyzers.items():
+            result = formats[name]
+            result['analyze_s'] = min(result['analyze_s'], cpu_time(analyze, paragraphs))
+            result['serialize_s'] = min(result['serialize_s'], cpu_time(json_provider.dumps, bodies[name]))
+
+    print(f"Input: {len(paragraphs)} paragraphs from {text_file} "
+          f"({characters / len(paragraphs):.0f} characters on average, best of {repeats})\n")
+    print(f"   {'format':10s}{'KB/para':>10s}{'gzip KB':>10s}{'analyze ms':>12s}{'serialize ms':>14s}  (CPU)")
+    for name, result in formats.items():
+        print(f"   {name:10s}{result['bytes'] / len(paragraphs) / 1024:10.1f}"
+              f"{result['gzip_bytes'] / len(paragraphs) / 1024:10.1f}"
+              f"{result['analyze_s'] / len(paragraphs) * 1000:12.2f}"
+              f"{result['serialize_s'] / len(paragraphs) * 1000:14.2f}")
+
+    default, compact = formats['default'], formats['compact']
+    print(f"\nPayload: {compact['bytes'] / default['bytes']:.1%} of the default "
+          f"({compact['gzip_bytes'] / default['gzip_bytes']:.1%} gzipped)")
+    print(f"Serialization: {default['serialize_s'] / compact['serialize_s']:.1f}x faster; "
+          f"analysis + serialization: {(default['analyze_s'] + default['serialize_s']) / (compact['analyze_s'] + compact['serialize_s']):.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark simplified/traditional conversion throughput.
+
+Compares the previous character-by-character loop (over the memory-mapped store
+mappings, and over plain dicts as it ran before the store existed) with
+ScriptConverter (str.translate table plus phrase-level longest match).
+
+Usage: python scripts/benchmark_script_conversion.py [text_file] [repeats]
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path to import services
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.dictionary_service import dictionary_service
+
+
+def convert_char_by_char(text, mapping):
+    """The original per-character conversion loop."""
+    result = []
+    for char in text:
+        if char in mapping:
+            result.append(mapping[char])
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def best_time(func, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    text_file = os.path.join(BACKEND_DIR, 'chinese_text.txt')
+    if len(sys.argv) > 1:
+        text_file = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    
+    with open(text_file, 'r', encoding='utf-8') as f:
+        traditional = f.read()
+    simplified = dictionary_service.convert_to_simplified(traditional)
+    
+    cases = [
+        ('to simplified', traditional, dictionary_service.trad_to_simp, dictionary_service.to_simplified),
+        ('to traditional', simplified, dictionary_service.simp_to_trad, dictionary_service.to_traditional),
+    ]
+    
+    print(f"Input: {text_file} ({len(traditional)} chars, best of {repeats})")
+    for name, text, store_mapping, converter in cases:
+        megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+        plain_mapping = dict(store_mapping)
+        rows = [
+            ('char loop, store mapping', lambda: convert_char_by_char(text, store_mapping)),
+            ('char loop, plain dict', lambda: convert_char_by_char(text, plain_mapping)),
+            ('str.translate only', lambda: text.translate(converter.table)),
+            ('ScriptConverter', lambda: converter.convert(text)),
+        ]
+        print(f"\n{name} ({megabytes:.2f} MB, {len(converter.phrases)} disambiguating phrases):")
+        for label, func in rows:
+            elapsed = best_time(func, repeats)
+            print(f"   {label:26s}{elapsed * 1000:8.1f} ms  {megabytes / elapsed:7.1f} MB/s")
+        
+        changed = sum(1 for a, b in zip(convert_char_by_char(text, plain_mapping), converter.convert(text)) if a != b)
+        print(f"   Characters changed by phrase mappings: {changed}")
+
+
+if __name__ == '__main__':
+    main()
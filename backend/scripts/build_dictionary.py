@@ -13,6 +13,7 @@ import jieba
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.services.translation_service import TranslationService
+from app.services.rate_limiter import OFFLINE
 
 def extract_chinese_characters(text):
     """Extract all Chinese characters from text"""
@@ -63,7 +64,7 @@ def build_phrase_dictionary_from_text(text, top_phrases=300):
     print(f"\nTranslating {len(most_common_phrases)} phrases...")
     for i, (phrase, count) in enumerate(most_common_phrases):
         try:
-            translation = translation_service.translate(phrase)
+            translation = translation_service.translate(phrase, priority=OFFLINE)
             if translation and translation != phrase and translation.lower() != 'unknown':
                 phrase_dictionary[phrase] = translation
                 print(f"  {i+1}/{len(most_common_phrases)}: {phrase} -> {translation}")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Compile data/local_dictionary.py into the memory-mapped binary store (data/dictionary.bin).
+
+process_dictionary.py writes the store directly; this script rebuilds it from the
+generated Python module without needing pandas or the source word list.
+
+Usage: python scripts/compile_dictionary.py [output_file]
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path to import services and data
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.dictionary_store import DictionaryStore, source_digest, write_dictionary_store
+
+
+def main():
+    output_file = os.path.join(BACKEND_DIR, 'data', 'dictionary.bin')
+    if len(sys.argv) > 1:
+        output_file = sys.argv[1]
+    
+    start = time.perf_counter()
+    from data.local_dictionary import DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED
+    import_time = time.perf_counter() - start
+    
+    # Recorded in the header, so workers rebuild the store when the module changes
+    digest = source_digest(os.path.join(BACKEND_DIR, 'data', 'local_dictionary.py'))
+    write_dictionary_store(DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED, output_file, digest)
+    
+    start = time.perf_counter()
+    store = DictionaryStore(output_file)
+    open_time = time.perf_counter() - start
+    
+    print(f"[+] Wrote {output_file} ({os.path.getsize(output_file) / 1024:.0f} KB)")
+    print(f"   Words: {len(store.dictionary)}")
+    print(f"   Simplified mappings: {len(store.simplified_to_traditional)}")
+    print(f"   Traditional mappings: {len(store.traditional_to_simplified)}")
+    print(f"   Import local_dictionary.py: {import_time * 1000:.1f} ms")
+    print(f"   Open binary store: {open_time * 1000:.2f} ms")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Pre-translate a text (e.g. a book a class is about to read) into the shared
+translation cache and translation memory, so reading it later makes no upstream calls.
+
+The file is streamed line by line and split into sentences the way the translation
+memory splits requests; the words of each sentence that the local dictionary does not
+know are collected too. Both are deduplicated by cache key and sent upstream in packed
+requests, a few at a time, at the offline rate-limiter priority (so the web workers
+sharing the limiter keep their capacity).
+
+Progress is checkpointed after every block of work. An interrupted run resumes from
+the last checkpoint, and texts whose upstream call failed are retried on the next run.
+If more than MAX_FAILED texts are pending a retry (the upstream is down), the run stops
+without checkpointing past the block that overflowed, so no text is skipped.
+
+Usage:
+    python scripts/pretranslate_corpus.py book.txt [--concurrency 4] [--checkpoint book.ckpt]
+    python scripts/pretranslate_corpus.py book.txt --restart
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jieba
+
+# Add parent directory to path to import services
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.batch_packer import MAX_CHUNK_ITEMS
+from app.services.cache_keys import canonical_key
+from app.services.dictionary_service import dictionary_service
+from app.services.rate_limiter import OFFLINE
+from app.services.translation_memory import split_sentences
+from app.services.translation_service import translation_service
+
+_HAN_WORD = re.compile(r'^[\u4e00-\u9fff]+$')
+# Failed texts the checkpoint may hold; past this the run stops rather than drop any
+MAX_FAILED = 10000
+
+
+def load_checkpoint(path, input_path, restart=False):
+    """Return the saved progress for input_path, or a fresh state."""
+    state = {'input': os.path.abspath(input_path), 'offset': 0, 'sentences': 0, 'words': 0,
+             'translated': 0, 'failed': []}
+    if restart or not os.path.exists(path):
+        return state
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    if saved.get('input') != state['input'] or saved.get('offset', 0) > os.path.getsize(input_path):
+        print(f"Checkpoint {path} is for another file or version of it, starting over")
+        return state
+    state.update(saved)
+    return state
+
+
+def save_checkpoint(path, state):
+    """Write the checkpoint atomically, so an interruption never leaves it half written."""
+    state['updated_at'] = time.time()
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def dictionary_misses(sentence):
+    """Words of a sentence the local dictionary has no entry for."""
+    return [word for word in jieba.lcut(sentence)
+            if _HAN_WORD.match(word) and not dictionary_service.get_translation(word)]
+
+
+def read_blocks(input_path, offset, block_size, seen, with_words):
+    """
+    Yield (sentences, words, end offset) blocks of new texts from offset onward.
+
+    Each block holds at least block_size texts not seen before (except the last), and
+    ends on a line boundary, so its end offset is a safe place to resume from.
+    """
+    sentences, words = [], []
+    with open(input_path, 'rb') as f:
+        f.seek(offset)
+        for line in iter(f.readline, b''):
+            for sentence, _ in split_sentences(line.decode('utf-8', errors='replace')):
+                candidates = [(sentence, sentences)]
+                if with_words:
+                    candidates.extend((word, words) for word in dictionary_misses(sentence))
+                for text, texts in candidates:
+                    key = canonical_key(text, dictionary_service.convert_to_simplified)
+                    if key not in seen:
+                        seen.add(key)
+                        texts.append(text)
+            if len(sentences) + len(words) >= block_size:
+                yield sentences, words, f.tell()
+                sentences, words = [], []
+        yield sentences, words, f.tell()
+
+
+def pretranslate(executor, texts):
+    """Translate texts in chunk-sized slices on the executor; return (translated, failed)."""
+    slices = [texts[start:start + MAX_CHUNK_ITEMS] for start in range(0, len(texts), MAX_CHUNK_ITEMS)]
+    translated, failed = 0, []
+    for count, slice_failed in executor.map(lambda part: translation_service.pretranslate(part, OFFLINE), slices):
+        translated += count
+        failed.extend(slice_failed)
+    return translated, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='UTF-8 text file to pre-translate')
+    parser.add_argument('--checkpoint', help='Progress file (default: <input>.pretranslate.json)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    parser.add_argument('--concurrency', type=int, default=4, help='Upstream requests in flight')
+    parser.add_argument('--block-size', type=int, default=500, help='New texts between checkpoints')
+    parser.add_argument('--no-words', action='store_true', help='Only pre-translate sentences')
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.input + '.pretranslate.json'
+    state = load_checkpoint(checkpoint_path, args.input, args.restart)
+    total_size = os.path.getsize(args.input)
+    if state['offset']:
+        print(f"Resuming {args.input} at byte {state['offset']} of {total_size} "
+              f"({len(state['failed'])} failed texts to retry)")
+
+    start = time.time()
+    seen = set()
+    executor = ThreadPoolExecutor(max_workers=max(args.concurrency, 1), thread_name_prefix='pretranslate')
+    try:
+        if state['failed']:
+            translated, state['failed'] = pretranslate(executor, state['failed'])
+            state['translated'] += translated
+            save_checkpoint(checkpoint_path, state)
+
+        for sentences, words, offset in read_blocks(args.input, state['offset'], args.block_size, seen,
+                                                    not args.no_words):
+            translated, failed = pretranslate(executor, sentences + words)
+            state['translated'] += translated
+            if len(state['failed']) + len(failed) > MAX_FAILED:
+                # Redo this block next run (its successes are cached) instead of losing texts
+                save_checkpoint(checkpoint_path, state)
+                executor.shutdown()
+                print(f"\nStopping: over {MAX_FAILED} texts failed, is the upstream down? "
+                      f"Rerun to resume from byte {state['offset']}")
+                sys.exit(1)
+            state['offset'] = offset
+            state['sentences'] += len(sentences)
+            state['words'] += len(words)
+            state['failed'] += failed
+            save_checkpoint(checkpoint_path, state)
+            print(f"  {offset / max(total_size, 1):6.1%}  {state['sentences']} sentences, {state['words']} words, "
+                  f"{state['translated']} translated, {len(state['failed'])} failed")
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun to resume from byte {state['offset']}")
+        executor.shutdown(wait=False, cancel_futures=True)
+        sys.exit(130)
+    executor.shutdown()
+
+    print(f"\nDone in {time.time() - start:.1f}s: {state['sentences']} sentences and {state['words']} "
+          f"dictionary-miss words, {state['translated']} translated upstream")
+    if state['failed']:
+        print(f"{len(state['failed'])} texts failed; rerun to retry them")
+    upstream = translation_service.upstream.stats()
+    print(f"Upstream: {upstream['requests']} requests, {upstream['failures']} failed, "
+          f"p50 latency {upstream['latency_ms']['p50']} ms")
+
+
+if __name__ == '__main__':
+    main()
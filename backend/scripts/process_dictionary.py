@@ -6,15 +6,22 @@ Handles:
 - Duplicate entries (merges same pinyin, keeps different pinyin separate)
 - Moves surname definitions to end
 - Preserves frequency data
-- Generates multiple output formats (Python dict, jieba userdict, stats)
+- Generates multiple output formats (Python dict, binary store, jieba userdict, stats)
 """
 
 import pandas as pd
 import json
+import os
 import re
+import sys
 from collections import defaultdict
 from typing import Dict, List, Tuple
 
+# Add backend directory to path to import the binary store writer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.dictionary_store import source_digest, write_dictionary_store
+
 def is_see_reference(definition: str) -> bool:
     """
     Check if a definition is just a "see" reference (cross-reference).
@@ -229,7 +236,6 @@ def process_dictionary(input_file: str, output_dir: str = 'backend/data'):
     print(f"Moved surnames in {stats['surnames_moved']} entries")
     
     # Generate output files
-    import os
     os.makedirs(output_dir, exist_ok=True)
     
     # 1. Generate Python dictionary file
@@ -237,17 +243,23 @@ def process_dictionary(input_file: str, output_dir: str = 'backend/data'):
     generate_python_dict(final_dictionary, simplified_to_traditional, traditional_to_simplified, 
                         f"{output_dir}/local_dictionary.py")
     
-    # 2. Generate jieba userdict file
+    # 2. Generate memory-mapped binary store (loaded by DictionaryService)
+    print(f"Generating {output_dir}/dictionary.bin...")
+    write_dictionary_store(final_dictionary, simplified_to_traditional, traditional_to_simplified,
+                           f"{output_dir}/dictionary.bin", source_digest(f"{output_dir}/local_dictionary.py"))
+    
+    # 3. Generate jieba userdict file
     print(f"Generating {output_dir}/jieba_userdict.txt...")
     generate_jieba_dict(final_dictionary, f"{output_dir}/jieba_userdict.txt")
     
-    # 3. Generate statistics file
+    # 4. Generate statistics file
     print(f"Generating {output_dir}/dictionary_stats.json...")
     with open(f"{output_dir}/dictionary_stats.json", 'w', encoding='utf-8') as f:
         json.dump(stats, f, indent=2, ensure_ascii=False)
     
     print("\n[+] Dictionary processing complete!")
     print(f"   - Python dictionary: {output_dir}/local_dictionary.py")
+    print(f"   - Binary store: {output_dir}/dictionary.bin")
     print(f"   - Jieba userdict: {output_dir}/jieba_userdict.txt")
     print(f"   - Statistics: {output_dir}/dictionary_stats.json")
     
@@ -310,8 +322,6 @@ def generate_jieba_dict(dictionary: Dict, output_file: str):
                 f.write(f"{simplified} {freq_int} {pinyin}\n")
 
 if __name__ == '__main__':
-    import sys
-    
     input_file = 'FG_word_list_full.txt'
     if len(sys.argv) > 1:
         input_file = sys.argv[1]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Replay a request log against the translation cache with raw and canonical keys.
+
+Reports how many lookups would hit the cache when keys are the raw request text
+(as before) versus the canonical key (script, whitespace and punctuation normalized),
+for an unbounded cache or an LRU of the given size.
+
+The log is either plain text (one request text per line) or JSON lines holding request
+bodies ({"text": ...}, {"word": ...} or {"items": [...]}). Without a log, one is
+synthesized from a corpus: sentences drawn with a skewed popularity, each written in
+simplified or traditional script and with varying whitespace and punctuation, the way
+readers of both scripts select the same passages.
+
+Usage:
+    python scripts/replay_cache_keys.py [request_log] [--cache-size 2048]
+    python scripts/replay_cache_keys.py --corpus chinese_text.txt --requests 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import OrderedDict
+
+# Add parent directory to path to import services
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.cache_keys import canonical_key
+from app.services.dictionary_service import dictionary_service
+
+
+def read_log(path):
+    """Yield request texts from a plain-text or JSON-lines log."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if line.startswith('{'):
+                body = json.loads(line)
+                if 'items' in body:
+                    yield from body['items']
+                elif body.get('text') or body.get('word'):
+                    yield body.get('text') or body.get('word')
+            else:
+                yield line
+
+
+def synthesize_log(corpus_path, requests, seed):
+    """Draw sentences from a corpus, varying script, whitespace and punctuation."""
+    rng = random.Random(seed)
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    # Sentence boundaries as TextService._segment_into_sentences, keeping the punctuation
+    sentences = [s.strip() for s in re.findall(r'[^。！？\n]+[。！？]?', text) if len(s.strip()) > 1]
+    weights = [1 / (rank + 1) for rank in range(len(sentences))]
+    rng.shuffle(sentences)
+
+    for sentence in rng.choices(sentences, weights=weights, k=requests):
+        if rng.random() < 0.5:
+            sentence = dictionary_service.convert_to_simplified(sentence)
+        else:
+            sentence = dictionary_service.convert_to_traditional(sentence)
+        if rng.random() < 0.2:
+            sentence = '　' + sentence + ' '
+        if rng.random() < 0.2:
+            sentence = sentence.replace('，', ', ').replace('。', '.')
+        yield sentence
+
+
+def replay(texts, key_func, cache_size):
+    """Return (hits, lookups, distinct keys) for an LRU of cache_size (0 = unbounded)."""
+    cache = OrderedDict()
+    hits = 0
+    for text in texts:
+        key = key_func(text)
+        if key in cache:
+            hits += 1
+            cache.move_to_end(key)
+        else:
+            cache[key] = True
+            if cache_size and len(cache) > cache_size:
+                cache.popitem(last=False)
+    return hits, len(texts), len(cache) if not cache_size else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', nargs='?', help='Request log to replay (default: synthesize one from --corpus)')
+    parser.add_argument('--corpus', default=os.path.join(BACKEND_DIR, 'chinese_text.txt'))
+    parser.add_argument('--requests', type=int, default=20000, help='Requests to synthesize')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cache-size', type=int, default=0, help='LRU entries (0 = unbounded)')
+    args = parser.parse_args()
+
+    if args.log:
+        texts = list(read_log(args.log))
+        source = args.log
+    else:
+        texts = list(synthesize_log(args.corpus, args.requests, args.seed))
+        source = f"{len(texts)} requests synthesized from {args.corpus}"
+
+    start = time.perf_counter()
+    canonical = {text: canonical_key(text, dictionary_service.convert_to_simplified) for text in set(texts)}
+    key_time = (time.perf_counter() - start) / max(len(canonical), 1)
+
+    print(f"Log: {source}")
+    print(f"Cache: {'LRU of ' + str(args.cache_size) if args.cache_size else 'unbounded'}")
+    raw_hits, lookups, raw_keys = replay(texts, lambda text: text, args.cache_size)
+    canonical_hits, _, canonical_keys = replay(texts, canonical.__getitem__, args.cache_size)
+
+    raw_rate = raw_hits / lookups if lookups else 0.0
+    canonical_rate = canonical_hits / lookups if lookups else 0.0
+    print(f"  {'keys':<10} {'hit rate':>9} {'hits':>8} {'distinct':>9}")
+    print(f"  {'raw':<10} {raw_rate:>9.1%} {raw_hits:>8} {raw_keys if raw_keys is not None else '-':>9}")
+    print(f"  {'canonical':<10} {canonical_rate:>9.1%} {canonical_hits:>8} "
+          f"{canonical_keys if canonical_keys is not None else '-':>9}")
+    print(f"Upstream calls avoided: {canonical_hits - raw_hits} of {lookups - raw_hits} "
+          f"({(canonical_hits - raw_hits) / max(lookups - raw_hits, 1):.1%} of raw misses)")
+    print(f"Canonicalization: {key_time * 1e6:.1f} us per key")
+
+
+if __name__ == '__main__':
+    main()
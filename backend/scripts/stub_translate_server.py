@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Local stub of the upstream translate_a/single endpoint, for testing without network access.
+
+Responds with the same nested JSON shape as the real endpoint. The "translation" of each
+segment is its text wrapped as EN<...>, and line breaks are kept the way the real service
+keeps them. Latency, error rate and error status can be injected.
+
+Usage:
+    python scripts/stub_translate_server.py [--port 8765] [--latency-ms 50] [--error-rate 0.1] [--error-status 503]
+    UPSTREAM_TRANSLATE_URL=http://127.0.0.1:8765/translate_a/single python main.py
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_translation(text):
+    """Build a translate_a/single style response body for text."""
+    parts = []
+    # The real service returns one part per sentence, keeping trailing newlines on each part
+    for segment in re.findall(r'[^\n。！？]*[。！？]?\n?', text):
+        if not segment:
+            continue
+        body = segment.rstrip('\n')
+        translated = f"EN<{body}>" if body.strip() else body
+        translated += '\n' * (len(segment) - len(body))
+        parts.append([translated, segment, None, None, 10])
+    return [parts, None, 'zh-CN']
+
+
+def make_handler(latency, error_rate, error_status):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately; don't let Nagle delay keep-alive replies
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/translate_a/single':
+                self._reply(404, {'error': 'not found'})
+                return
+
+            if latency:
+                time.sleep(latency)
+            if random.random() < error_rate:
+                self._reply(error_status, {'error': 'injected failure'})
+                return
+
+            text = parse_qs(url.query).get('q', [''])[0]
+            self._reply(200, fake_translation(text))
+
+        def _reply(self, status, body):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected failures')
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency_ms / 1000, args.error_rate, args.error_status)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Stub translator listening on http://{args.host}:{args.port}/translate_a/single")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
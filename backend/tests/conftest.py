@@ -0,0 +1,70 @@
+"""
+Shared fixtures: a small dictionary compiled into a store under a temporary directory.
+
+Run from the backend directory with: python -m pytest -q
+"""
+
+import os
+import sys
+
+# Keep the service singletons imported by the modules under test off the shared
+# databases in data/ (they are created at import time)
+os.environ.setdefault('TRANSLATION_CACHE_PATH', '')
+os.environ.setdefault('TRANSLATION_MEMORY_PATH', '')
+os.environ.setdefault('DEFERRED_TEXTS_PATH', '')
+os.environ.setdefault('TRANSLATION_MODE', 'offline')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import pytest
+
+from app.services.dictionary_store import DictionaryStore, write_dictionary_store
+
+# Same shape as data/local_dictionary.py: traditional word -> entries
+DICTIONARY = {
+    '中': [{'pinyin': 'zhōng', 'definition': '1. middle; 2. center', 'frequency': 0.9, 'simplified': '中'},
+           {'pinyin': 'zhòng', 'definition': 'to hit (a target)', 'frequency': 0.1, 'simplified': '中'}],
+    '中國': [{'pinyin': 'Zhōng guó', 'definition': 'China', 'frequency': 0.8, 'simplified': '中国'}],
+    '中國人': [{'pinyin': 'Zhōng guó rén', 'definition': 'Chinese person', 'frequency': 0.5,
+               'simplified': '中国人'}],
+    '國': [{'pinyin': 'guó', 'definition': 'country', 'frequency': 0.7, 'simplified': '国'}],
+    '人': [{'pinyin': 'rén', 'definition': 'person', 'frequency': 0.9, 'simplified': '人'}],
+    '學': [{'pinyin': 'xué', 'definition': '1. to learn; 2. to study', 'frequency': 0.8, 'simplified': '学'}],
+    '學生': [{'pinyin': 'xué sheng', 'definition': 'student', 'frequency': 0.7, 'simplified': '学生'}],
+    '學校': [{'pinyin': 'xué xiào', 'definition': 'school', 'frequency': 0.7, 'simplified': '学校'}],
+    '好': [{'pinyin': 'hǎo', 'definition': 'good', 'frequency': 0.9, 'simplified': '好'},
+           {'pinyin': 'hào', 'definition': 'to be fond of', 'frequency': 0.2, 'simplified': '好'}],
+    '你好': [{'pinyin': 'nǐ hǎo', 'definition': 'hello', 'frequency': 0.9, 'simplified': '你好'}],
+    '頭': [{'pinyin': 'tóu', 'definition': 'head', 'frequency': 0.6, 'simplified': '头'}],
+    '頭髮': [{'pinyin': 'tóu fa', 'definition': 'hair (on the head)', 'frequency': 0.4, 'simplified': '头发'}],
+    '發': [{'pinyin': 'fā', 'definition': 'to send out', 'frequency': 0.6, 'simplified': '发'}],
+    '髮': [{'pinyin': 'fà', 'definition': 'hair', 'frequency': 0.3, 'simplified': '发'}],
+    '王': [{'pinyin': 'Wáng', 'definition': 'surname Wang', 'frequency': 0.5, 'simplified': '王'},
+           {'pinyin': 'wáng', 'definition': 'king', 'frequency': 0.5, 'simplified': '王'}],
+    '女': [{'pinyin': 'nǚ', 'definition': 'female', 'frequency': 0.6, 'simplified': '女'}],
+}
+
+SIMPLIFIED_TO_TRADITIONAL = {
+    '中': '中', '国': '國', '学': '學', '头': '頭', '发': '發', '头发': '頭髮', '中国': '中國',
+}
+
+TRADITIONAL_TO_SIMPLIFIED = {
+    '中': '中', '國': '国', '學': '学', '頭': '头', '發': '发', '髮': '发', '頭髮': '头发', '中國': '中国',
+}
+
+SOURCE_DIGEST = bytes(range(16))
+
+
+@pytest.fixture(scope='session')
+def store_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('store') / 'dictionary.bin')
+    write_dictionary_store(DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED, path, SOURCE_DIGEST)
+    return path
+
+
+@pytest.fixture(scope='session')
+def store(store_path):
+    store = DictionaryStore(store_path)
+    yield store
+    store.close()
@@ -0,0 +1,65 @@
+from urllib.parse import quote
+
+from app.services.batch_packer import BatchStats, frame_item, join_chunk, pack_chunks, split_chunk
+
+
+def query_length(chunk):
+    return len(quote(join_chunk(chunk), safe=''))
+
+
+def test_frame_item_keeps_one_line():
+    assert frame_item('  你好\n世界\t! ') == '你好 世界 !'
+    assert frame_item('a, b') == 'a, b'
+
+
+def test_pack_keeps_order_and_items():
+    items = [f'项目{i}' for i in range(120)]
+    chunks = pack_chunks(items, max_query_length=10_000, max_items=50)
+    assert [len(chunk) for chunk in chunks] == [50, 50, 20]
+    assert [item for chunk in chunks for item in chunk] == items
+
+
+def test_pack_respects_query_length():
+    items = ['学习中文', '你好，世界', 'hello', '中国人', '一二三四五六七八九十'] * 10
+    chunks = pack_chunks(items, max_query_length=120, max_items=50)
+    assert [item for chunk in chunks for item in chunk] == items
+    assert all(query_length(chunk) <= 120 for chunk in chunks)
+    # Greedy: each chunk is full, so the next item would not have fit
+    for chunk, following in zip(chunks, chunks[1:]):
+        assert query_length(chunk + following[:1]) > 120
+
+
+def test_oversized_item_gets_its_own_chunk():
+    long_item = '长' * 100
+    chunks = pack_chunks(['短', long_item, '短'], max_query_length=60, max_items=50)
+    assert chunks == [('短',), (long_item,), ('短',)]
+
+
+def test_pack_empty():
+    assert pack_chunks([]) == []
+
+
+def test_join_and_split_round_trip():
+    chunk = ('你好', '多行\n文本', '逗号, 也行')
+    assert join_chunk(chunk) == '你好\n多行 文本\n逗号, 也行'
+    assert split_chunk(chunk, 'Hello\n Multi-line text \nCommas, fine') == ['Hello', 'Multi-line text', 'Commas, fine']
+
+
+def test_split_rejects_misaligned_lines():
+    assert split_chunk(('一', '二', '三'), 'One\nTwo') is None
+    assert split_chunk(('一', '二'), 'One\nTwo\nThree') is None
+
+
+def test_single_item_chunk_is_never_misaligned():
+    assert split_chunk(('一',), 'One\nline') == ['One line']
+
+
+def test_batch_stats():
+    stats = BatchStats()
+    stats.record(5, 'aligned')
+    stats.record(3, 'misaligned')
+    stats.record(2, 'failed')
+    result = stats.stats()
+    assert (result['chunks'], result['items'], result['aligned_items']) == (3, 10, 5)
+    # Failed requests say nothing about framing
+    assert result['alignment_rate'] == 0.5
@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.cache_keys import canonical_key
+from app.services.script_converter import ScriptConverter
+
+to_simplified = ScriptConverter({'學': '学', '習': '习', '國': '国', '髮': '发', '頭髮': '头发'}).convert
+
+
+def key(text):
+    return canonical_key(text, to_simplified)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('學習中文', '学习中文'),
+    ('ＡＢＣ１２３', 'ABC123'),
+    ('你好。', '你好.'),
+    ('你好，世界！', '你好,世界!'),
+    ('「你好」', '"你好"'),
+    ('《中國》', '<中国>'),
+    ('你 好', '你好'),
+    (' 中　文 ', '中文'),
+    ('hello   world', 'hello world'),
+    ('a 中 b', 'a中b'),
+    ('頭髮', '头发'),
+    ('', ''),
+])
+def test_canonical_key(text, expected):
+    assert key(text) == expected
+
+
+def test_variants_share_a_key():
+    variants = ['我學習中文。', '我学习中文。', '我学习中文.', '我 学习 中文 。', '我學習中文．']
+    assert len({key(text) for text in variants}) == 1
+
+
+def test_different_texts_keep_different_keys():
+    assert key('学习') != key('学')
+    assert key('hello world') != key('helloworld')
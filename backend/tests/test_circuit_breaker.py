@@ -0,0 +1,115 @@
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+def make_breaker():
+    return CircuitBreaker(window=10, min_calls=4, error_rate=0.5, slow_call_seconds=1.0,
+                          slow_rate=0.5, open_seconds=30, half_open_calls=2)
+
+
+def call(breaker, success=True, latency=0.1):
+    assert breaker.allow()
+    breaker.record(success, latency)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, success=False)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_error_rate(clock):
+    breaker = make_breaker()
+    call(breaker)
+    call(breaker)
+    call(breaker, success=False)
+    assert breaker.state == CLOSED
+    call(breaker, success=False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+    assert breaker.stats()['opened'] == 1
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = make_breaker()
+    for latency in (0.1, 0.1, 2.0, 2.0):
+        call(breaker, latency=latency)
+    assert breaker.state == OPEN
+
+
+def test_window_forgets_old_failures(clock):
+    breaker = make_breaker()
+    call(breaker, success=False)
+    for _ in range(9):
+        call(breaker)
+    # The first failure has left the window of 10 by the time these arrive
+    for _ in range(4):
+        call(breaker, success=False)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_error_rate'] == 0.4
+    call(breaker, success=False)
+    assert breaker.state == OPEN
+
+
+def open_breaker(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        call(breaker, success=False)
+    assert breaker.state == OPEN
+    clock.now += 29.9
+    assert breaker.state == OPEN
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def test_half_open_probes_close_the_circuit(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow()
+    assert breaker.allow()
+    # Only half_open_calls probes at a time
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == HALF_OPEN
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_calls'] == 0
+
+
+@pytest.mark.parametrize('success, latency', [(False, 0.1), (True, 5.0)])
+def test_failed_or_slow_probe_reopens(clock, success, latency):
+    breaker = open_breaker(clock)
+    assert breaker.allow()
+    breaker.record(success, latency)
+    assert breaker.state == OPEN
+    assert breaker.stats()['opened'] == 2
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+
+def test_late_results_while_open_are_ignored(clock):
+    breaker = make_breaker()
+    assert breaker.allow()
+    for _ in range(4):
+        call(breaker, success=False)
+    breaker.record(True, 0.1)
+    assert breaker.state == OPEN
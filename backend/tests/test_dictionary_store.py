@@ -0,0 +1,120 @@
+import os
+import shutil
+import struct
+
+import pytest
+
+from app.services.dictionary_store import (
+    FORMAT_VERSION, MAGIC, DictionaryStore, open_dictionary_store, source_digest, write_dictionary_store
+)
+from conftest import DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, SOURCE_DIGEST, TRADITIONAL_TO_SIMPLIFIED
+
+
+def copy_store(store_path, tmp_path):
+    path = str(tmp_path / 'copy.bin')
+    shutil.copyfile(store_path, path)
+    return path
+
+
+def patch_bytes(path, offset, data):
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def test_dictionary_round_trip(store):
+    assert len(store.dictionary) == len(DICTIONARY)
+    assert list(store.dictionary) == sorted(DICTIONARY)
+    for word, entries in DICTIONARY.items():
+        assert word in store.dictionary
+        assert store.dictionary[word] == entries
+    assert '不在' not in store.dictionary
+    with pytest.raises(KeyError):
+        store.dictionary['不在']
+
+
+def test_mappings_round_trip(store):
+    assert dict(store.simplified_to_traditional.items()) == SIMPLIFIED_TO_TRADITIONAL
+    assert dict(store.traditional_to_simplified.items()) == TRADITIONAL_TO_SIMPLIFIED
+    assert store.simplified_to_traditional['国'] == '國'
+    assert '國' not in store.simplified_to_traditional
+
+
+def test_entry_counts(store):
+    assert store.dictionary.entry_count == sum(len(entries) for entries in DICTIONARY.values())
+    assert store.dictionary.multi_entry_words() == sum(1 for entries in DICTIONARY.values() if len(entries) > 1)
+
+
+def test_preferred_entry_skips_surnames(store):
+    index = store.dictionary.index_of('王')
+    assert store.dictionary.preferred_entry(index)['definition'] == 'king'
+    assert store.dictionary.combined_definition(index).startswith('1. king')
+
+
+def test_header_records_source_digest(store):
+    assert store.source_digest == SOURCE_DIGEST
+
+
+def test_store_without_digest(tmp_path):
+    path = str(tmp_path / 'dictionary.bin')
+    write_dictionary_store(DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED, path)
+    store = DictionaryStore(path)
+    assert store.source_digest is None
+    store.close()
+
+
+def test_write_leaves_no_temporary_files(tmp_path):
+    write_dictionary_store(DICTIONARY, SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED,
+                           str(tmp_path / 'dictionary.bin'), SOURCE_DIGEST)
+    assert os.listdir(tmp_path) == ['dictionary.bin']
+
+
+def test_open_checks_digest(store_path):
+    store = open_dictionary_store(store_path, SOURCE_DIGEST)
+    assert store is not None
+    store.close()
+    # Without a digest to compare (no dictionary module), any compatible store is used
+    store = open_dictionary_store(store_path)
+    assert store is not None
+    store.close()
+    assert open_dictionary_store(store_path, b'\xff' * 16) is None
+
+
+def test_open_missing_store(tmp_path):
+    assert open_dictionary_store(str(tmp_path / 'missing.bin')) is None
+
+
+def test_rejects_bad_magic(store_path, tmp_path):
+    path = copy_store(store_path, tmp_path)
+    patch_bytes(path, 0, b'NOTADICT')
+    with pytest.raises(ValueError, match='not a dictionary store'):
+        DictionaryStore(path)
+    assert open_dictionary_store(path) is None
+
+
+def test_rejects_other_format_version(store_path, tmp_path):
+    path = copy_store(store_path, tmp_path)
+    patch_bytes(path, len(MAGIC), struct.pack('<I', FORMAT_VERSION - 1))
+    with pytest.raises(ValueError, match='format version'):
+        DictionaryStore(path)
+    assert open_dictionary_store(path, SOURCE_DIGEST) is None
+
+
+def test_rejects_truncated_store(tmp_path):
+    path = str(tmp_path / 'truncated.bin')
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+    with pytest.raises(ValueError, match='truncated'):
+        DictionaryStore(path)
+    assert open_dictionary_store(path) is None
+
+
+def test_source_digest(tmp_path):
+    path = tmp_path / 'local_dictionary.py'
+    path.write_text('DICTIONARY = {}\n')
+    digest = source_digest(str(path))
+    assert len(digest) == 16
+    assert source_digest(str(path)) == digest
+    path.write_text('DICTIONARY = {"x": []}\n')
+    assert source_digest(str(path)) != digest
+    assert source_digest(str(tmp_path / 'missing.py')) is None
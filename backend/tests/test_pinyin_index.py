@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.dictionary_store import normalize_pinyin_query, pinyin_index_keys
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('nǐ hǎo', 'nǐ hǎo'),
+    ('ni hao', 'ni hao'),
+    ('  NI   Hao ', 'ni hao'),
+    ('ni3 hao3', 'ni3 hao3'),
+    ('ni3 hao3 ma', 'ni3 hao3 ma5'),
+    ('ma0', 'ma5'),
+    ('nv3', 'nü3'),
+    ('lu:4', 'lü4'),
+    ('nü', 'nü'),
+    ('', ''),
+])
+def test_normalize_pinyin_query(query, expected):
+    assert normalize_pinyin_query(query) == expected
+
+
+def test_index_keys():
+    assert pinyin_index_keys('Nǐ hǎo') == ['nǐ hǎo', 'ni hao', 'ni3 hao3']
+    assert pinyin_index_keys('xué sheng') == ['xué sheng', 'xue sheng', 'xue2 sheng5']
+    assert pinyin_index_keys('nǚ') == ['nǚ', 'nü', 'nü3']
+    assert pinyin_index_keys('  ') == []
+
+
+def test_every_query_form_finds_the_entry():
+    # A query in any of the three forms normalizes to one of the entry's keys
+    keys = pinyin_index_keys('Zhōng guó')
+    for query in ('Zhōng guó', 'zhong guo', 'Zhong1 guo2', 'ZHONG1 GUO2'):
+        assert normalize_pinyin_query(query) in keys
+
+
+def test_store_index(store):
+    index = store.pinyin_index
+    assert index.count('ni hao') == 1
+    assert index.count('zhong') == 2
+    assert index.count('zhong4') == 1
+    assert index.count('hǎo') == 1
+    assert index.count('missing') == 0
+
+    words = [store.dictionary.entry_with_word(entry)[0] for entry in index.postings('zhong')]
+    assert words == ['中', '中']
+    assert len(index.postings('zhong', offset=1)) == 1
+    assert len(index.postings('zhong', limit=1)) == 1
+    assert index.postings('zhong', offset=5) == ()
+    word, entry = store.dictionary.entry_with_word(index.postings('nü3')[0])
+    assert (word, entry['definition']) == ('女', 'female')
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    BATCH, INTERACTIVE, OFFLINE, LocalTokenBucket, RateLimiter, RateLimitTimeout, SQLiteTokenBucket
+)
+
+
+class FakeClock:
+    """Stands in for the time module; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['local', 'sqlite'])
+def make_bucket(request, tmp_path):
+    def make(rate, burst):
+        if request.param == 'local':
+            return LocalTokenBucket(rate, burst)
+        return SQLiteTokenBucket(str(tmp_path / 'limits.sqlite3'), rate, burst)
+    return make
+
+
+def test_bucket_burst_then_refill(clock, make_bucket):
+    bucket = make_bucket(rate=2, burst=3)
+    assert [bucket.take(0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(0) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take(0) == 0
+    # Refills stop at the burst size
+    clock.now += 100
+    assert [bucket.take(0) for _ in range(4)][-1] > 0
+
+
+def test_bucket_reserve(clock, make_bucket):
+    bucket = make_bucket(rate=1, burst=4)
+    assert bucket.take(2) == 0
+    assert bucket.take(2) == 0
+    # Two tokens left: a class that must leave two behind waits, an unreserved one does not
+    assert bucket.take(2) == pytest.approx(1.0)
+    assert bucket.take(0) == 0
+
+
+def test_sqlite_bucket_is_shared(clock, tmp_path):
+    path = str(tmp_path / 'limits.sqlite3')
+    first = SQLiteTokenBucket(path, rate=1, burst=2)
+    second = SQLiteTokenBucket(path, rate=1, burst=2)
+    assert first.take(0) == 0
+    assert second.take(0) == 0
+    assert first.take(0) > 0
+
+
+def test_acquire_waits_for_refill(clock):
+    limiter = RateLimiter(LocalTokenBucket(rate=10, burst=2), max_wait=5)
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == pytest.approx(0.1)
+    stats = limiter.stats()['classes']['interactive']
+    assert stats['acquired'] == 3
+    assert stats['queued'] == 0
+
+
+def test_acquire_times_out(clock):
+    limiter = RateLimiter(LocalTokenBucket(rate=0.01, burst=1), reserves={BATCH: 0.0}, max_wait=1)
+    limiter.acquire(BATCH)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(BATCH)
+    assert limiter.stats()['classes']['batch']['timeouts'] == 1
+    assert limiter.stats()['queue_depth'] == 0
+
+
+def test_reserves_hold_tokens_back_from_lower_classes(clock):
+    limiter = RateLimiter(LocalTokenBucket(rate=0.01, burst=4), reserves={BATCH: 0.25, OFFLINE: 0.5}, max_wait=1)
+    limiter.acquire(OFFLINE)
+    limiter.acquire(OFFLINE)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(OFFLINE)
+    limiter.acquire(BATCH)
+    limiter.acquire(INTERACTIVE)
+
+
+class GateBucket:
+    """Hands out exactly the tokens released to it."""
+    rate = 1.0
+    burst = 1.0
+
+    def __init__(self):
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def take(self, reserve):
+        with self._lock:
+            if self.tokens > 0:
+                self.tokens -= 1
+                return 0.0
+            return 0.01
+
+    def release(self):
+        with self._lock:
+            self.tokens += 1
+
+    def stats(self):
+        return {}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_waiters_are_served_in_priority_order():
+    bucket = GateBucket()
+    limiter = RateLimiter(bucket, max_wait=10)
+    served = []
+
+    def acquire(priority):
+        limiter.acquire(priority)
+        served.append(priority)
+
+    threads = []
+    for priority in (OFFLINE, BATCH, INTERACTIVE):
+        thread = threading.Thread(target=acquire, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: limiter.stats()['queue_depth'] == len(threads))
+    # Let the first arrival notice it is no longer at the head of the queue
+    time.sleep(0.1)
+
+    for count in range(1, 4):
+        bucket.release()
+        wait_for(lambda: len(served) == count)
+    for thread in threads:
+        thread.join()
+    assert served == [INTERACTIVE, BATCH, OFFLINE]
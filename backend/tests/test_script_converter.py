@@ -0,0 +1,69 @@
+import random
+
+from app.services.script_converter import ScriptConverter
+
+MAPPING = {
+    '头': '頭', '发': '發', '面': '麵', '条': '條', '干': '幹', '里': '裡', '后': '後',
+    # Phrases that pick the other traditional form of an ambiguous character
+    '头发': '頭髮', '理发': '理髮', '理发店': '理髮店', '方面': '方面', '干净': '乾淨',
+    '皇后': '皇后', '公里': '公里',
+    # Converts the same character by character, so it is dropped
+    '面条': '麵條',
+}
+
+
+def naive_convert(converter, text):
+    """Leftmost-longest phrase match tried at every position, characters otherwise."""
+    longest = max(map(len, converter.phrases), default=0)
+    pieces = []
+    pos = 0
+    while pos < len(text):
+        for end in range(min(len(text), pos + longest), pos + 1, -1):
+            if text[pos:end] in converter.phrases:
+                pieces.append(converter.phrases[text[pos:end]])
+                pos = end
+                break
+        else:
+            pieces.append(text[pos].translate(converter.table))
+            pos += 1
+    return ''.join(pieces)
+
+
+def test_characters():
+    converter = ScriptConverter({'国': '國', '学': '學', '中': '中'})
+    assert converter.convert('中国学生') == '中國學生'
+    assert converter.convert('abc') == 'abc'
+    assert converter.phrases == {}
+
+
+def test_phrases_take_precedence():
+    converter = ScriptConverter(MAPPING)
+    assert converter.convert('头发') == '頭髮'
+    assert converter.convert('发展') == '發展'
+    assert converter.convert('理发店里') == '理髮店裡'
+    assert converter.convert('方面条') == '方面條'
+    assert converter.convert('干净的面条') == '乾淨的麵條'
+    assert converter.convert('五公里后') == '五公里後'
+    assert converter.convert('') == ''
+
+
+def test_redundant_phrases_are_dropped():
+    converter = ScriptConverter(MAPPING)
+    assert '面条' not in converter.phrases
+    assert '头发' in converter.phrases
+
+
+def test_reduced_mapping_converts_the_same():
+    converter = ScriptConverter(MAPPING)
+    reduced = ScriptConverter(converter.reduced_mapping())
+    assert reduced.phrases == converter.phrases
+    assert reduced.table == converter.table
+
+
+def test_matches_naive_longest_match():
+    converter = ScriptConverter(MAPPING)
+    rng = random.Random(5)
+    pieces = list(MAPPING) + ['的', '我', '理', '方', '皇', '公', '净']
+    for _ in range(500):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 12)))
+        assert converter.convert(text) == naive_convert(converter, text), text
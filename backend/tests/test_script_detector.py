@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from app.services import script_detector
+from app.services.script_detector import (
+    CHUNK_SIZE, CJK_END, CJK_START, SIMPLIFIED_ONLY, TRADITIONAL_ONLY, ScriptDetector, classification_flags
+)
+
+SIMPLIFIED_TO_TRADITIONAL = {'学': '學', '习': '習', '国': '國', '们': '們', '中': '中', '学习': '學習'}
+TRADITIONAL_TO_SIMPLIFIED = {'學': '学', '習': '习', '國': '国', '們': '们', '中': '中', '學習': '学习'}
+
+SIMPLIFIED = '我们学习中国'
+TRADITIONAL = '我們學習中國'
+
+
+@pytest.fixture
+def detector():
+    return ScriptDetector(SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED)
+
+
+def pure_python(detector):
+    """The same detector without its NumPy path."""
+    detector._flags_array = None
+    return detector
+
+
+def test_classification_flags():
+    flags = classification_flags(SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED)
+    assert len(flags) == CJK_END - CJK_START + 1
+    assert flags[ord('学') - CJK_START] == SIMPLIFIED_ONLY
+    assert flags[ord('學') - CJK_START] == TRADITIONAL_ONLY
+    # Same in both scripts, and phrases, are not flagged
+    assert flags[ord('中') - CJK_START] == 0
+    assert sum(1 for flag in flags if flag) == 8
+
+
+def test_from_flags_matches_constructor(detector):
+    flags = classification_flags(SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED)
+    from_flags = ScriptDetector.from_flags(memoryview(flags))
+    for text in (SIMPLIFIED, TRADITIONAL, SIMPLIFIED + TRADITIONAL):
+        assert from_flags.detect(text) == detector.detect(text)
+
+
+def test_verdicts(detector):
+    assert detector.detect(SIMPLIFIED * 3)['script_type'] == 'simplified'
+    assert detector.detect(TRADITIONAL * 3)['script_type'] == 'traditional'
+    mixed = detector.detect(SIMPLIFIED + TRADITIONAL)
+    assert mixed['script_type'] == 'mixed'
+    assert (mixed['simplified_only'], mixed['traditional_only']) == (4, 4)
+
+
+def test_few_han_characters_default_to_traditional(detector):
+    result = detector.detect('学习 abc')
+    assert result['script_type'] == 'traditional'
+    assert result['confidence'] == 0.0
+    assert result['han'] == 2
+
+
+def test_early_exit(detector):
+    text = SIMPLIFIED * (4 * CHUNK_SIZE // len(SIMPLIFIED))
+    result = detector.detect(text)
+    assert result['early_exit']
+    assert result['characters_examined'] == CHUNK_SIZE
+    assert result['script_type'] == 'simplified'
+
+    full = detector.detect(text, early_exit=False)
+    assert not full['early_exit']
+    assert full['characters_examined'] == len(text)
+    assert full['script_type'] == 'simplified'
+
+
+def test_no_early_exit_while_undecided(detector):
+    text = (SIMPLIFIED + TRADITIONAL) * (3 * CHUNK_SIZE // 12)
+    result = detector.detect(text)
+    assert not result['early_exit']
+    assert result['characters_examined'] == len(text)
+    assert result['script_type'] == 'mixed'
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_lone_surrogates(detector, numpy):
+    if not numpy:
+        pure_python(detector)
+    elif script_detector.np is None:
+        pytest.skip('NumPy is not installed')
+    result = detector.detect('\ud800' + SIMPLIFIED + '\udfff')
+    assert result['han'] == len(SIMPLIFIED)
+    assert result['characters_examined'] == len(SIMPLIFIED) + 2
+
+
+def test_numpy_and_pure_python_counts_agree(detector):
+    if script_detector.np is None:
+        pytest.skip('NumPy is not installed')
+    reference = pure_python(ScriptDetector(SIMPLIFIED_TO_TRADITIONAL, TRADITIONAL_TO_SIMPLIFIED))
+    # Every code point of the block, then random text around and outside it
+    every = ''.join(chr(code) for code in range(CJK_START, CJK_END + 1))
+    assert detector._count_chunk(every) == reference._count_chunk(every)
+    rng = random.Random(3)
+    pool = list(TRADITIONAL + SIMPLIFIED) + ['a', '。', '\U00020000', '\ud800', chr(CJK_START - 1), chr(CJK_END + 1)]
+    for _ in range(100):
+        chunk = ''.join(rng.choice(pool) for _ in range(rng.randint(0, 50)))
+        assert detector._count_chunk(chunk) == reference._count_chunk(chunk), chunk
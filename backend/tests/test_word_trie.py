@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from app.services.dictionary_store import DictionaryStore, write_dictionary_store
+from app.services.word_trie import WordTrie
+from conftest import DICTIONARY
+
+# Texts mixing dictionary words, unknown characters and non-Han characters
+SAMPLE_TEXTS = ['中國人學生學校你好', '中国人学生学校', '頭髮头发王女', '我是中國的學生。', 'abc中', '']
+
+
+def reference_trie(dictionary):
+    """The dict trie DictionaryService used to build: every surface form -> traditional key."""
+    trie = WordTrie()
+    for word in sorted(dictionary):
+        trie.add(word, word)
+        for entry in dictionary[word]:
+            simplified = entry.get('simplified', word)
+            if simplified and simplified != word:
+                trie.add(simplified, word)
+    return trie
+
+
+def synthetic_dictionary(seed=7, words=3000):
+    """Random words over a small alphabet, so they share many prefixes and the double
+    array has to resolve plenty of collisions."""
+    rng = random.Random(seed)
+    alphabet = [chr(0x4E00 + code) for code in rng.sample(range(0x5200), 150)]
+    simplified = {char: chr(ord(char) + 1) for char in alphabet[:40]}
+    dictionary = {}
+    while len(dictionary) < words:
+        word = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 6)))
+        dictionary[word] = [{'pinyin': 'x', 'definition': word, 'frequency': 0.0,
+                             'simplified': ''.join(simplified.get(char, char) for char in word)}]
+    return dictionary, rng
+
+
+def assert_same_matches(trie, reference, texts):
+    for text in texts:
+        for pos in range(len(text) + 1):
+            assert trie.prefix_matches(text, pos) == reference.prefix_matches(text, pos), (text, pos)
+            assert trie.longest_match(text, pos) == reference.longest_match(text, pos), (text, pos)
+
+
+def test_word_trie_basics():
+    trie = WordTrie([('中國', 'China'), ('中', 'middle')])
+    trie.add('中國人')
+    trie.add('中', 'center')
+    trie.add('')
+    assert len(trie) == 3
+    assert trie.max_length == 3
+    assert '中國' in trie and '中國人' in trie
+    assert '國' not in trie and '中國的' not in trie
+    assert trie.prefix_matches('中國人們') == [(1, 'center'), (2, 'China'), (3, '中國人')]
+    assert trie.longest_match('我中國', 1) == (3, 'China')
+    assert trie.longest_match('我中國') is None
+    assert trie.prefix_matches('中', 1) == []
+
+
+def test_store_trie_matches_reference(store):
+    reference = reference_trie(DICTIONARY)
+    trie = store.word_trie
+    assert len(trie) == len(reference)
+    assert trie.max_length == reference.max_length
+    assert_same_matches(trie, reference, SAMPLE_TEXTS)
+    assert trie.longest_match('学校') == (2, '學校')
+    assert '头发' in trie and '頭髮' in trie
+    assert '头发们' not in trie and '' not in trie
+
+
+@pytest.fixture(scope='module')
+def synthetic_store(tmp_path_factory):
+    dictionary, rng = synthetic_dictionary()
+    path = str(tmp_path_factory.mktemp('synthetic') / 'dictionary.bin')
+    write_dictionary_store(dictionary, {}, {}, path)
+    store = DictionaryStore(path)
+    yield store, dictionary, rng
+    store.close()
+
+
+def test_store_trie_matches_reference_at_scale(synthetic_store):
+    store, dictionary, rng = synthetic_store
+    reference = reference_trie(dictionary)
+    assert len(store.word_trie) == len(reference)
+    assert store.word_trie.max_length == reference.max_length
+
+    words = list(dictionary)
+    texts = [''.join(rng.choice(words) for _ in range(8)) for _ in range(200)]
+    # Characters outside the trie's alphabet end a match
+    texts += [text[:5] + '。' + text[5:] for text in texts[:20]]
+    assert_same_matches(store.word_trie, reference, texts)
+    for word in words:
+        assert word in store.word_trie